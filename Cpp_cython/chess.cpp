@@ -5,136 +5,133 @@
 #include "chess.hpp"
 
 #include <vector>
-#include <stack>
 #include <map>
 #include <string>
 #include <stdexcept>
 #include <utility>
 
+uint64_t ZOBRIST_PIECES[13][64];
+uint64_t ZOBRIST_TURN;
+
+// Fill the Zobrist keys from a fixed-seed splitmix64 sequence at startup
+static const bool zobrist_initialized = [] {
+    uint64_t state = 0x5A0B;
+    auto next = [&state] {
+        uint64_t z = (state += 0x9E3779B97F4A7C15ULL);
+        z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL;
+        z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL;
+        return z ^ (z >> 31);
+    };
+    for (auto &piece_keys: ZOBRIST_PIECES)
+        for (uint64_t &key: piece_keys)
+            key = next();
+    ZOBRIST_TURN = next();
+    return true;
+}();
+
+// Precomputed attack tables indexed by square 8 * x + y: the squares a knight,
+// king or pawn (index 0 white, 1 black) attacks with their counts, and the
+// squares along each ray, nearest first (rays 0-3 diagonal, 4-7 straight)
+struct AttackTables {
+    int knight[64][8];
+    int knight_count[64];
+    int king[64][8];
+    int king_count[64];
+    int pawn[2][64][2];
+    int pawn_count[2][64];
+    int ray[64][8][7];
+    int ray_length[64][8];
+};
+
+static const AttackTables ATTACKS = [] {
+    AttackTables t{};
+    const int knight_dx[8] = {-2, -1, 1, 2, 2, 1, -1, -2};
+    const int knight_dy[8] = {-1, -2, -2, -1, 1, 2, 2, 1};
+    const int king_dx[8] = {-1, -1, -1, 0, 0, 1, 1, 1};
+    const int king_dy[8] = {-1, 0, 1, -1, 1, -1, 0, 1};
+    const int ray_dx[8] = {-1, -1, 1, 1, -1, 1, 0, 0};
+    const int ray_dy[8] = {-1, 1, -1, 1, 0, 0, -1, 1};
+    auto on_board = [](int x, int y) { return x >= 0 && x < 8 && y >= 0 && y < 8; };
+    for (int square = 0; square < 64; ++square) {
+        int x0 = square / 8, y0 = square % 8;
+        for (int i = 0; i < 8; ++i) {
+            if (on_board(x0 + knight_dx[i], y0 + knight_dy[i]))
+                t.knight[square][t.knight_count[square]++] = 8 * (x0 + knight_dx[i]) + y0 + knight_dy[i];
+            if (on_board(x0 + king_dx[i], y0 + king_dy[i]))
+                t.king[square][t.king_count[square]++] = 8 * (x0 + king_dx[i]) + y0 + king_dy[i];
+        }
+        for (int side = 0; side < 2; ++side) {
+            int dx = side == 0 ? -1 : 1;
+            for (int dy : {-1, 1})
+                if (on_board(x0 + dx, y0 + dy))
+                    t.pawn[side][square][t.pawn_count[side][square]++] = 8 * (x0 + dx) + y0 + dy;
+        }
+        for (int d = 0; d < 8; ++d)
+            for (int x = x0 + ray_dx[d], y = y0 + ray_dy[d]; on_board(x, y); x += ray_dx[d], y += ray_dy[d])
+                t.ray[square][d][t.ray_length[square][d]++] = 8 * x + y;
+    }
+    return t;
+}();
+
+uint64_t Board::compute_hash() const {
+    uint64_t key = turn == BLACK ? ZOBRIST_TURN : 0;
+    for (int square = 0; square < 64; ++square)
+        if (_board[square] != 0)
+            key ^= ZOBRIST_PIECES[_board[square] + 6][square];
+    return key;
+}
+
 bool Board::is_square_attacked(std::pair<int, int> square, int enemy_color) {
     if (square.first < 0 || square.first >= 8 || square.second < 0 || square.second >= 8)
         return false;
 
-    // Pawn attacks
-    int pawn_dir = (enemy_color == WHITE) ? 1 : -1;
-    std::vector<std::pair<int, int>> pawn_deltas = {{pawn_dir, -1},
-                                                    {pawn_dir, 1}};
-    for (auto &delta: pawn_deltas) {
-        int x = square.first + delta.first;
-        int y = square.second + delta.second;
-        if (x >= 0 && x < 8 && y >= 0 && y < 8 && _board[x][y] == PAWN * enemy_color)
+    int square_index = 8 * square.first + square.second;
+
+    // Pawns stand where a pawn of the other color on the square would capture
+    int side = (enemy_color == WHITE) ? 1 : 0;
+    for (int i = 0; i < ATTACKS.pawn_count[side][square_index]; ++i)
+        if (_board[ATTACKS.pawn[side][square_index][i]] == PAWN * enemy_color)
             return true;
-    }
 
-    // Knight attacks
-    std::vector<std::pair<int, int>> knight_deltas = {{-2, -1},
-                                                      {-1, -2},
-                                                      {1,  -2},
-                                                      {2,  -1},
-                                                      {2,  1},
-                                                      {1,  2},
-                                                      {-1, 2},
-                                                      {-2, 1}};
-    for (auto &delta: knight_deltas) {
-        int x = square.first + delta.first;
-        int y = square.second + delta.second;
-        if (x >= 0 && x < 8 && y >= 0 && y < 8 && _board[x][y] == KNIGHT * enemy_color)
+    for (int i = 0; i < ATTACKS.knight_count[square_index]; ++i)
+        if (_board[ATTACKS.knight[square_index][i]] == KNIGHT * enemy_color)
             return true;
-    }
 
-    // King attacks
-    std::vector<std::pair<int, int>> king_deltas = {{-1, -1},
-                                                    {-1, 0},
-                                                    {-1, 1},
-                                                    {0,  -1},
-                                                    {0,  1},
-                                                    {1,  -1},
-                                                    {1,  0},
-                                                    {1,  1}};
-    for (auto &delta: king_deltas) {
-        int x = square.first + delta.first;
-        int y = square.second + delta.second;
-        if (x >= 0 && x < 8 && y >= 0 && y < 8 && _board[x][y] == KING * enemy_color)
+    for (int i = 0; i < ATTACKS.king_count[square_index]; ++i)
+        if (_board[ATTACKS.king[square_index][i]] == KING * enemy_color)
             return true;
-    }
 
-    // Sliding attacks
-    std::vector<std::pair<int, int>> directions = {{-1, -1},
-                                                   {-1, 1},
-                                                   {1,  -1},
-                                                   {1,  1},
-                                                   {-1, 0},
-                                                   {1,  0},
-                                                   {0,  -1},
-                                                   {0,  1}};
-    for (auto &dir: directions) {
-        int x = square.first + dir.first;
-        int y = square.second + dir.second;
-        while (x >= 0 && x < 8 && y >= 0 && y < 8) {
-            if (_board[x][y] != 0) {
-                int piece = _board[x][y];
-                if ((dir.first == 0 || dir.second == 0) &&
-                    (abs(piece) == ROOK || abs(piece) == QUEEN) && piece * enemy_color > 0)
-                    return true;
-                if ((dir.first != 0 && dir.second != 0) &&
-                    (abs(piece) == BISHOP || abs(piece) == QUEEN) && piece * enemy_color > 0)
+    // Sliders: the first piece on each ray decides
+    for (int d = 0; d < 8; ++d) {
+        int slider = d < 4 ? BISHOP : ROOK;
+        for (int i = 0; i < ATTACKS.ray_length[square_index][d]; ++i) {
+            int piece = _board[ATTACKS.ray[square_index][d][i]];
+            if (piece != 0) {
+                if (piece == slider * enemy_color || piece == QUEEN * enemy_color)
                     return true;
                 break;
             }
-            x += dir.first;
-            y += dir.second;
         }
     }
     return false;
 }
 
-void Board::retractMove(const Move &move) {
-    auto &from = move.from_square;
-    auto &to = move.to_square;
-    int piece = _board[to.first][to.second];
-    _board.at(from.first).at(from.second) = piece;
-    _board.at(to.first).at(to.second) = 0;
-
-    // Undo castling
-    if (abs(piece) == KING && abs(from.second - to.second) == 2) {
-        int rook_from_col = (to.second > from.second) ? 5 : 3;
-        int rook_to_col = (to.second > from.second) ? 7 : 0;
-        int row = from.first;
-        int rook = _board.at(row).at(rook_from_col);
-        _board.at(row).at(rook_to_col) = rook;
-        _board.at(row).at(rook_from_col) = 0;
-    }
-
-    // Undo promotion
-    if (move.promotion)
-        _board.at(from.first).at(from.second) = PAWN * -turn;
-
-    turn = -turn;
-}
-
 Board::Board() { reset(); }
 
 void Board::reset() {
-    int initial[8][8] = {
-            {-4, -2, -3, -5, -6, -3, -2, -4},
-            {-1, -1, -1, -1, -1, -1, -1, -1},
-            {0,  0,  0,  0,  0,  0,  0,  0},
-            {0,  0,  0,  0,  0,  0,  0,  0},
-            {0,  0,  0,  0,  0,  0,  0,  0},
-            {0,  0,  0,  0,  0,  0,  0,  0},
-            {1,  1,  1,  1,  1,  1,  1,  1},
-            {4,  2,  3,  5,  6,  3,  2,  4}
+    _board = {
+            -4, -2, -3, -5, -6, -3, -2, -4,
+            -1, -1, -1, -1, -1, -1, -1, -1,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            0, 0, 0, 0, 0, 0, 0, 0,
+            1, 1, 1, 1, 1, 1, 1, 1,
+            4, 2, 3, 5, 6, 3, 2, 4
     };
-    _board = std::vector(8, std::vector(8, 0));
-    for (int i = 0; i < 8; ++i){
-    _board.at(i) = std::vector(initial[i], initial[i] + 8);
-        for (int j=0;j<8;j++) {
-            _board.at(i).at(j) = initial[i][j];
-        }
-
-    }
     turn = WHITE;
-    while (!event_stack.empty()) event_stack.pop();
+    undo_stack.clear();
+    hash = compute_hash();
 }
 
 [[maybe_unused]] void Board::set_fen(const std::string &fen) {
@@ -153,8 +150,7 @@ void Board::reset() {
             {'k', {BLACK, KING}}
     };
 
-    for (auto &row: _board)
-        row = std::vector<int>(8, 0);
+    _board.fill(0);
 
     size_t space = fen.find(' ');
     std::string placement = fen.substr(0, space);
@@ -169,12 +165,14 @@ void Board::reset() {
         else if (isdigit(c)) col += c - '0';
         else {
             auto &p = piece_map[c];
-            _board.at(row).at(col) = p.first == WHITE ? p.second : -p.second;
+            _board.at(8 * row + col) = p.first == WHITE ? p.second : -p.second;
             col++;
         }
     }
 
     turn = (turn_str == "w") ? WHITE : BLACK;
+    undo_stack.clear();
+    hash = compute_hash();
 }
 
 void Board::push_uci(const std::string &move_str) {
@@ -186,58 +184,83 @@ void Board::push_uci(const std::string &move_str) {
         move.promotion = promo == 'q' ? QUEEN : promo == 'r' ? ROOK :
                                                 promo == 'b' ? BISHOP : KNIGHT;
     }
+    push(move);
+}
 
-    int &piece = _board.at(move.from_square.first).at(move.from_square.second);
-    int &target = _board.at(move.to_square.first).at(move.to_square.second);
+// Make a move in place, recording what pop needs to unmake it
+void Board::push(const Move &move) {
+    int from_index = 8 * move.from_square.first + move.from_square.second;
+    int to_index = 8 * move.to_square.first + move.to_square.second;
+    int piece = _board[from_index];
+    int captured = _board[to_index];
+    undo_stack.push_back({move, captured, hash});
+
+    uint64_t key = hash ^ ZOBRIST_TURN ^ ZOBRIST_PIECES[piece + 6][from_index];
+    if (captured != 0)
+        key ^= ZOBRIST_PIECES[captured + 6][to_index];
 
     // Handle castling
     if (abs(piece) == KING && abs(move.from_square.second - move.to_square.second) == 2) {
-        int rook_from_col = move.to_square.second > move.from_square.second ? 7 : 0;
-        int rook_to_col = move.to_square.second > move.from_square.second ? 5 : 3;
-        std::pair rook_from = {move.from_square.first, rook_from_col};
-        std::pair rook_to = {move.from_square.first, rook_to_col};
-        int rook = _board.at(rook_from.first).at(rook_from.second);
-        _board.at(rook_to.first).at(rook_to.second) = rook;
-        _board.at(rook_from.first).at(rook_from.second) = 0;
+        int row = 8 * move.from_square.first;
+        int rook_from = row + (move.to_square.second > move.from_square.second ? 7 : 0);
+        int rook_to = row + (move.to_square.second > move.from_square.second ? 5 : 3);
+        int rook = _board[rook_from];
+        _board[rook_to] = static_cast<int8_t>(rook);
+        _board[rook_from] = 0;
+        key ^= ZOBRIST_PIECES[rook + 6][rook_from] ^ ZOBRIST_PIECES[rook + 6][rook_to];
     }
 
-    event_stack.emplace(move);
-    if (target != 0)
-        event_stack.emplace(target);
+    int placed = move.promotion ? move.promotion * turn : piece;
+    _board[to_index] = static_cast<int8_t>(placed);
+    _board[from_index] = 0;
+    hash = key ^ ZOBRIST_PIECES[placed + 6][to_index];
+    turn = -turn;
+}
 
+// Unmake the last move pushed
+void Board::pop() {
+    if (undo_stack.empty()) throw std::runtime_error("No moves to pop");
 
-    target = piece;
-    piece = 0;
+    const Undo &undo = undo_stack.back();
+    const Move &move = undo.move;
+    int from_index = 8 * move.from_square.first + move.from_square.second;
+    int to_index = 8 * move.to_square.first + move.to_square.second;
+    turn = -turn;
+    int piece = move.promotion ? PAWN * turn : _board[to_index];
+    _board[from_index] = static_cast<int8_t>(piece);
+    _board[to_index] = static_cast<int8_t>(undo.captured);
 
-    if (move.promotion)
-        target = move.promotion * turn;
+    // Undo castling
+    if (abs(piece) == KING && abs(move.from_square.second - move.to_square.second) == 2) {
+        int row = 8 * move.from_square.first;
+        int rook_from = row + (move.to_square.second > move.from_square.second ? 5 : 3);
+        int rook_to = row + (move.to_square.second > move.from_square.second ? 7 : 0);
+        _board[rook_to] = _board[rook_from];
+        _board[rook_from] = 0;
+    }
 
-    turn = -turn;
+    hash = undo.hash;
+    undo_stack.pop_back();
 }
 
 bool Board::is_move_legal(const Move& move, int color) {
+    int from_index = 8 * move.from_square.first + move.from_square.second;
+    int to_index = 8 * move.to_square.first + move.to_square.second;
+
     // Save original state
-    int original_from = _board.at(move.from_square.first).at(move.from_square.second);
-    int original_to = _board.at(move.to_square.first).at(move.to_square.second);
+    int8_t original_from = _board[from_index];
+    int8_t original_to = _board[to_index];
 
     // Simulate move
-    _board.at(move.to_square.first).at(move.to_square.second) = original_from;
-    _board.at(move.from_square.first).at(move.from_square.second) = 0;
-
-    // Handle promotion
-    if (move.promotion)
-        _board[move.to_square.first][move.to_square.second] = move.promotion * color;
+    _board[to_index] = move.promotion ? static_cast<int8_t>(move.promotion * color) : original_from;
+    _board[from_index] = 0;
 
     // Find king's position
-    std::pair<int, int> king_pos;
-    bool found = false;
-    for (int i = 0; i < 8 && !found; ++i) {
-        for (int j = 0; j < 8; ++j) {
-            if (_board[i][j] == KING * color) {
-                king_pos = {i, j};
-                found = true;
-                break;
-            }
+    std::pair<int, int> king_pos = {-1, -1};
+    for (int square = 0; square < 64; ++square) {
+        if (_board[square] == KING * color) {
+            king_pos = {square / 8, square % 8};
+            break;
         }
     }
 
@@ -245,221 +268,161 @@ bool Board::is_move_legal(const Move& move, int color) {
     bool safe = !is_square_attacked(king_pos, -color);
 
     // Restore board
-    _board[move.from_square.first][move.from_square.second] = original_from;
-    _board[move.to_square.first][move.to_square.second] = original_to;
+    _board[from_index] = original_from;
+    _board[to_index] = original_to;
 
     return safe;
 }
 
-void Board::push(const Move &move) {
-    event_stack.emplace(move);
-    push_uci(move.uci());
-}
-
-std::vector<Move> Board::legal_moves() {
-    std::vector<Move> moves;
-
-    for (int x = 0; x < 8; ++x) {
-        for (int y = 0; y < 8; ++y) {
-            int piece = _board[x][y];
-            if (piece == 0 || piece * turn <= 0) continue; // Skip empty or opponent's pieces
-
-            int piece_type = abs(piece);
-
-            // Pawn moves
-            if (piece_type == PAWN) {
-                int direction = -turn;
-                int start_row = (turn == WHITE) ? 6 : 1;
-                int promotion_row = (turn == WHITE) ? 0 : 7;
-
-                // Single move forward
-                int new_x = x + direction;
-                if (new_x >= 0 && new_x < 8 && _board[new_x][y] == 0) {
-                    if (new_x == promotion_row) {
-                        for (int promo : {QUEEN, ROOK, BISHOP, KNIGHT}) {
-                            Move move;
-                            move.from_square = {x, y};
-                            move.to_square = {new_x, y};
-                            move.promotion = promo;
-                            if (is_move_legal(move, turn))
-                                moves.push_back(move);
-                        }
-                    } else {
-                        Move move;
-                        move.from_square = {x, y};
-                        move.to_square = {new_x, y};
-                        if (is_move_legal(move, turn))
-                            moves.push_back(move);
-                    }
-                }
-
-                // Double move from start row
-                if (x == start_row) {
-                    int new_x2 = x + 2 * direction;
-                    if (new_x2 >= 0 && new_x2 < 8 &&
-                        _board[x + direction][y] == 0 && _board[new_x2][y] == 0) {
-                        Move move;
-                        move.from_square = {x, y};
-                        move.to_square = {new_x2, y};
-                        if (is_move_legal(move, turn))
-                            moves.push_back(move);
-                    }
-                }
-
-                // Captures
-                for (int dy : {-1, 1}) {
-                    int new_x = x + direction;
-                    int new_y = y + dy;
-                    if (new_x >= 0 && new_x < 8 && new_y >= 0 && new_y < 8) {
-                        if (_board[new_x][new_y] * turn < 0) { // Enemy piece
-                            if (new_x == promotion_row) {
-                                for (int promo : {QUEEN, ROOK, BISHOP, KNIGHT}) {
-                                    Move move;
-                                    move.from_square = {x, y};
-                                    move.to_square = {new_x, new_y};
-                                    move.promotion = promo;
-                                    if (is_move_legal(move, turn))
-                                        moves.push_back(move);
-                                }
-                            } else {
-                                Move move;
-                                move.from_square = {x, y};
-                                move.to_square = {new_x, new_y};
-                                if (is_move_legal(move, turn))
-                                    moves.push_back(move);
-                            }
-                        }
-                    }
+void Board::generate_moves(MoveList& moves) {
+    moves.count = 0;
+    auto add_if_legal = [&](int square, int target, int promotion) {
+        Move move;
+        move.from_square = {square / 8, square % 8};
+        move.to_square = {target / 8, target % 8};
+        move.promotion = promotion;
+        if (is_move_legal(move, turn))
+            moves.add(square, target, promotion);
+    };
+    int side = (turn == WHITE) ? 0 : 1;
+
+    for (int square = 0; square < 64; ++square) {
+        int piece = _board[square];
+        if (piece == 0 || piece * turn <= 0) continue; // Skip empty or opponent's pieces
+
+        int piece_type = abs(piece);
+        int x = square / 8;
+
+        // Pawn moves
+        if (piece_type == PAWN) {
+            int direction = -turn;
+            int start_row = (turn == WHITE) ? 6 : 1;
+            int promotion_row = (turn == WHITE) ? 0 : 7;
+
+            // Single move forward
+            int new_x = x + direction;
+            int ahead = square + 8 * direction;
+            if (new_x >= 0 && new_x < 8 && _board[ahead] == 0) {
+                if (new_x == promotion_row) {
+                    for (int promo : {QUEEN, ROOK, BISHOP, KNIGHT})
+                        add_if_legal(square, ahead, promo);
+                } else {
+                    add_if_legal(square, ahead, 0);
                 }
             }
 
-                // Knight moves
-            else if (piece_type == KNIGHT) {
-                std::vector<std::pair<int, int>> deltas = {
-                        {-2, -1}, {-1, -2}, {1, -2}, {2, -1},
-                        {2, 1}, {1, 2}, {-1, 2}, {-2, 1}
-                };
-                for (auto& delta : deltas) {
-                    int x2 = x + delta.first;
-                    int y2 = y + delta.second;
-                    if (x2 >= 0 && x2 < 8 && y2 >= 0 && y2 < 8) {
-                        if (_board[x2][y2] * turn <= 0) { // Empty or enemy
-                            Move move;
-                            move.from_square = {x, y};
-                            move.to_square = {x2, y2};
-                            if (is_move_legal(move, turn))
-                                moves.push_back(move);
-                        }
+            // Double move from start row
+            if (x == start_row && _board[ahead] == 0 && _board[ahead + 8 * direction] == 0)
+                add_if_legal(square, ahead + 8 * direction, 0);
+
+            // Captures
+            for (int i = 0; i < ATTACKS.pawn_count[side][square]; ++i) {
+                int target = ATTACKS.pawn[side][square][i];
+                if (_board[target] * turn < 0) { // Enemy piece
+                    if (target / 8 == promotion_row) {
+                        for (int promo : {QUEEN, ROOK, BISHOP, KNIGHT})
+                            add_if_legal(square, target, promo);
+                    } else {
+                        add_if_legal(square, target, 0);
                     }
                 }
             }
+        }
 
-                // Bishop/Rook/Queen moves
-            else if (piece_type == BISHOP || piece_type == ROOK || piece_type == QUEEN) {
-                std::vector<std::pair<int, int>> directions;
-                if (piece_type == BISHOP || piece_type == QUEEN)
-                    directions.insert(directions.end(), {{-1,-1}, {-1,1}, {1,-1}, {1,1}});
-                if (piece_type == ROOK || piece_type == QUEEN)
-                    directions.insert(directions.end(), {{-1,0}, {1,0}, {0,-1}, {0,1}});
-
-                for (auto& dir : directions) {
-                    int x2 = x + dir.first;
-                    int y2 = y + dir.second;
-                    while (x2 >= 0 && x2 < 8 && y2 >= 0 && y2 < 8) {
-                        if (_board[x2][y2] * turn <= 0) { // Empty or enemy
-                            Move move;
-                            move.from_square = {x, y};
-                            move.to_square = {x2, y2};
-                            if (is_move_legal(move, turn))
-                                moves.push_back(move);
-                        }
-                        if (_board[x2][y2] != 0) break; // Blocked
-                        x2 += dir.first;
-                        y2 += dir.second;
-                    }
-                }
-            }
+            // Knight and king moves
+        else if (piece_type == KNIGHT || piece_type == KING) {
+            const int *targets = piece_type == KNIGHT ? ATTACKS.knight[square] : ATTACKS.king[square];
+            int count = piece_type == KNIGHT ? ATTACKS.knight_count[square] : ATTACKS.king_count[square];
+            for (int i = 0; i < count; ++i)
+                if (_board[targets[i]] * turn <= 0) // Empty or enemy
+                    add_if_legal(square, targets[i], 0);
+        }
 
-                // King moves
-            else if (piece_type == KING) {
-                std::vector<std::pair<int, int>> deltas = {
-                        {-1,-1}, {-1,0}, {-1,1},
-                        {0,-1},         {0,1},
-                        {1,-1},  {1,0},  {1,1}
-                };
-                for (auto& delta : deltas) {
-                    int x2 = x + delta.first;
-                    int y2 = y + delta.second;
-                    if (x2 >= 0 && x2 < 8 && y2 >= 0 && y2 < 8) {
-                        if (_board[x2][y2] * turn <= 0) { // Empty or enemy
-                            Move move;
-                            move.from_square = {x, y};
-                            move.to_square = {x2, y2};
-                            if (is_move_legal(move, turn))
-                                moves.push_back(move);
-                        }
-                    }
+            // Bishop/Rook/Queen moves: diagonal rays 0-3, straight rays 4-7
+        else if (piece_type == BISHOP || piece_type == ROOK || piece_type == QUEEN) {
+            int first = piece_type == ROOK ? 4 : 0;
+            int last = piece_type == BISHOP ? 4 : 8;
+            for (int d = first; d < last; ++d) {
+                for (int i = 0; i < ATTACKS.ray_length[square][d]; ++i) {
+                    int target = ATTACKS.ray[square][d][i];
+                    if (_board[target] * turn <= 0) // Empty or enemy
+                        add_if_legal(square, target, 0);
+                    if (_board[target] != 0) break; // Blocked
                 }
             }
         }
     }
+}
 
+std::vector<Move> Board::legal_moves() {
+    MoveList list;
+    generate_moves(list);
+    std::vector<Move> moves;
+    moves.reserve(list.count);
+    for (int i = 0; i < list.count; ++i) moves.push_back(list.get(i));
     return moves;
 }
 
-void Board::pop() {
-    if (event_stack.empty()) throw std::runtime_error("No moves to pop");
-
-    auto top = event_stack.top();
-    event_stack.pop();
-
-    if (std::holds_alternative<int>(top)) {
-        // Handle capture: [Move, CapturedPiece] in stack
-        int captured = std::get<int>(top);
-        Move move = std::get<Move>(event_stack.top());
-        event_stack.pop();
-
-        this->retractMove(move);
-        _board[move.to_square.first][move.to_square.second] = captured;
-    } else {
-        // Handle non-capture
-        Move move = std::get<Move>(top);
-        this->retractMove(move);
+uint64_t Board::perft(int depth) {
+    if (depth <= 0) return 1;
+    MoveList moves;
+    generate_moves(moves);
+    if (depth == 1) return moves.count;
+    uint64_t nodes = 0;
+    for (int i = 0; i < moves.count; ++i) {
+        push(moves.get(i));
+        nodes += perft(depth - 1);
+        pop();
+    }
+    return nodes;
+}
+
+std::vector<std::pair<std::string, uint64_t>> Board::perft_divide(int depth) {
+    MoveList moves;
+    generate_moves(moves);
+    std::vector<std::pair<std::string, uint64_t>> counts;
+    counts.reserve(moves.count);
+    for (int i = 0; i < moves.count; ++i) {
+        Move move = moves.get(i);
+        push(move);
+        counts.emplace_back(move.uci(), perft(depth - 1));
+        pop();
     }
+    return counts;
 }
 
 bool Board::can_claim_draw() {
     int pawns = 0, queens = 0, rooks = 0, bishops = 0, knights = 0;
-    for (auto &row: _board) {
-        for (int p: row) {
-            int abs_p = abs(p);
-            if (abs_p == PAWN) pawns++;
-            else if (abs_p == QUEEN) queens++;
-            else if (abs_p == ROOK) rooks++;
-            else if (abs_p == BISHOP) bishops++;
-            else if (abs_p == KNIGHT) knights++;
-        }
+    for (int p: _board) {
+        int abs_p = abs(p);
+        if (abs_p == PAWN) pawns++;
+        else if (abs_p == QUEEN) queens++;
+        else if (abs_p == ROOK) rooks++;
+        else if (abs_p == BISHOP) bishops++;
+        else if (abs_p == KNIGHT) knights++;
     }
     return pawns + queens + rooks == 0 && bishops + knights <= 1;
 }
 
 bool Board::is_checkmate() {
     // Find king
-    std::pair<int, int> king_pos;
-    bool found = false;
-    for (int i = 0; i < 8 && !found; ++i)
-        for (int j = 0; j < 8; ++j)
-            if (_board[i][j] == KING * turn) {
-                king_pos = {i, j};
-                found = true;
-                break;
-            }
-    if (!found) return false;
+    int king = -1;
+    for (int square = 0; square < 64; ++square)
+        if (_board[square] == KING * turn) {
+            king = square;
+            break;
+        }
+    if (king < 0) return false;
 
-    if (!is_square_attacked(king_pos, -turn)) return false;
-    return legal_moves().empty();
+    if (!is_square_attacked({king / 8, king % 8}, -turn)) return false;
+    MoveList moves;
+    generate_moves(moves);
+    return moves.count == 0;
 }
 
 bool Board::is_game_over() {
-    return is_checkmate() || legal_moves().empty() || can_claim_draw();
+    if (is_checkmate()) return true;
+    MoveList moves;
+    generate_moves(moves);
+    return moves.count == 0 || can_claim_draw();
 }
@@ -5,10 +5,10 @@
 #ifndef CYTHON_CHESS_H
 #define CYTHON_CHESS_H
 
+#include <array>
+#include <cstdint>
 #include <vector>
-#include <stack>
 #include <string>
-#include <variant>
 
 // Constants for piece types and colors
 const int WHITE = 1;
@@ -20,6 +20,10 @@ const int ROOK = 4;
 const int QUEEN = 5;
 const int KING = 6;
 
+// Zobrist keys indexed [piece + 6][8 * x + y] plus one for black to move
+extern uint64_t ZOBRIST_PIECES[13][64];
+extern uint64_t ZOBRIST_TURN;
+
 
 struct Move {
     std::pair<int, int> from_square;
@@ -50,19 +54,80 @@ struct Move {
     }
 };
 
+// Upper bound on the number of legal moves in a position (the most known is 218)
+constexpr int MAX_MOVES = 256;
+
+// Fixed-capacity move list filled by Board::generate_moves. Moves are packed into 16 bits,
+// from square bits 0-5, to square bits 6-11 and promotion bits 12-14, each with a sort key
+// the search orders them by in place, so generating and ordering moves allocates nothing.
+struct MoveList {
+    uint16_t moves[MAX_MOVES];
+    long long scores[MAX_MOVES];
+    int count = 0;
+
+    void add(int from, int to, int promotion) {
+        moves[count++] = static_cast<uint16_t>(from | to << 6 | promotion << 12);
+    }
+
+    [[nodiscard]] Move get(int i) const {
+        int from = moves[i] & 0x3F, to = moves[i] >> 6 & 0x3F;
+        Move move;
+        move.from_square = {from / 8, from % 8};
+        move.to_square = {to / 8, to % 8};
+        move.promotion = moves[i] >> 12;
+        return move;
+    }
+
+    // Index of move, or -1 when it is not in the list
+    [[nodiscard]] int find(const Move& move) const {
+        int from = move.from_square.first * 8 + move.from_square.second;
+        int to = move.to_square.first * 8 + move.to_square.second;
+        auto packed = static_cast<uint16_t>(from | to << 6 | move.promotion << 12);
+        for (int i = 0; i < count; ++i)
+            if (moves[i] == packed) return i;
+        return -1;
+    }
+
+    // Selection step: bring the highest scored of moves i.. to i and return it. The moves
+    // passed over shift up one place, so equal scores keep their generation order.
+    Move pick(int i) {
+        int best = i;
+        for (int j = i + 1; j < count; ++j)
+            if (scores[j] > scores[best]) best = j;
+        uint16_t move = moves[best];
+        long long score = scores[best];
+        for (int j = best; j > i; --j) {
+            moves[j] = moves[j - 1];
+            scores[j] = scores[j - 1];
+        }
+        moves[i] = move;
+        scores[i] = score;
+        return get(i);
+    }
+};
+
+// What Board::pop needs to take a move back: the move, the piece it captured
+// and the Zobrist key before it
+struct Undo {
+    Move move;
+    int captured;
+    uint64_t hash;
+};
+
 // Board class to represent the chess board
 class Board {
 private:
-    std::stack<std::variant<Move, int>> event_stack;
+    std::vector<Undo> undo_stack;
 public:
-    std::vector<std::vector<int>> _board;
+    // Signed pieces by square 8 * x + y, x = 0 being the eighth rank
+    std::array<int8_t, 64> _board{};
     Board();
 
     void reset();
 
     [[maybe_unused]] void set_fen(const std::string& fen);
 
-    void retractMove(const Move& move);
+    [[nodiscard]] int piece_at(int x, int y) const { return _board[8 * x + y]; }
 
     bool can_claim_draw();
 
@@ -70,6 +135,8 @@ public:
 
     bool is_square_attacked(std::pair<int, int> square, int enemy_color);
 
+    void generate_moves(MoveList& moves);
+
     std::vector<Move> legal_moves();
 
     void push(const Move& move);
@@ -82,7 +149,16 @@ public:
 
     bool is_move_legal(const Move &move, int color);
 
+    // Leaves of the legal move tree to depth, the last ply counted without being played
+    uint64_t perft(int depth);
+
+    // perft(depth - 1) below each legal move, by the move's UCI string
+    std::vector<std::pair<std::string, uint64_t>> perft_divide(int depth);
+
+    [[nodiscard]] uint64_t compute_hash() const;
+
     int turn;
+    uint64_t hash = 0; // Zobrist key, updated incrementally by push_uci/pop
 };
 
 #endif //CYTHON_CHESS_H
@@ -2,9 +2,12 @@
 # distutils: language = c++
 # distutils: sources = chess.cpp movegeneration.cpp
 
+import sys
+
 from libcpp.vector cimport vector
 from libcpp.string cimport string
 from libcpp.pair cimport pair
+from libc.stdint cimport uint64_t
 from libcpp cimport bool as cbool
 
 # ===== C++ Interface Declarations =====
@@ -22,13 +25,27 @@ cdef extern from "chess.hpp":
         void set_fen(string fen)
         void push_uci(string move_str)
         void push(const CMove& move)
-        void pop()
+        void pop() except +
         vector[CMove] legal_moves()
         int turn
         cbool is_move_legal(const CMove& move, int color)
+        unsigned long long hash
+        uint64_t perft(int depth)
+        vector[pair[string, uint64_t]] perft_divide(int depth)
 
 cdef extern from "movegeneration.hpp":
-    CMove cpp_next_move "next_move"(CBoard& board, double time_limit, string name, cbool debug) except +
+    cdef cppclass CDebugInfo "DebugInfo":
+        string engine
+        long long nodes
+        double time
+
+    CDebugInfo debug_info
+    CMove cpp_next_move "next_move"(CBoard& board, double time_limit, string name, cbool debug,
+                                    int max_depth, cbool info, double soft_limit) except + nogil
+    int MAX_SEARCH_PLY
+    void cpp_set_threads "set_threads"(int threads)
+    void cpp_clear_transposition_table "clear_transposition_table"()
+    void cpp_clear_move_ordering "clear_move_ordering"()
 
 # ===== Python Wrappers =====
 cdef class Move:
@@ -108,10 +125,22 @@ cdef class Board:
     def is_move_legal(self, Move move):
         return self.c_board.is_move_legal(move.c_move, self.turn)
 
+    def perft(self, int depth):
+        """Number of leaves of the legal move tree to depth."""
+        return self.c_board.perft(depth)
+
+    def perft_divide(self, int depth):
+        """perft(depth - 1) below each legal move, by UCI string."""
+        cdef pair[string, uint64_t] count
+        return {count.first.decode('utf-8'): count.second for count in self.c_board.perft_divide(depth)}
+
     property turn:
         def __get__(self):
             return self.c_board.turn
 
+    def zobrist_hash(self):
+        return self.c_board.hash
+
     cdef _convert_move(self, CMove cmove):
         py_move = Move()
         py_move.c_move = cmove
@@ -131,10 +160,34 @@ cdef class Board:
                     line.append(color + ['', 'P', 'N', 'B', 'R', 'Q', 'K'][typ])
             print(' '.join(line))
 
-def next_move(Board board, double time_limit, str name, debug=True):
-    cdef CMove cpp_move = cpp_next_move(board.c_board, time_limit, name.encode('utf-8'), debug)
+def next_move(Board board, double time_limit, str name, debug=True, int max_depth=MAX_SEARCH_PLY, info=False,
+              double soft_limit=float("inf")):
+    cdef string c_name = name.encode('utf-8')
+    cdef cbool c_debug = debug
+    cdef cbool c_info = info
+    cdef CMove cpp_move
+    # The search prints its info lines straight to stdout, after anything still buffered here
+    if info:
+        sys.stdout.flush()
+    # The search threads run without the GIL
+    with nogil:
+        cpp_move = cpp_next_move(board.c_board, time_limit, c_name, c_debug, max_depth, c_info, soft_limit)
     return board._convert_move(cpp_move)
 
+def get_debug_info():
+    """The statistics of the last next_move call: nodes, engine and time."""
+    return {"nodes": debug_info.nodes, "engine": debug_info.engine.decode('utf-8'), "time": debug_info.time}
+
+def set_threads(int threads):
+    """Search with threads threads from the next next_move on (Lazy SMP)."""
+    cpp_set_threads(threads)
+
+def clear_transposition_table():
+    cpp_clear_transposition_table()
+
+def clear_move_ordering():
+    cpp_clear_move_ordering()
+
 # Add debug helpers
 cdef extern from *:
     """
@@ -142,7 +195,7 @@ cdef extern from *:
     void debug_board(const Board& b) {
         for (int row = 0; row < 8; row++) {
             for (int col = 0; col < 8; col++) {
-                int piece = b._board[row][col];
+                int piece = b._board[8 * row + col];
                 if (piece == 0) std::cout << ". ";
                 else std::cout << (piece > 0 ? "w" : "b")
                              << "PRNBQK"[abs(piece)] << " ";
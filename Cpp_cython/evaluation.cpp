@@ -3,6 +3,7 @@
 //
 
 #include "evaluation.hpp"
+#include <algorithm>
 
 // Piece values indexed by piece type (1-6)
 const std::vector<int> PIECE_VALUE = {0, 100, 320, 330, 500, 900, 20000};
@@ -165,20 +166,30 @@ int evaluate_piece(int piece, std::pair<int, int> square, bool endgame) {
     return 0;
 }
 
-// Function to evaluate the board
-int evaluate_board(const std::vector<std::vector<int>>& board, bool endgame) {
-    int total_score = 0;
-    for (int x = 0; x < 8; ++x) {
-        for (int y = 0; y < 8; ++y) {
-            int piece = board[x][y];
-            if (piece != 0) {
-                int piece_score = evaluate_piece(piece, {x, y}, endgame);
-                int value = PIECE_VALUE[abs(piece)];
-                total_score += (piece > 0) ? (piece_score + value) : -(piece_score + value);
-            }
+// Game phase weight of each piece type: TOTAL_PHASE with every knight, bishop,
+// rook and queen on the board, 0 with only kings and pawns left
+const int PHASE_WEIGHT[7] = {0, 0, 1, 1, 2, 4, 0};
+const int TOTAL_PHASE = 24;
+
+// Function to evaluate the board, blending the midgame and endgame scores by
+// game phase so the score moves smoothly as pieces come off
+int evaluate_board(const std::array<int8_t, 64>& board) {
+    int mg = 0;
+    int eg = 0;
+    int phase = 0;
+    for (int square = 0; square < 64; ++square) {
+        int piece = board[square];
+        if (piece != 0) {
+            int value = PIECE_VALUE[abs(piece)];
+            int sign = (piece > 0) ? 1 : -1;
+            std::pair<int, int> xy = {square / 8, square % 8};
+            mg += sign * (evaluate_piece(piece, xy, false) + value);
+            eg += sign * (evaluate_piece(piece, xy, true) + value);
+            phase += PHASE_WEIGHT[abs(piece)];
         }
     }
-    return total_score;
+    phase = std::min(phase, TOTAL_PHASE);
+    return (mg * phase + eg * (TOTAL_PHASE - phase)) / TOTAL_PHASE;
 }
 
 int move_value(const Board& board, const Move& move, bool endgame) {
@@ -188,9 +199,8 @@ int move_value(const Board& board, const Move& move, bool endgame) {
     }
 
     // Get pieces at from and to squares
-    auto _board = board._board;
-    int from_piece = _board.at(move.from_square.first).at(move.from_square.second);
-    int to_piece = _board.at(move.to_square.first).at(move.to_square.second);
+    int from_piece = board.piece_at(move.from_square.first, move.from_square.second);
+    int to_piece = board.piece_at(move.to_square.first, move.to_square.second);
 
     int position_score = 0;
     if (from_piece != 0) {  // Valid moving piece exists
@@ -210,4 +220,9 @@ int move_value(const Board& board, const Move& move, bool endgame) {
     return (capture_value + position_score) * static_cast<int>(board.turn);
 }
 
-
+// Most valuable victim, least valuable attacker ordering score for a capture
+int mvv_lva(const Board& board, const Move& move) {
+    int victim = std::abs(board.piece_at(move.to_square.first, move.to_square.second));
+    int attacker = std::abs(board.piece_at(move.from_square.first, move.from_square.second));
+    return 10 * PIECE_VALUE[victim] - PIECE_VALUE[attacker];
+}
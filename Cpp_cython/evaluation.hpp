@@ -7,10 +7,13 @@
 #include "chess.hpp"
 #include <map>
 
+// Piece values indexed by piece type (1-6)
+extern const std::vector<int> PIECE_VALUE;
+
 int move_value(const Board& board, const Move& move, bool endgame);
-int evaluate_board(const std::vector<std::vector<int>>& board, bool endgame);
-bool check_end_game(const std::vector<std::vector<int>>& board);
+int evaluate_board(const std::array<int8_t, 64>& board);
 int evaluate_piece(int piece, std::pair<int, int> square, bool endgame);
+int mvv_lva(const Board& board, const Move& move);
 
 
 #endif //CYTHON_EVALUATION_H
@@ -3,43 +3,241 @@
 //
 
 #include "movegeneration.hpp"
+#include <cstring>
+#include <numeric>
 
 // Constants and types
-constexpr float MATE_SCORE = 1e9f;
-constexpr float MATE_THRESHOLD = 999000000.0f;
+// Being mated at ply scores -MATE_SCORE + ply; floats hold whole numbers exactly up to 2^24
+constexpr float MATE_SCORE = 1e7f;
+constexpr float MATE_THRESHOLD = MATE_SCORE - 2 * MAX_SEARCH_PLY;
+constexpr size_t TT_SIZE = 1 << 20;
+// Half width of the aspiration window around the previous iteration's score
+constexpr float ASPIRATION_WINDOW = 50.0f;
+// Bounds on the effective branching factor used to predict the next iteration's time: the
+// ratio of two iteration times is noise while they take microseconds
+constexpr double MIN_BRANCHING_FACTOR = 2.0;
+constexpr double MAX_BRANCHING_FACTOR = 8.0;
+// Slack for positional gains when pruning captures that cannot raise alpha
+constexpr float DELTA_MARGIN = 200.0f;
+// Move ordering: captures and promotions, then killer moves, then quiet moves by history
+constexpr long long CAPTURE_BONUS = 1LL << 30;
+constexpr long long KILLER_BONUS = 1LL << 29;
+// Sort key that puts the PV or transposition table move first
+constexpr long long HASH_MOVE_SCORE = 1LL << 62;
 
-// Debug information structure
-struct DebugInfo {
-    std::string engine;
-    int nodes = 0;
-    double time = 0.0;
+DebugInfo debug_info;
 
-    void clear() {
-        engine.clear();
-        nodes = 0;
-        time = 0.0;
+TranspositionTable transposition_table(TT_SIZE);
+thread_local std::unordered_map<uint64_t, Move> principal_variation;
+thread_local std::array<std::array<Move, 2>, MAX_PLY> killer_moves;
+thread_local long long history_table[2][64][64] = {};
+thread_local std::array<MoveList, MAX_SEARCH_PLY> move_stack;
+
+int search_threads = 1;
+std::atomic<bool> stop_search{false};
+thread_local long long search_nodes = 0;
+thread_local int search_seldepth = 0;
+
+void set_threads(int threads) {
+    search_threads = std::max(1, threads);
+}
+
+// True once the time limit has passed or the search has been stopped
+bool time_up(const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time, double time_limit) {
+    return stop_search.load(std::memory_order_relaxed) ||
+           std::chrono::duration<double>(std::chrono::high_resolution_clock::now() - start_time).count() >= time_limit;
+}
+
+// True if the next iteration is expected to finish before soft_limit: the last one's time
+// times the effective branching factor, the ratio of the last two iteration times kept
+// between MIN_BRANCHING_FACTOR and MAX_BRANCHING_FACTOR
+bool next_iteration_fits(double elapsed, double iteration_time, double previous_time, double soft_limit) {
+    if (previous_time <= 0) return elapsed < soft_limit;
+    double branching_factor = std::clamp(iteration_time / previous_time, MIN_BRANCHING_FACTOR, MAX_BRANCHING_FACTOR);
+    return elapsed + iteration_time * branching_factor < soft_limit;
+}
+
+void clear_move_ordering() {
+    killer_moves.fill({Move(), Move()});
+    std::fill(&history_table[0][0][0], &history_table[0][0][0] + 2 * 64 * 64, 0LL);
+}
+
+void age_move_ordering() {
+    killer_moves.fill({Move(), Move()});
+    for (auto& side : history_table)
+        for (auto& from : side)
+            for (long long& credit : from) credit /= 2;
+}
+
+void record_cutoff(const Board& board, const Move& move, int depth, int ply) {
+    auto& killers = killer_moves[std::min(ply, MAX_PLY - 1)];
+    if (!(killers[0] == move)) {
+        killers[1] = killers[0];
+        killers[0] = move;
     }
-} debug_info;
+    int side = board.turn == WHITE ? 0 : 1;
+    history_table[side][move.from_square.first * 8 + move.from_square.second]
+                 [move.to_square.first * 8 + move.to_square.second] += depth * depth;
+}
+
+// Mate scores count plies from the root while searching, from the node they belong to in the
+// transposition table, so that an entry holds at any depth it is probed from
+static float score_to_tt(float score, int ply) {
+    if (score >= MATE_THRESHOLD) return score + float(ply);
+    if (score <= -MATE_THRESHOLD) return score - float(ply);
+    return score;
+}
+
+static float score_from_tt(float score, int ply) {
+    if (score >= MATE_THRESHOLD) return score - float(ply);
+    if (score <= -MATE_THRESHOLD) return score + float(ply);
+    return score;
+}
+
+bool is_capture_or_promotion(const Board& board, const Move& move) {
+    return move.promotion != 0 || board.piece_at(move.to_square.first, move.to_square.second) * board.turn < 0;
+}
+
+// Packed entry: score bits 0-31, depth + 1 (0 for an empty slot) bits 32-39, flag bits 40-41,
+// generation bits 42-48 and the move (from, to and promotion) bits 49-63
+constexpr int TT_MAX_DEPTH = 254;
+
+static uint64_t pack_entry(int depth, int flag, float score, int generation, const Move& move) {
+    uint32_t score_bits;
+    std::memcpy(&score_bits, &score, sizeof score_bits);
+    uint64_t from = move.from_square.first * 8 + move.from_square.second;
+    uint64_t to = move.to_square.first * 8 + move.to_square.second;
+    return score_bits | uint64_t(std::min(depth, TT_MAX_DEPTH) + 1) << 32 | uint64_t(flag) << 40 |
+           uint64_t(generation & 0x7F) << 42 | from << 49 | to << 55 | uint64_t(move.promotion) << 61;
+}
+
+static TTEntry unpack_entry(uint64_t key, uint64_t data) {
+    TTEntry entry;
+    auto score_bits = static_cast<uint32_t>(data);
+    std::memcpy(&entry.score, &score_bits, sizeof score_bits);
+    entry.key = key;
+    entry.depth = int(data >> 32 & 0xFF) - 1;
+    entry.flag = int(data >> 40 & 0x3);
+    entry.generation = int(data >> 42 & 0x7F);
+    int from = int(data >> 49 & 0x3F), to = int(data >> 55 & 0x3F);
+    entry.move.from_square = {from / 8, from % 8};
+    entry.move.to_square = {to / 8, to % 8};
+    entry.move.promotion = int(data >> 61);
+    return entry;
+}
+
+TranspositionTable::TranspositionTable(size_t size) : slots(new Slot[size]), mask(size - 1) {}
+
+bool TranspositionTable::probe(uint64_t key, TTEntry& entry) const {
+    const Slot& slot = slots[key & mask];
+    uint64_t data = slot.data.load(std::memory_order_relaxed);
+    if ((data >> 32 & 0xFF) == 0 || (slot.key.load(std::memory_order_relaxed) ^ data) != key)
+        return false;
+    entry = unpack_entry(key, data);
+    return true;
+}
+
+void TranspositionTable::store(uint64_t key, int depth, int flag, float score, const Move& move) {
+    Slot& slot = slots[key & mask];
+    uint64_t old = slot.data.load(std::memory_order_relaxed);
+    uint64_t old_key = slot.key.load(std::memory_order_relaxed) ^ old;
+    if (int(old >> 32 & 0xFF) - 1 > depth && old_key != key && int(old >> 42 & 0x7F) == (generation & 0x7F))
+        return;
+    uint64_t data = pack_entry(depth, flag, score, generation, move);
+    slot.key.store(key ^ data, std::memory_order_relaxed);
+    slot.data.store(data, std::memory_order_relaxed);
+}
+
+void TranspositionTable::new_search() {
+    generation++;
+}
+
+void TranspositionTable::clear() {
+    for (size_t i = 0; i <= mask; ++i) {
+        slots[i].key.store(0, std::memory_order_relaxed);
+        slots[i].data.store(0, std::memory_order_relaxed);
+    }
+    generation = 0;
+}
+
+void clear_transposition_table() {
+    transposition_table.clear();
+}
 
 // Main search function
 [[maybe_unused]] Move next_move(Board& board, double time_limit, const std::string& name,
-               bool debug) {
+               bool debug, int max_depth, bool info, double soft_limit) {
     debug_info.clear();
     debug_info.engine = name;
+    transposition_table.new_search();
+    principal_variation.clear();
+    age_move_ordering();
+    stop_search = false;
+    search_nodes = 0;
 
     auto t0 = std::chrono::high_resolution_clock::now();
+    // Lazy SMP: the helpers search copies of the position on their own and only meet this
+    // thread in the transposition table
+    std::vector<std::thread> helpers;
+    std::vector<long long> helper_nodes(search_threads - 1, 0);
+    for (int i = 1; i < search_threads; ++i)
+        helpers.emplace_back([&helper_nodes, i, board, t0, time_limit] {
+            helper_nodes[i - 1] = search_helper(board, i, t0, time_limit);
+        });
     std::vector<Move> legal_moves = board.legal_moves();
     Move best_move;
+    best_move.from_square = {-1, -1};
     int depth = 1;
+    std::vector<std::pair<Move, float>> root_scores;
+    float score = 0.0f;
+    bool have_score = false;
+    double previous_time = 0.0;
 
-    while (std::chrono::duration<double>(std::chrono::high_resolution_clock::now() - t0).count() < time_limit) {
-        Move current_move = minimax_root(depth, board, t0, time_limit);
-        if (current_move.from_square.first != -1) { // Valid move check
+    // No iteration is started that is not expected to finish within the soft limit
+    soft_limit = std::min(soft_limit, time_limit);
+    while (depth <= max_depth && !time_up(t0, soft_limit)) {
+        // Aspiration window around the previous score; a failing side is opened up and searched again
+        float alpha = -INFINITY, beta = INFINITY;
+        if (have_score && std::abs(score) < MATE_THRESHOLD) {
+            alpha = score - ASPIRATION_WINDOW;
+            beta = score + ASPIRATION_WINDOW;
+        }
+        search_seldepth = 0;
+        Move current_move;
+        float value;
+        auto iteration_start = std::chrono::high_resolution_clock::now();
+        while (true) {
+            current_move = negamax_root(depth, board, alpha, beta, t0, time_limit, root_scores, value);
+            if (current_move.from_square.first == -1)
+                break;
+            if (value <= alpha) alpha = -INFINITY;
+            else if (value >= beta) beta = INFINITY;
+            else break;
+        }
+        // Only a completed iteration replaces the move and score of the previous one
+        if (current_move.from_square.first != -1) {
             best_move = current_move;
+            score = value;
+            have_score = true;
+            std::vector<Move> pv = extract_pv(board, depth);
+            update_principal_variation(board, pv);
+            if (info) {
+                double elapsed = std::chrono::duration<double>(std::chrono::high_resolution_clock::now() - t0).count();
+                std::cout << uci_info(depth, search_seldepth, search_nodes, elapsed, score, pv) << std::endl;
+            }
+            auto now = std::chrono::high_resolution_clock::now();
+            double iteration_time = std::chrono::duration<double>(now - iteration_start).count();
+            if (!next_iteration_fits(std::chrono::duration<double>(now - t0).count(), iteration_time,
+                                     previous_time, soft_limit))
+                break;
+            previous_time = iteration_time;
         }
         depth++;
     }
 
+    stop_search = true;
+    for (std::thread& helper : helpers) helper.join();
+    debug_info.nodes = std::accumulate(helper_nodes.begin(), helper_nodes.end(), search_nodes);
     debug_info.time = std::chrono::duration<double>(std::chrono::high_resolution_clock::now() - t0).count();
 
     if (debug) {
@@ -49,108 +247,292 @@ struct DebugInfo {
            << "', 'time': " << debug_info.time << "}";
         log_info(ss.str());
     }
-    best_move.from_square.first != -1 ? best_move :
-    legal_moves.at(0);
-
+    if (best_move.from_square.first == -1 && !legal_moves.empty())
+        return legal_moves.at(0);
     return best_move;
 }
 
-// Minimax root with iterative deepening
-Move minimax_root(int max_depth, Board board, const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time,
-                  double time_limit) {
-    bool is_maximizing = board.turn == WHITE;
-    float best_value = is_maximizing ? -INFINITY : INFINITY;
+// UCI info line for a completed iteration, mate scores as the moves to mate counted from the
+// plies in the score. The node count is this thread's.
+std::string uci_info(int depth, int seldepth, long long nodes, double elapsed, float score,
+                     const std::vector<Move>& pv) {
+    std::stringstream ss;
+    ss << "info depth " << depth << " seldepth " << std::max(seldepth, depth) << " nodes " << nodes
+       << " nps " << static_cast<long long>(nodes / std::max(elapsed, 1e-6))
+       << " time " << static_cast<long long>(elapsed * 1000) << " score ";
+    if (score >= MATE_THRESHOLD) ss << "mate " << (static_cast<int>(MATE_SCORE - score) + 1) / 2;
+    else if (score <= -MATE_THRESHOLD) ss << "mate " << -(static_cast<int>(MATE_SCORE + score) / 2);
+    else ss << "cp " << static_cast<int>(score);
+    ss << " pv";
+    for (const Move& move : pv) ss << " " << move.uci();
+    return ss.str();
+}
+
+// Lazy SMP helper thread: iterative deepening with full windows on its own copy of the board
+// until time runs out or the main search stops. Odd helpers start a ply deeper so that the
+// threads spread over the depths. Returns the number of nodes searched.
+long long search_helper(Board board, int index,
+                        const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time,
+                        double time_limit) {
+    search_nodes = 0;
+    std::vector<std::pair<Move, float>> root_scores;
+    float value;
+    for (int depth = 1 + index % 2; !time_up(start_time, time_limit); ++depth)
+        negamax_root(depth, board, -INFINITY, INFINITY, start_time, time_limit, root_scores, value);
+    return search_nodes;
+}
+
+// Principal variation search at the root; score receives the best value from the side to move's
+// view. Returns a move with from_square (-1, -1) when there is none or time runs out, as the
+// scores of an interrupted iteration are meaningless.
+Move negamax_root(int max_depth, Board& board, float alpha, float beta,
+                  const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time,
+                  double time_limit, std::vector<std::pair<Move, float>>& root_scores, float& score) {
+    float alpha_orig = alpha;
+    float best_value = -INFINITY;
     Move best_move;
     best_move.from_square = {-1, -1};
     best_move.to_square = {1, 1};
     best_move.promotion = 0;
+    score = best_value;
+
+    // Search in the order of the previous iteration's scores, best first
+    std::vector<Move> moves;
+    if (root_scores.empty()) {
+        MoveList& ordered = move_stack[0];
+        order_moves(board, ordered);
+        for (int i = 0; i < ordered.count; ++i) moves.push_back(ordered.pick(i));
+    } else {
+        std::stable_sort(root_scores.begin(), root_scores.end(),
+                         [](const std::pair<Move, float>& a, const std::pair<Move, float>& b) {
+                             return a.second > b.second;
+                         });
+        for (const auto& scored : root_scores) moves.push_back(scored.first);
+    }
+    auto pv_move = principal_variation.find(board.hash);
+    TTEntry entry;
+    bool found = transposition_table.probe(board.hash, entry);
+    if (pv_move != principal_variation.end() || found) {
+        const Move& first = pv_move != principal_variation.end() ? pv_move->second : entry.move;
+        auto it = std::find(moves.begin(), moves.end(), first);
+        if (it != moves.end()) std::rotate(moves.begin(), it, it + 1);
+    }
 
-    for (Move move : order_moves(board)) {
-        if (std::chrono::duration<double>(std::chrono::high_resolution_clock::now() - start_time).count() >= time_limit)
-            return best_move;
+    Move none = best_move;
+    root_scores.clear();
+    for (Move move : moves) {
+        if (time_up(start_time, time_limit))
+            return none;
 
         board.push(move);
-        float value = minimax(max_depth-1, board, -INFINITY, INFINITY, !is_maximizing,
-                              start_time, time_limit);
+        float value;
+        if (best_move.from_square.first == -1) {
+            value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit);
+        } else {
+            value = -negamax(max_depth - 1, board, -alpha - 1, -alpha, 1, start_time, time_limit);
+            if (value > alpha && value < beta)
+                value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit);
+        }
         board.pop();
+        root_scores.emplace_back(move, value);
 
-        if((board.turn == WHITE && value > best_value) ||
-           (board.turn == BLACK && value < best_value)){
+        if (value > best_value) {
             best_value = value;
             best_move = move;
+            score = best_value;
         }
+        alpha = std::max(alpha, value);
+        if (alpha >= beta) break;
     }
+    if (time_up(start_time, time_limit))
+        return none;
+    if (best_move.from_square.first != -1)
+        transposition_table.store(board.hash, max_depth, bound_flag(best_value, alpha_orig, beta), best_value, best_move);
     return best_move;
 }
 
-// Move ordering implementation
-std::vector<Move> order_moves(Board& board) {
-    bool endgame = check_end_game(board);
-    std::vector<std::pair<int, Move>> scored_moves;
+// Follow the transposition table moves from the current position
+std::vector<Move> extract_pv(Board& board, int max_length) {
+    std::vector<Move> pv;
+    std::vector<uint64_t> seen;
+    while (static_cast<int>(pv.size()) < max_length) {
+        TTEntry entry;
+        if (!transposition_table.probe(board.hash, entry) ||
+            std::find(seen.begin(), seen.end(), board.hash) != seen.end()) break;
+        MoveList& moves = move_stack[0];
+        board.generate_moves(moves);
+        if (moves.find(entry.move) < 0) break;
+        seen.push_back(board.hash);
+        pv.push_back(entry.move);
+        board.push(entry.move);
+    }
+    for (size_t i = 0; i < pv.size(); ++i) board.pop();
+    return pv;
+}
 
-    for (Move move : board.legal_moves()) {
-        scored_moves.emplace_back(move_value(board, move, endgame), move);
+// Remember the PV move of every position along the principal variation
+void update_principal_variation(Board& board, const std::vector<Move>& pv) {
+    principal_variation.clear();
+    for (const Move& move : pv) {
+        principal_variation[board.hash] = move;
+        board.push(move);
     }
+    for (size_t i = 0; i < pv.size(); ++i) board.pop();
+}
 
-    std::sort(scored_moves.begin(), scored_moves.end(),
-         [&](const std::pair<int, Move>& a, const std::pair<int, Move>& b) {
-             return board.turn == WHITE ? a.first > b.first : a.first < b.first;
-         });
+// Generate the legal moves into moves with their ordering scores, higher first for the side to
+// move: captures and promotions by heuristic value, then the killer moves of ply (none at the
+// root, ply < 0), then quiet moves by history
+void order_moves(Board& board, MoveList& moves, int ply) {
+    bool endgame = check_end_game(board);
+    int side = board.turn == WHITE ? 0 : 1;
+    std::array<Move, 2> killers = ply >= 0 ? killer_moves[std::min(ply, MAX_PLY - 1)] : std::array<Move, 2>();
 
-    std::vector<Move> ordered;
-    transform(scored_moves.begin(), scored_moves.end(), back_inserter(ordered),
-              [](const std::pair<int, Move>& p) { return p.second; });
-    return ordered;
+    board.generate_moves(moves);
+    for (int i = 0; i < moves.count; ++i) {
+        Move move = moves.get(i);
+        long long score = static_cast<long long>(move_value(board, move, endgame)) * board.turn;
+        if (is_capture_or_promotion(board, move)) score += CAPTURE_BONUS;
+        else if (move == killers[0]) score += KILLER_BONUS + 1;
+        else if (move == killers[1]) score += KILLER_BONUS;
+        else score += history_table[side][move.from_square.first * 8 + move.from_square.second]
+                                   [move.to_square.first * 8 + move.to_square.second];
+        moves.scores[i] = score;
+    }
 }
 
-// Core minimax algorithm with alpha-beta pruning
-float minimax(int depth, Board board, float alpha, float beta, bool is_maximizing,
+// Principal variation search (negamax form, scores from the side to move's view): the first
+// move gets the full window, later ones a null window re-searched only if they may beat alpha.
+// Quiet moves that cause a beta cutoff become killers for this ply and earn history credit.
+float negamax(int depth, Board& board, float alpha, float beta, int ply,
               const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time, double time_limit) {
-    debug_info.nodes++;
+    search_nodes++;
 
-    if (std::chrono::duration<double>(std::chrono::high_resolution_clock::now() - start_time).count() >= time_limit)
+    if (time_up(start_time, time_limit))
         return 0.0f;
 
-    if (board.is_checkmate()) {
-        float penalty = float(depth) * 1000.0f;
-        return is_maximizing ?
-            (-MATE_SCORE + penalty) :
-            (MATE_SCORE - penalty);
+    if (board.is_checkmate())
+        return -MATE_SCORE + float(ply);
+    // Mate distance pruning: no line from here beats being mated now or mating on the next move
+    alpha = std::max(alpha, -MATE_SCORE + float(ply));
+    beta = std::min(beta, MATE_SCORE - float(ply + 1));
+    if (alpha >= beta) return alpha;
+    if (depth == 0 || ply >= MAX_SEARCH_PLY) return quiescence(board, alpha, beta, ply, start_time, time_limit);
+
+    // Transposition table: cut off on a deep enough entry, otherwise search the PV or TT move first
+    TTEntry entry;
+    bool found = transposition_table.probe(board.hash, entry);
+    if (found && entry.depth >= depth) {
+        float tt_score = score_from_tt(entry.score, ply);
+        if (entry.flag == TT_EXACT) return tt_score;
+        if (entry.flag == TT_LOWER_BOUND) alpha = std::max(alpha, tt_score);
+        else beta = std::min(beta, tt_score);
+        if (alpha >= beta) return tt_score;
     }
-    if (depth == 0) return evaluate_board(board._board, false);
+    float alpha_orig = alpha, beta_orig = beta;
 
-    float value = is_maximizing ? -INFINITY : INFINITY;
-    for (Move move : order_moves(board)) {
-        board.push(move);
-        float current = minimax(depth-1, board, alpha, beta, !is_maximizing, start_time, time_limit);
-        board.pop();
+    MoveList& moves = move_stack[ply];
+    order_moves(board, moves, ply);
+    if (moves.count == 0) return 0.0f; // Stalemate
+    auto pv_move = principal_variation.find(board.hash);
+    if (pv_move != principal_variation.end() || found) {
+        int index = moves.find(pv_move != principal_variation.end() ? pv_move->second : entry.move);
+        if (index >= 0) moves.scores[index] = HASH_MOVE_SCORE;
+    }
 
-        if (is_maximizing) {
-            value = std::max(value, current);
-            alpha = std::max(alpha, value);
+    float value = -INFINITY;
+    Move best_move;
+    for (int i = 0; i < moves.count; ++i) {
+        Move move = moves.pick(i);
+        board.push(move);
+        float current;
+        if (i == 0) {
+            current = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit);
         } else {
-            value = std::min(value, current);
-            beta = std::min(beta, value);
+            current = -negamax(depth - 1, board, -alpha - 1, -alpha, ply + 1, start_time, time_limit);
+            if (current > alpha && current < beta)
+                current = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit);
         }
+        board.pop();
 
-        if (beta <= alpha) break;
+        if (current > value) {
+            value = current;
+            best_move = move;
+        }
+        alpha = std::max(alpha, value);
+        if (alpha >= beta) {
+            if (!is_capture_or_promotion(board, move)) record_cutoff(board, move, depth, ply);
+            break;
+        }
     }
+
+    // Scores of an interrupted search are not trustworthy, keep them out of the table
+    if (!time_up(start_time, time_limit))
+        transposition_table.store(board.hash, depth, bound_flag(value, alpha_orig, beta_orig), score_to_tt(value, ply),
+                                  best_move);
     return value;
 }
 
+// Capture-only search at the horizon: stand pat on the static evaluation, then try captures in
+// MVV-LVA order, skipping those that cannot lift the score to alpha even by winning the victim
+float quiescence(Board& board, float alpha, float beta, int ply,
+                 const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time, double time_limit) {
+    search_nodes++;
+    if (ply > search_seldepth) search_seldepth = ply;
+
+    if (time_up(start_time, time_limit))
+        return 0.0f;
+
+    float stand_pat = static_cast<float>(board.turn * evaluate_board(board._board));
+    if (stand_pat >= beta || ply >= MAX_SEARCH_PLY) return stand_pat;
+    alpha = std::max(alpha, stand_pat);
+
+    MoveList& moves = move_stack[ply];
+    order_captures(board, moves);
+    for (int i = 0; i < moves.count; ++i) {
+        Move move = moves.pick(i);
+        int victim = std::abs(board.piece_at(move.to_square.first, move.to_square.second));
+        if (stand_pat + static_cast<float>(PIECE_VALUE[victim]) + DELTA_MARGIN <= alpha) continue;
+
+        board.push(move);
+        float value = -quiescence(board, -beta, -alpha, ply + 1, start_time, time_limit);
+        board.pop();
+        if (value >= beta) return value;
+        alpha = std::max(alpha, value);
+    }
+    return alpha;
+}
+
+// Generate the legal captures of enemy pieces into moves, scored by MVV-LVA
+void order_captures(Board& board, MoveList& moves) {
+    board.generate_moves(moves);
+    int captures = 0;
+    for (int i = 0; i < moves.count; ++i) {
+        Move move = moves.get(i);
+        if (board.piece_at(move.to_square.first, move.to_square.second) * board.turn < 0) {
+            moves.moves[captures] = moves.moves[i];
+            moves.scores[captures++] = mvv_lva(board, move);
+        }
+    }
+    moves.count = captures;
+}
+
+// Transposition table flag for a score searched in the window (alpha, beta)
+int bound_flag(float value, float alpha, float beta) {
+    return value <= alpha ? TT_UPPER_BOUND : value >= beta ? TT_LOWER_BOUND : TT_EXACT;
+}
+
 // Function to check if the game is in an endgame state
 bool check_end_game(const Board& board) {
     int queens = 0;
     int minors = 0;
 
-    for (int x = 0; x < 8; ++x) {
-        for (int y = 0; y < 8; ++y) {
-            int piece = abs(board._board.at(x).at(y));
-            if (piece == QUEEN) {
-                queens++;
-            } else if (piece == BISHOP || piece == KNIGHT) {
-                minors++;
-            }
+    for (int square = 0; square < 64; ++square) {
+        int piece = abs(board._board[square]);
+        if (piece == QUEEN) {
+            queens++;
+        } else if (piece == BISHOP || piece == KNIGHT) {
+            minors++;
         }
     }
 
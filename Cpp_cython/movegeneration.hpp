@@ -11,20 +11,121 @@
 #include <cmath>
 #include <fstream>
 #include <sstream>
+#include <unordered_map>
+#include <array>
+#include <atomic>
+#include <memory>
+#include <thread>
 #include "chess.hpp"
 #include "evaluation.hpp"
 
+// Statistics of the last next_move call
+struct DebugInfo {
+    std::string engine;
+    long long nodes = 0;
+    double time = 0.0;
+
+    void clear() {
+        engine.clear();
+        nodes = 0;
+        time = 0.0;
+    }
+};
+
+extern DebugInfo debug_info;
+
+// Transposition table bound types
+enum TTFlag { TT_EXACT, TT_LOWER_BOUND, TT_UPPER_BOUND };
+
+struct TTEntry {
+    uint64_t key = 0;
+    int depth = -1;
+    int flag = TT_EXACT;
+    float score = 0.0f;
+    int generation = 0;
+    Move move;
+};
+
+// Fixed-size table indexed by the low bits of the Zobrist key, shared by the search threads
+// without locks: a slot holds its entry packed into one 64-bit word and the key xor that word,
+// so a slot torn by two threads writing at once fails the key check instead of returning a
+// mixed entry. A slot is overwritten unless it holds a deeper entry of another position from
+// the current search.
+class TranspositionTable {
+public:
+    explicit TranspositionTable(size_t size);
+    bool probe(uint64_t key, TTEntry& entry) const;
+    void store(uint64_t key, int depth, int flag, float score, const Move& move);
+    void new_search();
+    void clear();
+
+private:
+    struct Slot {
+        std::atomic<uint64_t> key{0};
+        std::atomic<uint64_t> data{0};
+    };
+    std::unique_ptr<Slot[]> slots;
+    size_t mask;
+    int generation = 0;
+};
+
+extern TranspositionTable transposition_table;
+
+// Zobrist key -> move along the principal variation of the last completed iteration
+extern thread_local std::unordered_map<uint64_t, Move> principal_variation;
+
+// Two quiet moves per ply that caused a beta cutoff (most recent first) and the butterfly
+// history of cutoff credit by side to move, from and to square. Like the principal variation
+// they are kept per search thread.
+constexpr int MAX_PLY = 64;
+extern thread_local std::array<std::array<Move, 2>, MAX_PLY> killer_moves;
+extern thread_local long long history_table[2][64][64];
+
+// Moves of every ply of the current search path, reused from node to node; quiescence
+// stops extending the path at MAX_SEARCH_PLY
+constexpr int MAX_SEARCH_PLY = 128;
+extern thread_local std::array<MoveList, MAX_SEARCH_PLY> move_stack;
+
+// Threads searching in next_move (UCI option Threads): the calling thread and Threads - 1
+// Lazy SMP helpers, which share the transposition table and nothing else
+extern int search_threads;
+extern std::atomic<bool> stop_search;
+extern thread_local long long search_nodes;
+// Deepest ply the current iteration reached, quiescence included (UCI seldepth)
+extern thread_local int search_seldepth;
+
 // Forward declarations
 bool check_end_game(const Board& board);
-Move minimax_root(int max_depth, Board board, const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time,
-                  double time_limit);
-std::vector<Move> order_moves(Board& board);
+Move negamax_root(int max_depth, Board& board, float alpha, float beta,
+                  const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time,
+                  double time_limit, std::vector<std::pair<Move, float>>& root_scores, float& score);
+void order_moves(Board& board, MoveList& moves, int ply = -1);
+bool is_capture_or_promotion(const Board& board, const Move& move);
+void record_cutoff(const Board& board, const Move& move, int depth, int ply);
+void age_move_ordering();
+std::vector<Move> extract_pv(Board& board, int max_length);
+void update_principal_variation(Board& board, const std::vector<Move>& pv);
 
 [[maybe_unused]] Move next_move(Board& board, double time_limit, const std::string& name,
-               bool debug = true);
-float minimax(int depth, Board board, float alpha, float beta, bool is_maximizing,
+               bool debug = true, int max_depth = MAX_SEARCH_PLY, bool info = false,
+               double soft_limit = INFINITY);
+std::string uci_info(int depth, int seldepth, long long nodes, double elapsed, float score,
+                     const std::vector<Move>& pv);
+long long search_helper(Board board, int index,
+                        const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time,
+                        double time_limit);
+bool time_up(const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time, double time_limit);
+bool next_iteration_fits(double elapsed, double iteration_time, double previous_time, double soft_limit);
+void set_threads(int threads);
+float negamax(int depth, Board& board, float alpha, float beta, int ply,
               const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time, double time_limit);
+float quiescence(Board& board, float alpha, float beta, int ply,
+                 const std::chrono::time_point<std::chrono::high_resolution_clock>& start_time, double time_limit);
+void order_captures(Board& board, MoveList& moves);
+int bound_flag(float value, float alpha, float beta);
 void log_info(const std::string& message);
+void clear_transposition_table();
+void clear_move_ordering();
 
 
 #endif //CYTHON_MOVEGENERATION_H
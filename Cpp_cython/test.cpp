@@ -5,13 +5,14 @@
 #include <iostream>
 
 #include "chess.hpp"
+#include "movegeneration.hpp"
 
 
-void print_board(std::vector<std::vector<int>> board) {
+void print_board(const std::array<int8_t, 64>& board) {
     std::cout << "--------------" << std::endl;
-    for (int i = 0; i < board.size(); i++) {
-        for (int j = 0; j < board[i].size(); j++) {
-            std::cout << board[i][j] << " ";
+    for (int i = 0; i < 8; i++) {
+        for (int j = 0; j < 8; j++) {
+            std::cout << int(board[8 * i + j]) << " ";
         }
         std::cout << std::endl;
     }
@@ -23,15 +24,15 @@ void test_initial_position() {
 
     // Test pawn positions
     for(int col = 0; col < 8; col++) {
-        assert(board._board[1][col] == BLACK*PAWN);
-        assert(board._board[6][col] == WHITE*PAWN);
+        assert(board.piece_at(1, col) == BLACK*PAWN);
+        assert(board.piece_at(6, col) == WHITE*PAWN);
     }
 
     // Test back ranks
-    assert(board._board[0][0] == BLACK*ROOK);
-    assert(board._board[0][4] == BLACK*KING);
-    assert(board._board[7][7] == WHITE*ROOK);
-    assert(board._board[7][3] == WHITE*QUEEN);
+    assert(board.piece_at(0, 0) == BLACK*ROOK);
+    assert(board.piece_at(0, 4) == BLACK*KING);
+    assert(board.piece_at(7, 7) == WHITE*ROOK);
+    assert(board.piece_at(7, 3) == WHITE*QUEEN);
 }
 
 void test_pawn_move() {
@@ -42,14 +43,14 @@ void test_pawn_move() {
     board.push_uci("e2e4");
 
     // Verify move
-    assert(board._board[6][4] == 0);          // e2 empty
-    assert(board._board[4][4] == WHITE*PAWN); // e4 has pawn
+    assert(board.piece_at(6, 4) == 0);          // e2 empty
+    assert(board.piece_at(4, 4) == WHITE*PAWN); // e4 has pawn
     assert(board.turn == BLACK);
 
     // Pop move
     board.pop();
-    assert(board._board[6][4] == WHITE*PAWN); // e2 restored
-    assert(board._board[4][4] == 0);          // e4 empty
+    assert(board.piece_at(6, 4) == WHITE*PAWN); // e2 restored
+    assert(board.piece_at(4, 4) == 0);          // e4 empty
     assert(board.turn == WHITE);
 }
 
@@ -61,14 +62,14 @@ void test_capture() {
     board.push_uci("e4d5");
 
     // Verify capture
-    assert(board._board[4][3] == 0);          // e4 empty
-    assert(board._board[3][3] == WHITE*PAWN); // d5 has white pawn
-    assert(board._board[3][3] == WHITE*PAWN); // Black pawn captured
+    assert(board.piece_at(4, 3) == 0);          // e4 empty
+    assert(board.piece_at(3, 3) == WHITE*PAWN); // d5 has white pawn
+    assert(board.piece_at(3, 3) == WHITE*PAWN); // Black pawn captured
 
     // Pop should restore both pieces
     board.pop();
-    assert(board._board[4][4] == WHITE*PAWN); // e4 restored
-    assert(board._board[3][3] == BLACK*PAWN); // d5 restored
+    assert(board.piece_at(4, 4) == WHITE*PAWN); // e4 restored
+    assert(board.piece_at(3, 3) == BLACK*PAWN); // d5 restored
 }
 
 void test_legal_moves() {
@@ -98,15 +99,15 @@ void test_capture_restoration() {
     board.push_uci("e4d5");
 
     // Verify capture
-    assert(board._board[3][3] == WHITE*PAWN);  // d5
-    assert(board._board[4][4] == 0);           // e4
+    assert(board.piece_at(3, 3) == WHITE*PAWN);  // d5
+    assert(board.piece_at(4, 4) == 0);           // e4
 
     // Undo move
     board.pop();
 
     // Verify restoration
-    assert(board._board[4][4] == WHITE*PAWN);  // e4
-    assert(board._board[3][3] == BLACK*PAWN);  // d5
+    assert(board.piece_at(4, 4) == WHITE*PAWN);  // e4
+    assert(board.piece_at(3, 3) == BLACK*PAWN);  // d5
     assert(board.turn == WHITE);
 }
 
@@ -115,19 +116,19 @@ void test_basic_push_pop() {
     board.reset();
 
     // Initial pawn position
-    assert(board._board[6][4] == WHITE*PAWN); // e2
+    assert(board.piece_at(6, 4) == WHITE*PAWN); // e2
     assert(board.turn == WHITE);
 
     // Push e2e4
     board.push_uci("e2e4");
-    assert(board._board[6][4] == 0);          // e2 empty
-    assert(board._board[4][4] == WHITE*PAWN); // e4 has pawn
+    assert(board.piece_at(6, 4) == 0);          // e2 empty
+    assert(board.piece_at(4, 4) == WHITE*PAWN); // e4 has pawn
     assert(board.turn == BLACK);
 
     // Pop move
     board.pop();
-    assert(board._board[6][4] == WHITE*PAWN); // e2 restored
-    assert(board._board[4][4] == 0);          // e4 empty
+    assert(board.piece_at(6, 4) == WHITE*PAWN); // e2 restored
+    assert(board.piece_at(4, 4) == 0);          // e4 empty
     assert(board.turn == WHITE);
 }
 
@@ -136,19 +137,19 @@ void test_capture_restoration2() {
     board.set_fen("rnbqkbnr/ppp1pppp/8/3p4/4P3/8/PPPP1PPP/RNBQKBNR w KQkq - 0 1");
 
     // Verify initial state
-    assert(board._board[4][4] == WHITE*PAWN); // e4
-    assert(board._board[3][3] == BLACK*PAWN); // d5
+    assert(board.piece_at(4, 4) == WHITE*PAWN); // e4
+    assert(board.piece_at(3, 3) == BLACK*PAWN); // d5
 
     // Capture pawn
     board.push_uci("e4d5");
-    assert(board._board[4][4] == 0);          // e4 empty
-    assert(board._board[3][3] == WHITE*PAWN); // d5 has white pawn
+    assert(board.piece_at(4, 4) == 0);          // e4 empty
+    assert(board.piece_at(3, 3) == WHITE*PAWN); // d5 has white pawn
     assert(board.turn == BLACK);
 
     // Undo capture
     board.pop();
-    assert(board._board[4][4] == WHITE*PAWN); // e4 restored
-    assert(board._board[3][3] == BLACK*PAWN); // d5 restored
+    assert(board.piece_at(4, 4) == WHITE*PAWN); // e4 restored
+    assert(board.piece_at(3, 3) == BLACK*PAWN); // d5 restored
     assert(board.turn == WHITE);
 }
 
@@ -162,9 +163,9 @@ void test_multiple_move_rollback() {
     board.push_uci("g1f3");  // White
 
     // Verify final state
-    assert(board._board[4][4] == WHITE*PAWN);
-    assert(board._board[3][4] == BLACK*PAWN);
-    assert(board._board[5][5] == WHITE*KNIGHT);
+    assert(board.piece_at(4, 4) == WHITE*PAWN);
+    assert(board.piece_at(3, 4) == BLACK*PAWN);
+    assert(board.piece_at(5, 5) == WHITE*KNIGHT);
     assert(board.turn == BLACK);
 
     // Rollback all moves
@@ -173,9 +174,9 @@ void test_multiple_move_rollback() {
     board.pop();  // e4
 
     // Verify initial state
-    assert(board._board[6][4] == WHITE*PAWN);
-    assert(board._board[1][4] == BLACK*PAWN);
-    assert(board._board[7][6] == WHITE*KNIGHT);
+    assert(board.piece_at(6, 4) == WHITE*PAWN);
+    assert(board.piece_at(1, 4) == BLACK*PAWN);
+    assert(board.piece_at(7, 6) == WHITE*KNIGHT);
     assert(board.turn == WHITE);
 }
 
@@ -190,8 +191,8 @@ void test_check_state_rollback() {
 
     // Undo check
     board.pop();
-    assert(board._board[6][4] == WHITE*ROOK);  // e2 restored
-    assert(board._board[1][4] == BLACK*ROOK);   // e7 restored
+    assert(board.piece_at(6, 4) == WHITE*ROOK);  // e2 restored
+    assert(board.piece_at(1, 4) == BLACK*ROOK);   // e7 restored
     assert(board.is_square_attacked({4,4}, BLACK) == true);
 }
 
@@ -233,44 +234,99 @@ void test_multiple_consecutive_captures() {
     // First capture: pawn takes pawn (d5xc6)
     board.push_uci("d5d6");
     print_board(board._board);
-    assert(board._board[3][3] == 0);          // d5 empty
-    assert(board._board[2][3] == WHITE*ROOK); // c6 now has white pawn
-    assert(board._board[1][2] == BLACK*PAWN); // c7 still has black pawn
+    assert(board.piece_at(3, 3) == 0);          // d5 empty
+    assert(board.piece_at(2, 3) == WHITE*ROOK); // c6 now has white pawn
+    assert(board.piece_at(1, 2) == BLACK*PAWN); // c7 still has black pawn
     assert(board.turn == BLACK);
 
     // Second capture: pawn takes knight (c6xd7)
     board.push_uci("d6d7");
     print_board(board._board);
-    assert(board._board[2][2] == 0);          // c6 empty
-    assert(board._board[1][3] == WHITE*ROOK); // d7 now has white pawn
-    assert(board._board[5][3] == 0);          // d6 empty
+    assert(board.piece_at(2, 2) == 0);          // c6 empty
+    assert(board.piece_at(1, 3) == WHITE*ROOK); // d7 now has white pawn
+    assert(board.piece_at(5, 3) == 0);          // d6 empty
     assert(board.turn == WHITE);
 
     // Third capture: pawn takes bishop (e4xf3)
     board.push_uci("f3e4");
     print_board(board._board);
-    assert(board._board[3][4] == 0);          // e4 empty
-    assert(board._board[4][4] == BLACK*BISHOP); // f3 now has white pawn
-    assert(board._board[2][5] == 0);           // Original bishop gone
+    assert(board.piece_at(3, 4) == 0);          // e4 empty
+    assert(board.piece_at(4, 4) == BLACK*BISHOP); // f3 now has white pawn
+    assert(board.piece_at(2, 5) == 0);           // Original bishop gone
     assert(board.turn == BLACK);
 
     // Undo all moves
     board.pop(); // Undo e4xf3
     print_board(board._board);
-    assert(board._board[4][4] == WHITE*PAWN); // e4 restored
-    assert(board._board[5][5] == BLACK*BISHOP); // f3 bishop restored
+    assert(board.piece_at(4, 4) == WHITE*PAWN); // e4 restored
+    assert(board.piece_at(5, 5) == BLACK*BISHOP); // f3 bishop restored
     assert(board.turn == WHITE);
 
     board.pop(); // Undo c6xd7
     print_board(board._board);
-    assert(board._board[2][3] == WHITE*ROOK); // c6 restored
-    assert(board._board[1][3] == 0);          // d7 empty
+    assert(board.piece_at(2, 3) == WHITE*ROOK); // c6 restored
+    assert(board.piece_at(1, 3) == 0);          // d7 empty
     assert(board.turn == BLACK);
 
     board.pop(); // Undo d5xc6
     print_board(board._board);
 }
 
+void test_zobrist_hash() {
+    Board board;
+    board.reset();
+    uint64_t start = board.hash;
+
+    // Incremental key matches a full computation, through castling and captures
+    board.set_fen("r3k2r/ppp2ppp/8/3p4/4P3/8/PPP2PPP/R3K2R w KQkq - 0 1");
+    uint64_t before = board.hash;
+    for (const char* move : {"e4d5", "e8c8", "e1g1", "d8d5"}) {
+        board.push_uci(move);
+        assert(board.hash == board.compute_hash());
+    }
+    for (int i = 0; i < 4; i++) board.pop();
+    assert(board.hash == before);
+
+    // Transpositions share a key
+    Board a, b;
+    a.push_uci("g1f3"); a.push_uci("g8f6"); a.push_uci("b1c3");
+    b.push_uci("b1c3"); b.push_uci("g8f6"); b.push_uci("g1f3");
+    assert(a.hash == b.hash);
+    assert(a.hash != start);
+}
+
+void test_perft() {
+    Board board;
+    board.reset();
+    uint64_t before = board.hash;
+
+    // Reference counts of the starting position, which has no castling or en passant this shallow
+    assert(board.perft(1) == 20);
+    assert(board.perft(2) == 400);
+    assert(board.perft(3) == 8902);
+    assert(board.hash == before);
+
+    uint64_t total = 0;
+    for (const auto& [move, nodes] : board.perft_divide(3)) total += nodes;
+    assert(total == 8902);
+}
+
+void test_search_mate_in_one() {
+    // Searched as deep as a second allows, where longer mates are within reach as well; the
+    // shortest one has to win
+    for (int threads : {1, 2}) {
+        set_threads(threads);
+        for (const char* fen : {"6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", "7k/8/6K1/8/8/8/8/R7 w - - 0 1"}) {
+            Board board;
+            board.set_fen(fen);
+            clear_transposition_table();
+            clear_move_ordering();
+            assert(next_move(board, 1.0, "test", false).uci() == "a1a8");
+        }
+    }
+    set_threads(1);
+}
+
 int main() {
     test_initial_position();
     test_pawn_move();
@@ -286,6 +342,9 @@ int main() {
     test_stack_underflow_protection();
 
     test_multiple_consecutive_captures();
+    test_zobrist_hash();
+    test_perft();
+    test_search_mate_in_one();
 
     std::cout << "All basic board tests passed!" << std::endl;
     return 0;
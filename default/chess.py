@@ -1,7 +1,7 @@
-from typing import Tuple
+import random
+from typing import Dict, Tuple
 
 import numpy as np
-from queue import LifoQueue
 
 WHITE = 1
 BLACK = -1
@@ -12,11 +12,194 @@ ROOK = 4
 QUEEN = 5
 KING = 6
 
+# Castling rights bit flags
+CASTLE_WHITE_KINGSIDE = 1
+CASTLE_WHITE_QUEENSIDE = 2
+CASTLE_BLACK_KINGSIDE = 4
+CASTLE_BLACK_QUEENSIDE = 8
+CASTLE_ALL = 15
+CASTLING_FLAGS = {'K': CASTLE_WHITE_KINGSIDE, 'Q': CASTLE_WHITE_QUEENSIDE,
+                  'k': CASTLE_BLACK_KINGSIDE, 'q': CASTLE_BLACK_QUEENSIDE}
+
+# Rights that survive a move from or to each square (indexed 8 * x + y):
+# moving the king or a rook, or capturing a rook, clears the matching flags.
+CASTLING_MASK = [CASTLE_ALL] * 64
+CASTLING_MASK[0] &= ~CASTLE_BLACK_QUEENSIDE
+CASTLING_MASK[4] &= ~(CASTLE_BLACK_KINGSIDE | CASTLE_BLACK_QUEENSIDE)
+CASTLING_MASK[7] &= ~CASTLE_BLACK_KINGSIDE
+CASTLING_MASK[56] &= ~CASTLE_WHITE_QUEENSIDE
+CASTLING_MASK[60] &= ~(CASTLE_WHITE_KINGSIDE | CASTLE_WHITE_QUEENSIDE)
+CASTLING_MASK[63] &= ~CASTLE_WHITE_KINGSIDE
+
+
+def parse_castling_and_ep(fen_parts):
+    """Castling bit flags and en passant square (x, y) from split FEN fields."""
+    castling_rights = 0
+    if len(fen_parts) > 2:
+        for char in fen_parts[2]:
+            castling_rights |= CASTLING_FLAGS.get(char, 0)
+    ep_square = None
+    if len(fen_parts) > 3 and fen_parts[3] != '-':
+        ep_square = (8 - int(fen_parts[3][1]), ord(fen_parts[3][0]) - ord('a'))
+    return castling_rights, ep_square
+
+
+# Zobrist keys: one per (piece, square) indexed [piece + 6][8 * x + y], one for
+# black to move, one per castling-rights combination and one per en passant file.
+_zobrist_random = random.Random(0x5A0B)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(64) for _ in range(64)] for _ in range(13)]
+ZOBRIST_TURN = _zobrist_random.getrandbits(64)
+ZOBRIST_CASTLING = [_zobrist_random.getrandbits(64) for _ in range(16)]
+ZOBRIST_EP = [_zobrist_random.getrandbits(64) for _ in range(8)]
+
+
+def zobrist_hash(pieces, turn, castling_rights, ep_square):
+    """Zobrist key from a square -> piece mapping and the side/castling/ep state."""
+    key = ZOBRIST_CASTLING[castling_rights]
+    for (x, y), piece in pieces:
+        key ^= ZOBRIST_PIECES[piece + 6][8 * x + y]
+    if turn == BLACK:
+        key ^= ZOBRIST_TURN
+    if ep_square is not None:
+        key ^= ZOBRIST_EP[ep_square[1]]
+    return key
+
+
+# Game phase weight of each piece type, indexed by abs(piece): TOTAL_PHASE
+# with every knight, bishop, rook and queen on the board, 0 with only kings
+# and pawns left
+PHASE_WEIGHT = (0, 0, 1, 1, 2, 4, 0)
+TOTAL_PHASE = 24
+
+
+def piece_square_tables():
+    """
+    Material plus piece-square values from evaluate.py as (midgame, endgame)
+    tables indexed [piece + 6][8 * x + y] and signed from white's point of
+    view. Imported on first use because evaluate imports this module.
+    """
+    from evaluate import PIECE_SQUARE_MG, PIECE_SQUARE_EG
+    return PIECE_SQUARE_MG, PIECE_SQUARE_EG
+
+
+def game_phase(counts):
+    """Game phase of the per-piece counts (indexed piece + 6), see PHASE_WEIGHT."""
+    return sum(PHASE_WEIGHT[abs(piece - 6)] * count for piece, count in enumerate(counts))
+
+
+def score_pieces(pieces):
+    """
+    Midgame and endgame material plus piece-square sums and the per-piece
+    counts (indexed piece + 6) of an iterable of ((x, y), piece) pairs.
+    """
+    mg_table, eg_table = piece_square_tables()
+    mg = eg = 0
+    counts = [0] * 13
+    for (x, y), piece in pieces:
+        mg += mg_table[piece + 6][8 * x + y]
+        eg += eg_table[piece + 6][8 * x + y]
+        counts[piece + 6] += 1
+    return (mg, eg), counts
+
+
+SAN_PIECES = {'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+
+
+def parse_san(board, san: str):
+    """
+    Convert a move in standard algebraic notation, as written in PGN files,
+    to a Move for the side to move on board (a Board or BitboardBoard).
+    Castling and en passant are built directly from the notation; anything
+    else must match exactly one legal move, otherwise ValueError is raised.
+    """
+    text = san.rstrip('+#!?')
+    home = 7 if board.turn == WHITE else 0
+    if text in ('O-O', '0-0'):
+        return Move((home, 4), (home, 6))
+    if text in ('O-O-O', '0-0-0'):
+        return Move((home, 4), (home, 2))
+
+    promotion = None
+    if text[-1] in SAN_PIECES:
+        promotion = SAN_PIECES[text[-1]]
+        text = text[:-1].rstrip('=')
+    piece_type = SAN_PIECES.get(text[0], PAWN)
+    if piece_type != PAWN:
+        text = text[1:]
+    to_square = (8 - int(text[-1]), ord(text[-2]) - ord('a'))
+    hint = text[:-2].replace('x', '')
+
+    candidates = []
+    for move in board.legal_moves():
+        x, y = move.from_square
+        if move.to_square != to_square or move.promotion != promotion or \
+                abs(board.piece_at(move.from_square)) != piece_type:
+            continue
+        if all(y == ord(c) - ord('a') if c.isalpha() else x == 8 - int(c) for c in hint):
+            candidates.append(move)
+    if not candidates and piece_type == PAWN and hint and board.piece_at(to_square) == 0:
+        # En passant: the capturing pawn stands one rank behind the target square
+        return Move((to_square[0] + board.turn, ord(hint[0]) - ord('a')), to_square)
+    if len(candidates) != 1:
+        raise ValueError(f"Illegal or ambiguous move: {san}")
+    return candidates[0]
+
+# Piece move offsets (dx, dy) on the 8x8 board
+KNIGHT_OFFSETS = [(-2, -1), (-1, -2), (1, -2), (2, -1),
+                  (2, 1), (1, 2), (-1, 2), (-2, 1)]
+KING_OFFSETS = [(-1, -1), (-1, 0), (-1, 1),
+                (0, -1), (0, 1),
+                (1, -1), (1, 0), (1, 1)]
+DIAGONAL_DIRECTIONS = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
+STRAIGHT_DIRECTIONS = [(-1, 0), (1, 0), (0, -1), (0, 1)]
+
+
+def _target_squares(offsets):
+    """(x, y) squares reached from each square 8 * x + y by the offsets that stay on the board."""
+    return [[(sq // 8 + dx, sq % 8 + dy) for dx, dy in offsets
+             if 0 <= sq // 8 + dx < 8 and 0 <= sq % 8 + dy < 8] for sq in range(64)]
+
+
+def _ray_squares(directions):
+    """Per square, one list per direction of the (x, y) squares along it, nearest first."""
+    table = []
+    for sq in range(64):
+        rays = []
+        for dx, dy in directions:
+            ray = []
+            x, y = sq // 8 + dx, sq % 8 + dy
+            while 0 <= x < 8 and 0 <= y < 8:
+                ray.append((x, y))
+                x += dx
+                y += dy
+            rays.append(ray)
+        table.append(rays)
+    return table
+
+
+# Mailbox attack tables for Board, indexed by square 8 * x + y
+KNIGHT_SQUARES = _target_squares(KNIGHT_OFFSETS)
+KING_SQUARES = _target_squares(KING_OFFSETS)
+# Squares a pawn of the given color attacks from each square
+PAWN_CAPTURE_SQUARES = {WHITE: _target_squares([(-1, -1), (-1, 1)]),
+                        BLACK: _target_squares([(1, -1), (1, 1)])}
+DIAGONAL_RAYS = _ray_squares(DIAGONAL_DIRECTIONS)
+STRAIGHT_RAYS = _ray_squares(STRAIGHT_DIRECTIONS)
+SLIDER_RAYS = {BISHOP: DIAGONAL_RAYS, ROOK: STRAIGHT_RAYS,
+               QUEEN: [diagonal + straight for diagonal, straight in zip(DIAGONAL_RAYS, STRAIGHT_RAYS)]}
+
 class Move:
-    def __init__(self):
-        self.to_square = None
-        self.from_square = None
-        self.promotion = None
+    def __init__(self, from_square=None, to_square=None, promotion=None):
+        self.to_square = to_square
+        self.from_square = from_square
+        self.promotion = promotion
+
+    def __eq__(self, other):
+        return isinstance(other, Move) and self.from_square == other.from_square and \
+            self.to_square == other.to_square and self.promotion == other.promotion
+
+    def __hash__(self):
+        return hash((self.from_square, self.to_square, self.promotion))
 
     def __str__(self):
         """
@@ -51,6 +234,84 @@ class Move:
         else:
             return from_notation + to_notation
 
+# Upper bound on the pseudo-legal moves of a position, which can exceed the
+# 218 legal moves of the richest known one; buffers passed to generate_moves
+# hold this many
+MAX_MOVES = 320
+
+# Every move as one shared Move object indexed by from | to << 6 | promotion << 12
+# (squares as 8 * x + y), so that move generation hands out existing objects
+# instead of building new ones. Promotions exist for pawn steps to the last rank.
+MOVES = [None] * (QUEEN + 1 << 12)
+for _from in range(64):
+    for _to in range(64):
+        MOVES[_from | _to << 6] = Move((_from // 8, _from % 8), (_to // 8, _to % 8))
+        if (_from // 8, _to // 8) in ((1, 0), (6, 7)) and abs(_from % 8 - _to % 8) <= 1:
+            for _promo in (KNIGHT, BISHOP, ROOK, QUEEN):
+                MOVES[_from | _to << 6 | _promo << 12] = Move((_from // 8, _from % 8), (_to // 8, _to % 8), _promo)
+
+
+
+def board_fen(board) -> str:
+    """
+    FEN of the position on board (a Board or BitboardBoard). The boards do
+    not count moves, so the move counters are always written as 0 1.
+    """
+    rows = []
+    for x in range(8):
+        row = ""
+        empty = 0
+        for y in range(8):
+            piece = int(board.piece_at((x, y)))
+            if not piece:
+                empty += 1
+                continue
+            if empty:
+                row += str(empty)
+                empty = 0
+            letter = "pnbrqk"[abs(piece) - 1]
+            row += letter.upper() if piece > 0 else letter
+        rows.append(row + str(empty) if empty else row)
+    castling = "".join(char for char, flag in CASTLING_FLAGS.items() if board.castling_rights & flag) or "-"
+    ep = "-" if board.ep_square is None else chr(ord('a') + board.ep_square[1]) + str(8 - board.ep_square[0])
+    return f"{'/'.join(rows)} {'w' if board.turn == WHITE else 'b'} {castling} {ep} 0 1"
+
+
+def perft(board, depth: int) -> int:
+    """
+    Count the leaves of the legal move tree of board to the given depth, for
+    measuring move generation apart from the search. The last ply is counted
+    without playing its moves.
+    """
+    if depth <= 0:
+        return 1
+    moves = [None] * MAX_MOVES
+    count = board.generate_moves(moves)
+    is_legal = board.is_legal
+    if depth == 1:
+        return sum(1 for move in moves[:count] if is_legal(move))
+    nodes = 0
+    for move in moves[:count]:
+        if is_legal(move):
+            board.push(move)
+            nodes += perft(board, depth - 1)
+            board.pop()
+    return nodes
+
+
+def perft_divide(board, depth: int) -> Dict[str, int]:
+    """
+    perft(depth - 1) below each legal move of board, keyed by the move in
+    UCI notation, for finding the move where two move generators disagree.
+    """
+    counts = {}
+    for move in list(board.legal_moves()):
+        board.push(move)
+        counts[str(move)] = perft(board, depth - 1)
+        board.pop()
+    return counts
+
+
 class Piece:
     def __init__(self, color=None, piece_type=None):
         self.color = color
@@ -68,7 +329,13 @@ class Board:
                                [0,0,0,0,0,0,0,0],
                                [1,1,1,1,1,1,1,1],
                                [4,2,3,5,6,3,2,4]],dtype=np.int64).copy()
-        self.event = LifoQueue()
+        self.castling_rights = CASTLE_ALL
+        self.ep_square = None
+        self._history = []
+        self._pins = None
+        self._init_piece_lists()
+        self._hash = self._compute_hash()
+        self._init_scores()
 
     def reset(self):
         self.__init__()
@@ -111,6 +378,74 @@ class Board:
                 col += 1
 
         self.turn = WHITE if parts[1]=="w" else BLACK
+        self.castling_rights, self.ep_square = parse_castling_and_ep(parts)
+        self._history = []
+        self._pins = None
+        self._init_piece_lists()
+        self._hash = self._compute_hash()
+        self._init_scores()
+
+    def _init_piece_lists(self):
+        """
+        Build the per-side piece lists (square -> piece) and king squares
+        that push/pop keep up to date from here on.
+        """
+        self._pieces = {WHITE: {}, BLACK: {}}
+        self._king_squares = {WHITE: None, BLACK: None}
+        for x, y in zip(*np.nonzero(self._board)):
+            square = (int(x), int(y))
+            piece = self._board.item(square)
+            color = WHITE if piece > 0 else BLACK
+            self._pieces[color][square] = piece
+            if abs(piece) == KING:
+                self._king_squares[color] = square
+
+    def piece_list(self, color: int):
+        """
+        Return the square -> piece dict of one side. It is the board's own
+        incrementally maintained list and must not be modified.
+        """
+        return self._pieces[color]
+
+    def _init_scores(self):
+        """
+        Compute the running evaluation terms that push/pop keep up to date:
+        (midgame, endgame) material plus piece-square scores, the number
+        of pieces of each kind and the game phase.
+        """
+        self._piece_square = piece_square_tables()
+        self._scores, self._piece_counts = score_pieces(
+            list(self._pieces[WHITE].items()) + list(self._pieces[BLACK].items()))
+        self._phase = game_phase(self._piece_counts)
+
+    def scores(self):
+        """
+        Return the (midgame, endgame) material plus piece-square score from
+        white's point of view, maintained incrementally by push/pop.
+        """
+        return self._scores
+
+    def piece_count(self, piece: int):
+        """Return how many of the signed piece are on the board."""
+        return self._piece_counts[piece + 6]
+
+    def phase(self):
+        """
+        Return the game phase, from TOTAL_PHASE in the opening down to 0 with
+        only kings and pawns left, maintained incrementally by push/pop.
+        Promotions can take it above TOTAL_PHASE.
+        """
+        return self._phase
+
+    def _compute_hash(self):
+        pieces = list(self._pieces[WHITE].items()) + list(self._pieces[BLACK].items())
+        return zobrist_hash(pieces, self.turn, self.castling_rights, self.ep_square)
+
+    def zobrist_hash(self):
+        """
+        Return the Zobrist key of the position, updated incrementally by push/pop.
+        """
+        return self._hash
 
     def push_uci(self, move: str):
         # Convert UCI move to coordinates
@@ -129,153 +464,202 @@ class Board:
             }
             promotion = promotion_map.get(promotion, None)
 
-        # Get the piece at the from_square
-        piece = self._board[from_square[0], from_square[1]]
-
-        # Handle castling
-        if abs(piece) == KING and abs(from_square[1] - to_square[1]) == 2:
-            # Determine if it's kingside or queenside castling
-            if to_square[1] > from_square[1]:  # Kingside castling
-                rook_from = (from_square[0], 7)  # h-file
-                rook_to = (from_square[0], 5)  # f-file
-            else:  # Queenside castling
-                rook_from = (from_square[0], 0)  # a-file
-                rook_to = (from_square[0], 3)  # d-file
-
-            # Move the rook
-            rook_piece = self._board[rook_from[0], rook_from[1]]
-            self._board[rook_to[0], rook_to[1]] = rook_piece
-            self._board[rook_from[0], rook_from[1]] = 0
-
-        # Get the piece at the to_square
-        old_piece = self._board[to_square[0], to_square[1]]
-        if old_piece != 0:
-            self.event.put(old_piece)
-
-        # Move the piece
-        self._board[to_square[0], to_square[1]] = piece
-        self._board[from_square[0], from_square[1]] = 0
-
-        if np.sign(old_piece) == np.sign(piece):
-            self._board[from_square[0], from_square[1]] = old_piece
-
-        # Handle promotion
-        if promotion:
-            self._board[to_square[0], to_square[1]] = promotion * self.turn
-
-        # Switch turns
-        self.turn = -self.turn
+        self.push(Move(from_square, to_square, promotion))
+
+    def fen(self) -> str:
+        """
+        Return the FEN of the position.
+        """
+        return board_fen(self)
+
+    def perft(self, depth: int) -> int:
+        """
+        Count the leaves of the legal move tree to the given depth.
+        """
+        return perft(self, depth)
+
+    def perft_divide(self, depth: int) -> Dict[str, int]:
+        """
+        Count the leaves below each legal move, keyed by its UCI string.
+        """
+        return perft_divide(self, depth)
 
     def legal_moves(self):
         """
         Generate all legal moves for the current turn, ensuring the king is not left in check.
         """
+        for move in self.pseudo_legal_moves():
+            if self.is_legal(move):
+                yield move
+
+    def pseudo_legal_moves(self):
+        """
+        Generate moves for the current turn without checking king safety.
+        Callers test each move with is_legal() only when they actually play it.
+        """
+        moves = [None] * MAX_MOVES
+        yield from moves[:self.generate_moves(moves)]
+
+    def generate_moves(self, moves: list) -> int:
+        """
+        Write the pseudo-legal moves of the side to move into the list moves,
+        in the order pseudo_legal_moves yields them, and return their number.
+        """
+        board = self._board
+        turn = self.turn
+        count = 0
         for x in range(8):
             for y in range(8):
-                piece = self._board[x, y]
-                if piece == 0 or np.sign(piece) != self.turn:
+                piece = board.item(x, y)
+                if piece * turn <= 0:
                     continue
 
                 piece_type = abs(piece)
+                sq = 8 * x + y
 
                 if piece_type == PAWN:
                     # Pawn moves
-                    direction = -self.turn
-                    start_row = 6 if self.turn == WHITE else 1
-                    promotion_row = 0 if self.turn == WHITE else 7
+                    direction = -turn
+                    start_row = 6 if turn == WHITE else 1
+                    promotion_row = 0 if turn == WHITE else 7
+                    ahead = sq + 8 * direction
 
                     # Single move forward
-                    if 0 <= x + direction < 8 and self._board[x + direction, y] == 0:
+                    if 0 <= x + direction < 8 and board.item(x + direction, y) == 0:
                         if x + direction == promotion_row:
-                            for promo in [QUEEN, ROOK, BISHOP, KNIGHT]:
-                                move = Move()
-                                move.from_square = (x, y)
-                                move.to_square = (x + direction, y)
-                                move.promotion = promo
-                                if self._is_move_legal(move, self.turn):
-                                    yield move
+                            for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                                moves[count] = MOVES[sq | ahead << 6 | promo << 12]
+                                count += 1
                         else:
-                            move = Move()
-                            move.from_square = (x, y)
-                            move.to_square = (x + direction, y)
-                            if self._is_move_legal(move, self.turn):
-                                yield move
+                            moves[count] = MOVES[sq | ahead << 6]
+                            count += 1
 
                     # Double move from starting position
-                    if x == start_row and self._board[x + direction, y] == 0 and self._board[x + 2 * direction, y] == 0:
-                        move = Move()
-                        move.from_square = (x, y)
-                        move.to_square = (x + 2 * direction, y)
-                        if self._is_move_legal(move, self.turn):
-                            yield move
+                    if x == start_row and board.item(x + direction, y) == 0 and \
+                            board.item(x + 2 * direction, y) == 0:
+                        moves[count] = MOVES[sq | (ahead + 8 * direction) << 6]
+                        count += 1
 
                     # Captures
-                    for dy in [-1, 1]:
-                        if 0 <= y + dy < 8 and 0 <= x + direction < 8:
-                            if self._board[x + direction, y + dy] * self.turn < 0:
-                                if x + direction == promotion_row:
-                                    for promo in [QUEEN, ROOK, BISHOP, KNIGHT]:
-                                        move = Move()
-                                        move.from_square = (x, y)
-                                        move.to_square = (x + direction, y + dy)
-                                        move.promotion = promo
-                                        if self._is_move_legal(move, self.turn):
-                                            yield move
-                                else:
-                                    move = Move()
-                                    move.from_square = (x, y)
-                                    move.to_square = (x + direction, y + dy)
-                                    if self._is_move_legal(move, self.turn):
-                                        yield move
-
-                elif piece_type == KNIGHT:
-                    # Knight moves
-                    for dx, dy in [(-2, -1), (-1, -2), (1, -2), (2, -1),
-                                   (2, 1), (1, 2), (-1, 2), (-2, 1)]:
-                        x2, y2 = x + dx, y + dy
-                        if 0 <= x2 < 8 and 0 <= y2 < 8:
-                            if self._board[x2, y2] * self.turn <= 0:
-                                move = Move()
-                                move.from_square = (x, y)
-                                move.to_square = (x2, y2)
-                                if self._is_move_legal(move, self.turn):
-                                    yield move
-
-                elif piece_type in [BISHOP, ROOK, QUEEN]:
-                    # Sliding moves
-                    directions = []
-                    if piece_type == BISHOP or piece_type == QUEEN:
-                        directions.extend([(-1, -1), (-1, 1), (1, -1), (1, 1)])
-                    if piece_type == ROOK or piece_type == QUEEN:
-                        directions.extend([(-1, 0), (1, 0), (0, -1), (0, 1)])
-
-                    for dx, dy in directions:
-                        x2, y2 = x + dx, y + dy
-                        while 0 <= x2 < 8 and 0 <= y2 < 8:
-                            if self._board[x2, y2] * self.turn <= 0:
-                                move = Move()
-                                move.from_square = (x, y)
-                                move.to_square = (x2, y2)
-                                if self._is_move_legal(move, self.turn):
-                                    yield move
-                            if self._board[x2, y2] != 0:
+                    for to_x, to_y in PAWN_CAPTURE_SQUARES[turn][sq]:
+                        if board.item(to_x, to_y) * turn < 0:
+                            to_sq = 8 * to_x + to_y
+                            if to_x == promotion_row:
+                                for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                                    moves[count] = MOVES[sq | to_sq << 6 | promo << 12]
+                                    count += 1
+                            else:
+                                moves[count] = MOVES[sq | to_sq << 6]
+                                count += 1
+
+                elif piece_type == KNIGHT or piece_type == KING:
+                    for to_x, to_y in (KNIGHT_SQUARES if piece_type == KNIGHT else KING_SQUARES)[sq]:
+                        if board.item(to_x, to_y) * turn <= 0:
+                            moves[count] = MOVES[sq | (8 * to_x + to_y) << 6]
+                            count += 1
+
+                else:
+                    # Sliding moves, each ray ends at the first piece
+                    for ray in SLIDER_RAYS[piece_type][sq]:
+                        for to_x, to_y in ray:
+                            target = board.item(to_x, to_y)
+                            if target * turn <= 0:
+                                moves[count] = MOVES[sq | (8 * to_x + to_y) << 6]
+                                count += 1
+                            if target:
                                 break
-                            x2 += dx
-                            y2 += dy
-
-                elif piece_type == KING:
-                    # King moves
-                    for dx, dy in [(-1, -1), (-1, 0), (-1, 1),
-                                   (0, -1), (0, 1),
-                                   (1, -1), (1, 0), (1, 1)]:
-                        x2, y2 = x + dx, y + dy
-                        if 0 <= x2 < 8 and 0 <= y2 < 8:
-                            if self._board[x2, y2] * self.turn <= 0:
-                                move = Move()
-                                move.from_square = (x, y)
-                                move.to_square = (x2, y2)
-                                if self._is_move_legal(move, self.turn):
-                                    yield move
+        return count
+
+    def _legality(self):
+        """
+        Check and pin information for the side to move, computed once per
+        position and cached until the next push/pop:
+        (king square, number of checkers, check mask, pin rays by square).
+        Masks are bitsets over square indices 8 * x + y.
+        """
+        if self._pins is not None:
+            return self._pins
+
+        board = self._board
+        color = self.turn
+        enemy = -color
+        king = self._king_squares[color]
+        checkers = 0
+        check_mask = 0
+        pins = {}
+        if king is None:
+            self._pins = (None, 0, 0, pins)
+            return self._pins
+        kx, ky = king
+
+        # Sliders: walk each ray out of the king, remembering the first own piece
+        king_sq = 8 * kx + ky
+        for slider, rays in ((BISHOP, DIAGONAL_RAYS), (ROOK, STRAIGHT_RAYS)):
+            for squares in rays[king_sq]:
+                ray = 0
+                pinned = None
+                for x, y in squares:
+                    ray |= 1 << (8 * x + y)
+                    piece = board.item(x, y)
+                    if piece:
+                        if piece * color > 0:
+                            if pinned is not None:
+                                break
+                            pinned = (x, y)
+                        else:
+                            if piece == slider * enemy or piece == QUEEN * enemy:
+                                if pinned is None:
+                                    checkers += 1
+                                    check_mask |= ray
+                                else:
+                                    pins[pinned] = ray
+                            break
+
+        # Knights and pawns
+        for x, y in KNIGHT_SQUARES[king_sq]:
+            if board.item(x, y) == KNIGHT * enemy:
+                checkers += 1
+                check_mask |= 1 << (8 * x + y)
+        for x, y in PAWN_CAPTURE_SQUARES[color][king_sq]:
+            if board.item(x, y) == PAWN * enemy:
+                checkers += 1
+                check_mask |= 1 << (8 * x + y)
+
+        self._pins = (king, checkers, check_mask, pins)
+        return self._pins
+
+    def is_legal(self, move: Move) -> bool:
+        """
+        Check a pseudo-legal move of the side to move against the cached
+        check and pin masks; only king moves need an attack test.
+        """
+        king, checkers, check_mask, pins = self._legality()
+        if king is None:
+            return True
+        if move.from_square == king:
+            board = self._board
+            to_x, to_y = move.to_square
+            captured = board.item(to_x, to_y)
+            piece = board.item(king[0], king[1])
+            board[king[0], king[1]] = 0
+            board[to_x, to_y] = piece
+            attacked = self.is_square_attacked(move.to_square, -self.turn)
+            board[to_x, to_y] = captured
+            board[king[0], king[1]] = piece
+            return not attacked
+        if checkers > 1:
+            return False
+        to_bit = 1 << (8 * move.to_square[0] + move.to_square[1])
+        ray = pins.get(move.from_square)
+        if ray is not None and not ray & to_bit:
+            return False
+        return checkers == 0 or bool(check_mask & to_bit)
+
+    def is_check(self) -> bool:
+        """
+        Check if the side to move is in check.
+        """
+        return self._legality()[1] > 0
 
     def _is_move_legal(self, move: Move, color: int):
         """
@@ -291,15 +675,10 @@ class Board:
         if move.promotion:
             self._board[move.to_square[0], move.to_square[1]] = move.promotion * color
 
-        # Find the king's position
-        king_position = None
-        for x in range(8):
-            for y in range(8):
-                if self._board[x, y] == KING * color:
-                    king_position = (x, y)
-                    break
-            if king_position:
-                break
+        # The king is either the moving piece or still on its tracked square
+        king_position = self._king_squares[color]
+        if move.from_square == king_position:
+            king_position = move.to_square
 
         # Check if the king is in check
         is_legal = not self.is_square_attacked(king_position, -color)
@@ -312,78 +691,175 @@ class Board:
 
     def push(self, move: Move):
         """
-        Add a move to the move stack and update the board.
+        Make a move on the board and record an undo entry for pop().
+        The entry holds the moving and captured pieces, where the capture
+        happened, the castling rook files and the previous castling/ep state.
         """
-        self.event.put(move)
-        self.push_uci(str(move))  # Apply the move to the board
-
-
+        board = self._board
+        from_x, from_y = move.from_square
+        to_x, to_y = move.to_square
+        piece = board.item(from_x, from_y)
+        captured = board.item(to_x, to_y)
+        capture_square = move.to_square
+        rook_files = None
+        color = self.turn
+
+        if abs(piece) == PAWN:
+            # En passant: a diagonal pawn move onto an empty square
+            if captured == 0 and from_y != to_y:
+                capture_square = (from_x, to_y)
+                captured = board.item(from_x, to_y)
+                board[from_x, to_y] = 0
+            new_ep_square = ((from_x + to_x) // 2, from_y) if abs(from_x - to_x) == 2 else None
+        else:
+            new_ep_square = None
+            # Castling: move the rook along with the king
+            if abs(piece) == KING and abs(from_y - to_y) == 2:
+                rook_files = (7, 5) if to_y > from_y else (0, 3)
+                board[from_x, rook_files[1]] = board.item(from_x, rook_files[0])
+                board[from_x, rook_files[0]] = 0
+
+        board[to_x, to_y] = move.promotion * color if move.promotion else piece
+        # A "capture" of an own piece swaps the two pieces
+        board[from_x, from_y] = captured if captured * piece > 0 else 0
+
+        side = WHITE if piece > 0 else BLACK
+        own = self._pieces[side]
+        del own[move.from_square]
+        if captured:
+            if captured * piece > 0:
+                own[move.from_square] = captured
+                if abs(captured) == KING:
+                    self._king_squares[side] = move.from_square
+            else:
+                del self._pieces[-side][capture_square]
+                if abs(captured) == KING:
+                    self._king_squares[-side] = None
+        own[move.to_square] = board.item(to_x, to_y)
+        if rook_files:
+            own[(from_x, rook_files[1])] = own.pop((from_x, rook_files[0]))
+        if abs(piece) == KING:
+            self._king_squares[side] = move.to_square
+
+        from_index = 8 * from_x + from_y
+        to_index = 8 * to_x + to_y
+        key = self._hash ^ ZOBRIST_TURN ^ ZOBRIST_PIECES[piece + 6][from_index] ^ \
+            ZOBRIST_PIECES[board.item(to_x, to_y) + 6][to_index]
+        if captured:
+            key ^= ZOBRIST_PIECES[captured + 6][8 * capture_square[0] + capture_square[1]]
+            if captured * piece > 0:
+                key ^= ZOBRIST_PIECES[captured + 6][from_index]
+        if rook_files:
+            rook = ZOBRIST_PIECES[board.item(from_x, rook_files[1]) + 6]
+            key ^= rook[8 * from_x + rook_files[0]] ^ rook[8 * from_x + rook_files[1]]
+        castling_rights = self.castling_rights & CASTLING_MASK[from_index] & CASTLING_MASK[to_index]
+        if castling_rights != self.castling_rights:
+            key ^= ZOBRIST_CASTLING[self.castling_rights] ^ ZOBRIST_CASTLING[castling_rights]
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EP[self.ep_square[1]]
+        if new_ep_square is not None:
+            key ^= ZOBRIST_EP[new_ep_square[1]]
+
+        mg_table, eg_table = self._piece_square
+        placed = board.item(to_x, to_y)
+        mg, eg = self._scores
+        mg += mg_table[placed + 6][to_index] - mg_table[piece + 6][from_index]
+        eg += eg_table[placed + 6][to_index] - eg_table[piece + 6][from_index]
+        if captured:
+            if captured * piece > 0:
+                mg += mg_table[captured + 6][from_index] - mg_table[captured + 6][to_index]
+                eg += eg_table[captured + 6][from_index] - eg_table[captured + 6][to_index]
+            else:
+                capture_index = 8 * capture_square[0] + capture_square[1]
+                mg -= mg_table[captured + 6][capture_index]
+                eg -= eg_table[captured + 6][capture_index]
+                self._piece_counts[captured + 6] -= 1
+                self._phase -= PHASE_WEIGHT[abs(captured)]
+        if rook_files:
+            rook = board.item(from_x, rook_files[1]) + 6
+            mg += mg_table[rook][8 * from_x + rook_files[1]] - mg_table[rook][8 * from_x + rook_files[0]]
+            eg += eg_table[rook][8 * from_x + rook_files[1]] - eg_table[rook][8 * from_x + rook_files[0]]
+        if placed != piece:
+            self._piece_counts[piece + 6] -= 1
+            self._piece_counts[placed + 6] += 1
+            self._phase += PHASE_WEIGHT[abs(placed)]
+
+        self._history.append((move, piece, captured, capture_square, rook_files,
+                              self.castling_rights, self.ep_square, self._pins, self._hash, self._scores))
+        self._scores = (mg, eg)
+        self._pins = None
+        self._hash = key
+        self.castling_rights = castling_rights
+        self.ep_square = new_ep_square
+        self.turn = -color
 
     def pop(self):
         """
         Remove the last move from the move stack and revert the board state.
         """
-        if not self.event:
+        if not self._history:
             raise IndexError("No moves to pop")
 
-        last_move = None
-
-        # Get the last move
-        event = self.event.get()
-        if isinstance(event, Move):
-            last_move = self.retractMove(event)
-        elif self.is_numeric(event):
-            last_move = self.retractMove(self.event.get())
-            self._board[last_move.to_square[0], last_move.to_square[1]] = event
-        return last_move
-
-    def is_numeric(self, ev) -> bool:
-        attrs = ['__add__', '__sub__', '__mul__', '__truediv__', '__pow__']
-        return all(hasattr(ev, attr) for attr in attrs)
-
-    def retractMove(self, event):
-        last_move = event
-        from_sq = last_move.from_square
-        to_sq = last_move.to_square
-        moving_piece = self._board[to_sq[0], to_sq[1]]
-
-        # Revert the moving piece
-        self._board[from_sq[0], from_sq[1]] = moving_piece
-        self._board[to_sq[0], to_sq[1]] = 0
-
-        # Handle castling: revert rook's position
-        if abs(moving_piece) == KING and abs(from_sq[1] - to_sq[1]) == 2:
-            if to_sq[1] > from_sq[1]:  # Kingside
-                rook_from = (from_sq[0], 5)
-                rook_to = (from_sq[0], 7)
-            else:  # Queenside
-                rook_from = (from_sq[0], 3)
-                rook_to = (from_sq[0], 0)
-
-            # Move the rook back
-            rook_piece = self._board[rook_from[0], rook_from[1]]
-            self._board[rook_to[0], rook_to[1]] = rook_piece
-            self._board[rook_from[0], rook_from[1]] = 0
-
-        # Handle promotion reversal
-        if last_move.promotion:
-            original_color = -self.turn  # Original color before the move
-            self._board[from_sq[0], from_sq[1]] = PAWN * original_color
-
-        # Switch turns back
+        (move, piece, captured, capture_square, rook_files,
+         self.castling_rights, self.ep_square, self._pins, self._hash, self._scores) = self._history.pop()
+        board = self._board
+        from_x, from_y = move.from_square
+        to_x, to_y = move.to_square
+
+        placed = board.item(to_x, to_y)
+        if placed != piece:
+            self._piece_counts[placed + 6] -= 1
+            self._piece_counts[piece + 6] += 1
+            self._phase -= PHASE_WEIGHT[abs(placed)]
+        if captured and captured * piece < 0:
+            self._piece_counts[captured + 6] += 1
+            self._phase += PHASE_WEIGHT[abs(captured)]
+
+        side = WHITE if piece > 0 else BLACK
+        own = self._pieces[side]
+        del own[move.to_square]
+        own[move.from_square] = piece
+        if captured:
+            if captured * piece > 0:
+                own[move.to_square] = captured
+                if abs(captured) == KING:
+                    self._king_squares[side] = move.to_square
+            else:
+                self._pieces[-side][capture_square] = captured
+                if abs(captured) == KING:
+                    self._king_squares[-side] = capture_square
+        if rook_files:
+            own[(from_x, rook_files[0])] = own.pop((from_x, rook_files[1]))
+        if abs(piece) == KING:
+            self._king_squares[side] = move.from_square
+
+        board[to_x, to_y] = 0
+        board[from_x, from_y] = piece
+        if captured:
+            board[capture_square[0], capture_square[1]] = captured
+        if rook_files:
+            board[from_x, rook_files[0]] = board.item(from_x, rook_files[1])
+            board[from_x, rook_files[1]] = 0
+
         self.turn = -self.turn
-        return last_move
+        return move
 
     def can_claim_draw(self):
         """
         Check if a draw can be claimed based on threefold repetition, fifty-move rule, or insufficient material.
         """
         # Insufficient material
-        pieces = np.abs(self._board).flatten()
-        if np.sum(pieces == PAWN) == 0 and np.sum(pieces == QUEEN) == 0 and np.sum(pieces == ROOK) == 0:
-            # Only kings and minor pieces (bishops, knights) remain
-            if np.sum(pieces == BISHOP) + np.sum(pieces == KNIGHT) <= 1:
-                return True
+        minor_pieces = 0
+        for color in (WHITE, BLACK):
+            for piece in self._pieces[color].values():
+                piece_type = abs(piece)
+                if piece_type in (PAWN, ROOK, QUEEN):
+                    return False
+                if piece_type != KING:
+                    minor_pieces += 1
+        # Only kings and minor pieces (bishops, knights) remain
+        if minor_pieces <= 1:
+            return True
 
         return False
 
@@ -391,15 +867,7 @@ class Board:
         """
         Check if the current player is in checkmate.
         """
-        # Find the king's position
-        king_position = None
-        for x in range(8):
-            for y in range(8):
-                if self._board[x, y] == KING * -self.turn:
-                    king_position = (x, y)
-                    break
-            if king_position:
-                break
+        king_position = self._king_squares[-self.turn]
 
         # Check if the king is in check
         if not self.is_square_attacked(king_position, self.turn):
@@ -433,55 +901,33 @@ class Board:
         """
         if square is None:
             return False
+        board = self._board
+        sq = 8 * square[0] + square[1]
 
-        # Directions for non-sliding pieces
-        pawn_directions = [(1, -1), (1, 1)] if enemy_color == WHITE else [(-1, -1), (-1, 1)]
-        knight_directions = [(-2, -1), (-1, -2), (1, -2), (2, -1),
-                             (2, 1), (1, 2), (-1, 2), (-2, 1)]
-        king_directions = [(-1, -1), (-1, 0), (-1, 1),
-                           (0, -1), (0, 1),
-                           (1, -1), (1, 0), (1, 1)]
-
-        # Check for pawn attacks
-        for dx, dy in pawn_directions:
-            x, y = square[0] + dx, square[1] + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if self._board[x, y] == PAWN * enemy_color:
-                    return True
-
-        # Check for knight attacks
-        for dx, dy in knight_directions:
-            x, y = square[0] + dx, square[1] + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if self._board[x, y] == KNIGHT * enemy_color:
-                    return True
-
-        # Check for king attacks
-        for dx, dy in king_directions:
-            x, y = square[0] + dx, square[1] + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if self._board[x, y] == KING * enemy_color:
-                    return True
-
-        # Directions for sliding pieces (bishop, rook, queen)
-        sliding_directions = {
-            BISHOP: [(-1, -1), (-1, 1), (1, -1), (1, 1)],  # Diagonal
-            ROOK: [(-1, 0), (1, 0), (0, -1), (0, 1)],  # Straight
-            QUEEN: [(-1, -1), (-1, 1), (1, -1), (1, 1),  # Diagonal + Straight
-                    (-1, 0), (1, 0), (0, -1), (0, 1)]
-        }
+        # Pawns, knights and the king from the precomputed target squares
+        pawn = PAWN * enemy_color
+        for x, y in PAWN_CAPTURE_SQUARES[-enemy_color][sq]:
+            if board.item(x, y) == pawn:
+                return True
+        knight = KNIGHT * enemy_color
+        for x, y in KNIGHT_SQUARES[sq]:
+            if board.item(x, y) == knight:
+                return True
+        king = KING * enemy_color
+        for x, y in KING_SQUARES[sq]:
+            if board.item(x, y) == king:
+                return True
 
-        # Check for sliding piece attacks
-        for piece_type, directions in sliding_directions.items():
-            for dx, dy in directions:
-                x, y = square[0] + dx, square[1] + dy
-                while 0 <= x < 8 and 0 <= y < 8:
-                    if self._board[x, y] != 0:  # Stop if we hit a piece
-                        if self._board[x, y] == piece_type * enemy_color:
+        # Sliders: the first piece on each ray decides
+        queen = QUEEN * enemy_color
+        for slider, rays in ((BISHOP * enemy_color, DIAGONAL_RAYS), (ROOK * enemy_color, STRAIGHT_RAYS)):
+            for ray in rays[sq]:
+                for x, y in ray:
+                    piece = board.item(x, y)
+                    if piece:
+                        if piece == slider or piece == queen:
                             return True
-                        break  # Stop searching in this direction
-                    x += dx
-                    y += dy
+                        break
 
         return False
 
@@ -510,16 +956,597 @@ class Board:
         """
         Return a dictionary mapping squares (x, y) to Piece objects.
         """
-        piece_map = {}
-        for x in range(8):
-            for y in range(8):
-                piece_value = self._board[x, y]
-                if piece_value != 0:
-                    color = WHITE if piece_value > 0 else BLACK
-                    piece_type = abs(piece_value)
-                    piece_map[(x, y)] = color * piece_type
+        piece_map = dict(self._pieces[WHITE])
+        piece_map.update(self._pieces[BLACK])
         return piece_map
 
+
+# Bitboard helpers. A square (x, y) maps to bit 8 * x + y, the same index the
+# piece-square tables in evaluate.py use, so a8 is bit 0 and h1 is bit 63.
+BB_ALL = (1 << 64) - 1
+BB_ROWS = [0xFF << (8 * x) for x in range(8)]
+SQUARE_TUPLES = [(sq >> 3, sq & 7) for sq in range(64)]
+STARTING_FEN = "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1"
+
+
+def _leaper_table(deltas):
+    """Attack masks for a non-sliding piece on each of the 64 squares."""
+    table = []
+    for sq in range(64):
+        x, y = SQUARE_TUPLES[sq]
+        mask = 0
+        for dx, dy in deltas:
+            if 0 <= x + dx < 8 and 0 <= y + dy < 8:
+                mask |= 1 << (8 * (x + dx) + y + dy)
+        table.append(mask)
+    return table
+
+
+def _ray_table(dx, dy):
+    """Squares reachable from each square along (dx, dy) on an empty board."""
+    table = []
+    for sq in range(64):
+        x, y = SQUARE_TUPLES[sq]
+        mask = 0
+        x, y = x + dx, y + dy
+        while 0 <= x < 8 and 0 <= y < 8:
+            mask |= 1 << (8 * x + y)
+            x += dx
+            y += dy
+        table.append(mask)
+    return table
+
+
+KNIGHT_ATTACKS = _leaper_table(KNIGHT_OFFSETS)
+KING_ATTACKS = _leaper_table(KING_OFFSETS)
+# Squares attacked by a pawn of the given color standing on each square
+PAWN_ATTACKS = {
+    WHITE: _leaper_table([(-1, -1), (-1, 1)]),
+    BLACK: _leaper_table([(1, -1), (1, 1)]),
+}
+# (ray table, True if the ray runs towards higher square indices)
+# The mailbox tables above as square indices, for BitboardBoard's move
+# generation and pin detection
+KNIGHT_TARGETS = [[8 * x + y for x, y in targets] for targets in KNIGHT_SQUARES]
+KING_TARGETS = [[8 * x + y for x, y in targets] for targets in KING_SQUARES]
+PAWN_CAPTURE_TARGETS = {color: [[8 * x + y for x, y in targets] for targets in table]
+                        for color, table in PAWN_CAPTURE_SQUARES.items()}
+SLIDER_TARGETS = {piece_type: [[[8 * x + y for x, y in ray] for ray in rays] for rays in table]
+                  for piece_type, table in SLIDER_RAYS.items()}
+BISHOP_RAYS = [(_ray_table(1, 1), True), (_ray_table(1, -1), True),
+               (_ray_table(-1, -1), False), (_ray_table(-1, 1), False)]
+ROOK_RAYS = [(_ray_table(1, 0), True), (_ray_table(0, 1), True),
+             (_ray_table(-1, 0), False), (_ray_table(0, -1), False)]
+
+
+def slider_attacks(sq: int, occupied: int, rays) -> int:
+    """Attack mask of a slider on sq, cutting every ray at its first blocker."""
+    attacks = 0
+    for table, positive in rays:
+        ray = table[sq]
+        blockers = ray & occupied
+        if blockers:
+            if positive:
+                blocker = (blockers & -blockers).bit_length() - 1
+            else:
+                blocker = blockers.bit_length() - 1
+            ray ^= table[blocker]
+        attacks |= ray
+    return attacks
+
+
+class BitboardBoard:
+    """
+    Drop-in alternative to Board backed by twelve piece bitboards plus
+    per-color occupancy masks, all stored as plain Python ints.
+
+    The public API mirrors Board: squares are (x, y) tuples, pieces are signed
+    piece types and legal_moves() yields Move objects, so next_move and the
+    evaluation run on either class unchanged. A 64-entry mailbox is kept next
+    to the bitboards so piece_at stays a single list lookup; moves are
+    generated from it in Board's order, so that a search visits the same
+    nodes on either board, while the bitboards answer attack queries.
+    """
+
+    def __init__(self):
+        self.set_fen(STARTING_FEN)
+
+    def reset(self):
+        self.__init__()
+
+    def set_fen(self, fen: str):
+        piece_map = {'P': PAWN, 'N': KNIGHT, 'B': BISHOP, 'R': ROOK, 'Q': QUEEN, 'K': KING}
+        squares = [0] * 64
+
+        parts = fen.split(' ')
+        sq = 0
+        for char in parts[0]:
+            if char == '/':
+                continue
+            if char.isdigit():
+                sq += int(char)
+            else:
+                piece_type = piece_map[char.upper()]
+                squares[sq] = piece_type if char.isupper() else -piece_type
+                sq += 1
+
+        self._load_squares(squares)
+        self.turn = WHITE if parts[1] == "w" else BLACK
+        self.castling_rights, self.ep_square = parse_castling_and_ep(parts)
+        self._pins = None
+        self._hash = self._compute_hash()
+
+    def _load_squares(self, squares):
+        self._squares = list(squares)
+        self._bitboards = [0] * 13  # indexed by piece + 6, slot 6 unused
+        self._occupied = {WHITE: 0, BLACK: 0}
+        for sq, piece in enumerate(self._squares):
+            if piece:
+                self._bitboards[piece + 6] |= 1 << sq
+                self._occupied[WHITE if piece > 0 else BLACK] |= 1 << sq
+        self._history = []
+        self._pins = None
+        self._piece_square = piece_square_tables()
+        self._scores, self._piece_counts = score_pieces(
+            (SQUARE_TUPLES[sq], piece) for sq, piece in enumerate(self._squares) if piece)
+        self._phase = game_phase(self._piece_counts)
+
+    @property
+    def _board(self):
+        """8x8 array view of the position, matching Board._board."""
+        return np.array(self._squares, dtype=np.int64).reshape(8, 8)
+
+    @_board.setter
+    def _board(self, board):
+        self._load_squares(int(piece) for piece in np.asarray(board).flatten())
+        self._hash = self._compute_hash()
+
+    def _compute_hash(self):
+        pieces = [(SQUARE_TUPLES[sq], piece) for sq, piece in enumerate(self._squares) if piece]
+        return zobrist_hash(pieces, self.turn, self.castling_rights, self.ep_square)
+
+    def zobrist_hash(self):
+        """
+        Return the Zobrist key of the position, updated incrementally by push/pop.
+        """
+        return self._hash
+
+    def push_uci(self, move: str):
+        from_square = (8 - int(move[1]), ord(move[0]) - ord('a'))
+        to_square = (8 - int(move[3]), ord(move[2]) - ord('a'))
+        promotion = None
+        if len(move) == 5:
+            promotion = {'q': QUEEN, 'r': ROOK, 'b': BISHOP, 'n': KNIGHT}.get(move[4].lower())
+        self.push(Move(from_square, to_square, promotion))
+
+    def push(self, move: Move):
+        """
+        Apply a move and record what is needed to take it back.
+        Castling is recognised by a two-file king move, en passant by a
+        diagonal pawn move onto an empty square.
+        """
+        squares = self._squares
+        bitboards = self._bitboards
+        occupied = self._occupied
+        color = self.turn
+        from_sq = 8 * move.from_square[0] + move.from_square[1]
+        to_sq = 8 * move.to_square[0] + move.to_square[1]
+        piece = squares[from_sq]
+        placed = move.promotion * color if move.promotion else piece
+
+        key = self._hash ^ ZOBRIST_TURN ^ ZOBRIST_PIECES[piece + 6][from_sq] ^ ZOBRIST_PIECES[placed + 6][to_sq]
+
+        captured = squares[to_sq]
+        capture_sq = to_sq
+        if piece == PAWN * color and captured == 0 and (from_sq - to_sq) & 7:
+            capture_sq = to_sq + 8 * color
+            captured = squares[capture_sq]
+        if captured:
+            squares[capture_sq] = 0
+            bitboards[captured + 6] ^= 1 << capture_sq
+            occupied[-color] ^= 1 << capture_sq
+            key ^= ZOBRIST_PIECES[captured + 6][capture_sq]
+
+        squares[from_sq] = 0
+        squares[to_sq] = placed
+        bitboards[piece + 6] ^= 1 << from_sq
+        bitboards[placed + 6] ^= 1 << to_sq
+        occupied[color] ^= (1 << from_sq) | (1 << to_sq)
+
+        rook_from = rook_to = -1
+        if piece == KING * color and abs(to_sq - from_sq) == 2:
+            rook_from, rook_to = (from_sq + 3, from_sq + 1) if to_sq > from_sq else (from_sq - 4, from_sq - 1)
+            rook = squares[rook_from]
+            squares[rook_from] = 0
+            squares[rook_to] = rook
+            rook_mask = (1 << rook_from) | (1 << rook_to)
+            bitboards[rook + 6] ^= rook_mask
+            occupied[color] ^= rook_mask
+            key ^= ZOBRIST_PIECES[rook + 6][rook_from] ^ ZOBRIST_PIECES[rook + 6][rook_to]
+
+        mg_table, eg_table = self._piece_square
+        mg, eg = self._scores
+        mg += mg_table[placed + 6][to_sq] - mg_table[piece + 6][from_sq]
+        eg += eg_table[placed + 6][to_sq] - eg_table[piece + 6][from_sq]
+        if captured:
+            mg -= mg_table[captured + 6][capture_sq]
+            eg -= eg_table[captured + 6][capture_sq]
+            self._piece_counts[captured + 6] -= 1
+            self._phase -= PHASE_WEIGHT[abs(captured)]
+        if rook_from >= 0:
+            mg += mg_table[rook + 6][rook_to] - mg_table[rook + 6][rook_from]
+            eg += eg_table[rook + 6][rook_to] - eg_table[rook + 6][rook_from]
+        if placed != piece:
+            self._piece_counts[piece + 6] -= 1
+            self._piece_counts[placed + 6] += 1
+            self._phase += PHASE_WEIGHT[abs(placed)]
+
+        self._history.append((move, from_sq, to_sq, piece, captured, capture_sq, rook_from, rook_to,
+                              self.castling_rights, self.ep_square, self._pins, self._hash, self._scores))
+        self._scores = (mg, eg)
+        self._pins = None
+        castling_rights = self.castling_rights & CASTLING_MASK[from_sq] & CASTLING_MASK[to_sq]
+        if castling_rights != self.castling_rights:
+            key ^= ZOBRIST_CASTLING[self.castling_rights] ^ ZOBRIST_CASTLING[castling_rights]
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EP[self.ep_square[1]]
+        self.castling_rights = castling_rights
+        self.ep_square = SQUARE_TUPLES[(from_sq + to_sq) // 2] \
+            if piece == PAWN * color and abs(to_sq - from_sq) == 16 else None
+        if self.ep_square is not None:
+            key ^= ZOBRIST_EP[self.ep_square[1]]
+        self._hash = key
+        self.turn = -color
+
+    def pop(self):
+        """
+        Take back the last move and return it.
+        """
+        if not self._history:
+            raise IndexError("No moves to pop")
+        (move, from_sq, to_sq, piece, captured, capture_sq, rook_from, rook_to,
+         self.castling_rights, self.ep_square, self._pins, self._hash, self._scores) = self._history.pop()
+        squares = self._squares
+        bitboards = self._bitboards
+        occupied = self._occupied
+        color = -self.turn
+        placed = squares[to_sq]
+        if placed != piece:
+            self._piece_counts[placed + 6] -= 1
+            self._piece_counts[piece + 6] += 1
+            self._phase -= PHASE_WEIGHT[abs(placed)]
+        if captured:
+            self._piece_counts[captured + 6] += 1
+            self._phase += PHASE_WEIGHT[abs(captured)]
+
+        if rook_from >= 0:
+            rook = squares[rook_to]
+            squares[rook_to] = 0
+            squares[rook_from] = rook
+            rook_mask = (1 << rook_from) | (1 << rook_to)
+            bitboards[rook + 6] ^= rook_mask
+            occupied[color] ^= rook_mask
+
+        squares[to_sq] = 0
+        squares[from_sq] = piece
+        bitboards[placed + 6] ^= 1 << to_sq
+        bitboards[piece + 6] ^= 1 << from_sq
+        occupied[color] ^= (1 << from_sq) | (1 << to_sq)
+
+        if captured:
+            squares[capture_sq] = captured
+            bitboards[captured + 6] ^= 1 << capture_sq
+            occupied[-color] ^= 1 << capture_sq
+
+        self.turn = color
+        return move
+
+    def generate_moves(self, moves: list) -> int:
+        """
+        Write the pseudo-legal moves of the side to move into the list moves,
+        in the order pseudo_legal_moves yields them, and return their number.
+        Pieces are visited in square order and their targets in the order of
+        Board.generate_moves, so both boards give the search the same moves
+        in the same order.
+        """
+        squares = self._squares
+        color = self.turn
+        pieces = self._occupied[color]
+        step = -8 * color
+        start_row = 6 if color == WHITE else 1
+        promotion_row = 0 if color == WHITE else 7
+        pawn_captures = PAWN_CAPTURE_TARGETS[color]
+        count = 0
+        while pieces:
+            bit = pieces & -pieces
+            sq = bit.bit_length() - 1
+            pieces ^= bit
+            piece_type = squares[sq] * color
+
+            if piece_type == PAWN:
+                ahead = sq + step
+                if squares[ahead] == 0:
+                    if ahead >> 3 == promotion_row:
+                        for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                            moves[count] = MOVES[sq | ahead << 6 | promo << 12]
+                            count += 1
+                    else:
+                        moves[count] = MOVES[sq | ahead << 6]
+                        count += 1
+                        if sq >> 3 == start_row and squares[ahead + step] == 0:
+                            moves[count] = MOVES[sq | (ahead + step) << 6]
+                            count += 1
+                for to_sq in pawn_captures[sq]:
+                    if squares[to_sq] * color < 0:
+                        if to_sq >> 3 == promotion_row:
+                            for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                                moves[count] = MOVES[sq | to_sq << 6 | promo << 12]
+                                count += 1
+                        else:
+                            moves[count] = MOVES[sq | to_sq << 6]
+                            count += 1
+
+            elif piece_type == KNIGHT or piece_type == KING:
+                for to_sq in (KNIGHT_TARGETS if piece_type == KNIGHT else KING_TARGETS)[sq]:
+                    if squares[to_sq] * color <= 0:
+                        moves[count] = MOVES[sq | to_sq << 6]
+                        count += 1
+
+            else:
+                # Sliding moves, each ray ends at the first piece
+                for ray in SLIDER_TARGETS[piece_type][sq]:
+                    for to_sq in ray:
+                        target = squares[to_sq]
+                        if target * color <= 0:
+                            moves[count] = MOVES[sq | to_sq << 6]
+                            count += 1
+                        if target:
+                            break
+        return count
+
+    def fen(self) -> str:
+        """
+        Return the FEN of the position.
+        """
+        return board_fen(self)
+
+    def perft(self, depth: int) -> int:
+        """
+        Count the leaves of the legal move tree to the given depth.
+        """
+        return perft(self, depth)
+
+    def perft_divide(self, depth: int) -> Dict[str, int]:
+        """
+        Count the leaves below each legal move, keyed by its UCI string.
+        """
+        return perft_divide(self, depth)
+
+    def legal_moves(self):
+        """
+        Generate all legal moves for the current turn, ensuring the king is not left in check.
+        """
+        for move in self.pseudo_legal_moves():
+            if self.is_legal(move):
+                yield move
+
+    def pseudo_legal_moves(self):
+        """
+        Generate moves for the current turn without checking king safety.
+        Callers test each move with is_legal() only when they actually play it.
+        """
+        moves = [None] * MAX_MOVES
+        yield from moves[:self.generate_moves(moves)]
+
+    def _legality(self):
+        """
+        Check and pin information for the side to move, computed once per
+        position and cached until the next push/pop, as in Board:
+        (king square index or -1, number of checkers, check mask, pin rays
+        by square index).
+        """
+        if self._pins is not None:
+            return self._pins
+
+        squares = self._squares
+        bitboards = self._bitboards
+        color = self.turn
+        enemy = -color
+        king_bb = bitboards[KING * color + 6]
+        if not king_bb:
+            self._pins = (-1, 0, 0, {})
+            return self._pins
+        king = king_bb.bit_length() - 1
+        checkers = 0
+        check_mask = 0
+        pins = {}
+
+        # Sliders: walk each ray out of the king, remembering the first own piece
+        for slider in (BISHOP, ROOK):
+            if not (bitboards[slider * enemy + 6] | bitboards[QUEEN * enemy + 6]):
+                continue
+            for targets in SLIDER_TARGETS[slider][king]:
+                ray = 0
+                pinned = -1
+                for sq in targets:
+                    ray |= 1 << sq
+                    piece = squares[sq]
+                    if piece:
+                        if piece * color > 0:
+                            if pinned >= 0:
+                                break
+                            pinned = sq
+                        else:
+                            if piece == slider * enemy or piece == QUEEN * enemy:
+                                if pinned < 0:
+                                    checkers += 1
+                                    check_mask |= ray
+                                else:
+                                    pins[pinned] = ray
+                            break
+
+        # Knights and pawns
+        leapers = (KNIGHT_ATTACKS[king] & bitboards[KNIGHT * enemy + 6]) | \
+                  (PAWN_ATTACKS[color][king] & bitboards[PAWN * enemy + 6])
+        if leapers:
+            checkers += leapers.bit_count()
+            check_mask |= leapers
+
+        self._pins = (king, checkers, check_mask, pins)
+        return self._pins
+
+    def is_legal(self, move: Move) -> bool:
+        """
+        Check a pseudo-legal move of the side to move against the cached
+        check and pin masks; only king moves need an attack test.
+        """
+        king, checkers, check_mask, pins = self._legality()
+        if king < 0:
+            return True
+        from_sq = 8 * move.from_square[0] + move.from_square[1]
+        to_sq = 8 * move.to_square[0] + move.to_square[1]
+        if from_sq == king:
+            occupied = (self._occupied[WHITE] | self._occupied[BLACK]) ^ (1 << king)
+            return not self._is_attacked(to_sq, -self.turn, occupied, ~(1 << to_sq))
+        if checkers > 1:
+            return False
+        to_bit = 1 << to_sq
+        ray = pins.get(from_sq)
+        if ray is not None and not ray & to_bit:
+            return False
+        return checkers == 0 or bool(check_mask & to_bit)
+
+    def _leaves_king_safe(self, from_sq: int, to_sq: int, color: int) -> bool:
+        """
+        Test a move against the king's safety on a scratch occupancy mask,
+        without touching the board itself.
+        """
+        squares = self._squares
+        piece = squares[from_sq]
+        capture_bb = 1 << to_sq
+        if piece == PAWN * color and squares[to_sq] == 0 and (from_sq - to_sq) & 7:
+            capture_bb = 1 << (to_sq + 8 * color)
+        occupied = ((self._occupied[WHITE] | self._occupied[BLACK]) & ~(1 << from_sq) & ~capture_bb) | (1 << to_sq)
+
+        if piece == KING * color:
+            king_sq = to_sq
+        else:
+            king = self._bitboards[KING * color + 6]
+            if not king:
+                return True
+            king_sq = king.bit_length() - 1
+        return not self._is_attacked(king_sq, -color, occupied, ~capture_bb)
+
+    def _is_attacked(self, sq: int, enemy_color: int, occupied: int, alive: int = BB_ALL) -> bool:
+        """
+        Check whether sq is attacked by enemy_color given an occupancy mask;
+        enemy pieces outside `alive` are treated as captured.
+        """
+        bitboards = self._bitboards
+        if PAWN_ATTACKS[-enemy_color][sq] & bitboards[PAWN * enemy_color + 6] & alive:
+            return True
+        if KNIGHT_ATTACKS[sq] & bitboards[KNIGHT * enemy_color + 6] & alive:
+            return True
+        if KING_ATTACKS[sq] & bitboards[KING * enemy_color + 6]:
+            return True
+        queens = bitboards[QUEEN * enemy_color + 6]
+        diagonal = (bitboards[BISHOP * enemy_color + 6] | queens) & alive
+        if diagonal and slider_attacks(sq, occupied, BISHOP_RAYS) & diagonal:
+            return True
+        straight = (bitboards[ROOK * enemy_color + 6] | queens) & alive
+        if straight and slider_attacks(sq, occupied, ROOK_RAYS) & straight:
+            return True
+        return False
+
+    def _is_move_legal(self, move: Move, color: int):
+        """
+        Check if a move is legal (does not leave the king in check).
+        """
+        from_sq = 8 * move.from_square[0] + move.from_square[1]
+        to_sq = 8 * move.to_square[0] + move.to_square[1]
+        return self._leaves_king_safe(from_sq, to_sq, color)
+
+    def is_square_attacked(self, square: Tuple, enemy_color: int):
+        """
+        Check if a square is attacked by any piece of the given color.
+        """
+        if square is None:
+            return False
+        occupied = self._occupied[WHITE] | self._occupied[BLACK]
+        return self._is_attacked(8 * square[0] + square[1], enemy_color, occupied)
+
+    def is_check(self) -> bool:
+        """
+        Check if the side to move is in check.
+        """
+        return self._legality()[1] > 0
+
+    def is_checkmate(self):
+        """
+        Check if the current player is in checkmate.
+        """
+        return self.is_check() and not any(self.legal_moves())
+
+    def can_claim_draw(self):
+        """
+        Check if a draw can be claimed based on insufficient material.
+        """
+        bitboards = self._bitboards
+        if bitboards[PAWN + 6] | bitboards[-PAWN + 6] | bitboards[QUEEN + 6] | bitboards[-QUEEN + 6] | \
+                bitboards[ROOK + 6] | bitboards[-ROOK + 6]:
+            return False
+        minors = bitboards[BISHOP + 6] | bitboards[-BISHOP + 6] | bitboards[KNIGHT + 6] | bitboards[-KNIGHT + 6]
+        return minors.bit_count() <= 1
+
+    def is_game_over(self):
+        """
+        Check if the game is over (checkmate, stalemate, or draw).
+        """
+        return not any(self.legal_moves()) or self.can_claim_draw()
+
+    def piece_at(self, from_square: Tuple):
+        return self._squares[8 * from_square[0] + from_square[1]]
+
+    def piece_map(self):
+        """
+        Return a dictionary mapping squares (x, y) to signed piece values.
+        """
+        return {SQUARE_TUPLES[sq]: piece for sq, piece in enumerate(self._squares) if piece}
+
+    def scores(self):
+        """
+        Return the (midgame, endgame) material plus piece-square score from
+        white's point of view, maintained incrementally by push/pop.
+        """
+        return self._scores
+
+    def piece_count(self, piece: int):
+        """Return how many of the signed piece are on the board."""
+        return self._piece_counts[piece + 6]
+
+    def phase(self):
+        """
+        Return the game phase, from TOTAL_PHASE in the opening down to 0 with
+        only kings and pawns left, maintained incrementally by push/pop.
+        Promotions can take it above TOTAL_PHASE.
+        """
+        return self._phase
+
+    def piece_list(self, color: int):
+        """
+        Return a square -> piece dict of one side, read off its occupancy bitboard.
+        """
+        squares = self._squares
+        occupied = self._occupied[color]
+        pieces = {}
+        while occupied:
+            lsb = occupied & -occupied
+            sq = lsb.bit_length() - 1
+            pieces[SQUARE_TUPLES[sq]] = squares[sq]
+            occupied ^= lsb
+        return pieces
+
+
 if __name__ == "__main__":
     board = Board()
     board.set_fen("rnbqkbnr/pp1ppppp/8/2p5/4P3/8/PPPP1PPP/RNBQKBNR w KQkq c6 0 2")
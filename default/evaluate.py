@@ -123,6 +123,13 @@ def move_value(board: chess.Board, move: chess.Move, endgame: bool) -> float:
     return total * board.turn
 
 
+def mvv_lva(board: chess.Board, move: chess.Move) -> int:
+    """Most valuable victim, least valuable attacker ordering score for a capture."""
+    victim = abs(board.piece_at(move.to_square))
+    attacker = abs(board.piece_at(move.from_square))
+    return 10 * PIECE_VALUE[victim] - PIECE_VALUE[attacker]
+
+
 def evaluate_piece(piece: int, square: tuple, endgame: bool) -> int:
     """Calculate the positional score for a piece on a given square."""
     piece_type = abs(piece)
@@ -143,28 +150,58 @@ def evaluate_piece(piece: int, square: tuple, endgame: bool) -> int:
 
 
 def evaluate_board(board: chess.Board) -> int:
-    """Evaluate the current board position."""
-    total_score = 0
-    endgame = check_end_game(board)
-
-    for square, piece in board.piece_map().items():
-        piece_score = evaluate_piece(piece, square, endgame)
-        value = PIECE_VALUE[abs(piece)]
-        total_score += piece_score + value if np.sign(piece) else -(piece_score + value)
-
-    return total_score
+    """
+    Evaluate the current board position from the board's running scores,
+    blending the midgame and endgame terms by game phase so the score moves
+    smoothly as pieces come off instead of jumping at an endgame cutoff.
+    """
+    mg, eg = board.scores()
+    phase = min(board.phase(), chess.TOTAL_PHASE)
+    return (mg * phase + eg * (chess.TOTAL_PHASE - phase)) // chess.TOTAL_PHASE
 
 
 def check_end_game(board: chess.Board) -> bool:
     """Determine if the current position is an endgame."""
-    queens = 0
-    minors = 0
-
-    for piece in board.piece_map().values():
-        pt = abs(piece)
-        if pt == chess.QUEEN:
-            queens += 1
-        elif pt in {chess.BISHOP, chess.KNIGHT}:
-            minors += 1
-
-    return queens == 0 or (queens == 2 and minors <= 1)
\ No newline at end of file
+    queens = board.piece_count(chess.QUEEN) + board.piece_count(-chess.QUEEN)
+    minors = board.piece_count(chess.BISHOP) + board.piece_count(-chess.BISHOP) + \
+        board.piece_count(chess.KNIGHT) + board.piece_count(-chess.KNIGHT)
+    return queens == 0 or (queens == 2 and minors <= 1)
+
+
+def _piece_square_table(endgame: bool) -> list:
+    """Material plus piece-square value of every signed piece on every square, white positive."""
+    table = [[0] * 64 for _ in range(13)]
+    for piece in range(-chess.KING, chess.KING + 1):
+        if piece == 0:
+            continue
+        for index in range(64):
+            value = PIECE_VALUE[abs(piece)] + evaluate_piece(piece, (index // 8, index % 8), endgame)
+            table[piece + 6][index] = value if piece > 0 else -value
+    return table
+
+
+# Tables behind Board.scores(), indexed [piece + 6][8 * x + y]
+PIECE_SQUARE_MG = _piece_square_table(False)
+PIECE_SQUARE_EG = _piece_square_table(True)
+
+# Flattened [(piece + 6) * 64 + 8 * x + y] midgame and endgame tables and
+# per-piece phase weights (index piece + 6) for evaluate_batch
+PIECE_SQUARE_MG_FLAT = np.array(PIECE_SQUARE_MG, dtype=np.int64).ravel()
+PIECE_SQUARE_EG_FLAT = np.array(PIECE_SQUARE_EG, dtype=np.int64).ravel()
+PHASE_BY_PIECE = np.array([chess.PHASE_WEIGHT[abs(piece)] for piece in range(-6, 7)], dtype=np.int64)
+SQUARE_OFFSETS = np.arange(64, dtype=np.int64)
+
+
+def evaluate_batch(boards: np.ndarray) -> np.ndarray:
+    """
+    Evaluate N positions at once from an (N, 8, 8) array of signed pieces,
+    white's point of view. Scores match evaluate_board: material plus
+    piece-square terms gathered from the flattened tables and blended per
+    row by game phase, using array operations only.
+    """
+    pieces = np.asarray(boards, dtype=np.int64).reshape(-1, 64) + 6
+    index = pieces * 64 + SQUARE_OFFSETS
+    mg = PIECE_SQUARE_MG_FLAT.take(index).sum(axis=1)
+    eg = PIECE_SQUARE_EG_FLAT.take(index).sum(axis=1)
+    phase = np.minimum(PHASE_BY_PIECE.take(pieces).sum(axis=1), chess.TOTAL_PHASE)
+    return (mg * phase + eg * (chess.TOTAL_PHASE - phase)) // chess.TOTAL_PHASE
@@ -1,41 +1,219 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import chess
 import time
-from evaluate import evaluate_board, move_value, check_end_game
+from evaluate import evaluate_board, evaluate_batch, move_value, check_end_game, mvv_lva, PIECE_VALUE
 import random
+import numpy as np
 
 debug_info: Dict[str, Any] = {"engine": "pypy"}
+# Deepest ply the current iteration reached, quiescence included (UCI seldepth)
+seldepth = 0
 
 MATE_SCORE = 1000000000
 MATE_THRESHOLD = 999000000
 
+# Transposition table bound types
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+TT_SIZE = 1 << 20
+
+# Half width of the aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+# Bounds on the effective branching factor used to predict the next
+# iteration's time: the ratio of two iteration times is noise while they
+# take microseconds
+MIN_BRANCHING_FACTOR = 2
+MAX_BRANCHING_FACTOR = 8
+# Slack for positional gains when pruning captures that cannot raise alpha
+DELTA_MARGIN = 200
+
+# Move ordering: captures and promotions, then killer moves, then quiet moves by history
+MAX_PLY = 64
+CAPTURE_BONUS = 1 << 30
+KILLER_BONUS = 1 << 29
+# Ordering score of the principal variation or transposition table move, above all others
+HASH_MOVE_BONUS = CAPTURE_BONUS << 1
+
+# Moves and their ordering scores for every ply on the current search path,
+# filled in place by order_moves and order_captures and reused from node to
+# node; quiescence stands pat beyond MAX_SEARCH_PLY
+MAX_SEARCH_PLY = 128
+move_stack: List[List[Optional[chess.Move]]] = [[None] * chess.MAX_MOVES for _ in range(MAX_SEARCH_PLY)]
+score_stack: List[List[int]] = [[0] * chess.MAX_MOVES for _ in range(MAX_SEARCH_PLY)]
+
+
+class TranspositionTable:
+    """
+    Fixed-size table of search results indexed by the low bits of the
+    Zobrist key. Each slot holds one (key, depth, flag, score, move,
+    generation) tuple; a new result replaces it unless the slot holds a
+    deeper result for another position from the current search.
+    """
+
+    def __init__(self, size: int = TT_SIZE):
+        self.mask = size - 1
+        self.entries: List[Optional[tuple]] = [None] * size
+        self.generation = 0
+
+    def clear(self) -> None:
+        self.entries = [None] * (self.mask + 1)
+        self.generation = 0
+
+    def new_search(self) -> None:
+        self.generation += 1
+
+    def probe(self, key: int) -> Optional[tuple]:
+        entry = self.entries[key & self.mask]
+        if entry is not None and entry[0] == key:
+            return entry
+        return None
+
+    def store(self, key: int, depth: int, flag: int, score: float, move: Optional[chess.Move]) -> None:
+        index = key & self.mask
+        entry = self.entries[index]
+        if entry is None or entry[0] == key or entry[5] != self.generation or depth >= entry[1]:
+            self.entries[index] = (key, depth, flag, score, move, self.generation)
+
+
+transposition_table = TranspositionTable()
+
+# Principal variation of the last completed iteration, keyed by the Zobrist
+# key of the position each move is played from
+principal_variation: Dict[int, chess.Move] = {}
+
+# Two quiet moves per ply that caused a beta cutoff, most recent first
+killer_moves: List[List[Optional[chess.Move]]] = [[None, None] for _ in range(MAX_PLY)]
+# Butterfly history: cutoff credit of quiet moves by side to move, from and to square
+history_table = np.zeros((2, 64, 64), dtype=np.int64)
+
+# Score the children of depth 1 nodes in one evaluate_batch call (UCI option BatchLeaves)
+batch_leaves = False
+
+
+def set_batch_leaves(enabled: bool) -> None:
+    """Switch batched frontier evaluation on or off for the following searches."""
+    global batch_leaves
+    batch_leaves = enabled
+
+
+def clear_move_ordering() -> None:
+    """Forget killer moves and history, e.g. for a new game."""
+    for killers in killer_moves:
+        killers[0] = killers[1] = None
+    history_table.fill(0)
+
+
+def age_move_ordering() -> None:
+    """
+    Between searches the killers no longer match their plies, and history
+    is halved so that the new position's cutoffs soon dominate.
+    """
+    for killers in killer_moves:
+        killers[0] = killers[1] = None
+    history_table[...] //= 2
+
+
+def record_cutoff(board: chess.Board, move: chess.Move, depth: int, ply: int) -> None:
+    """Credit a quiet move that caused a beta cutoff."""
+    killers = killer_moves[min(ply, MAX_PLY - 1)]
+    if killers[0] != move:
+        killers[1] = killers[0]
+        killers[0] = move
+    from_index = 8 * move.from_square[0] + move.from_square[1]
+    to_index = 8 * move.to_square[0] + move.to_square[1]
+    side = 0 if board.turn == chess.WHITE else 1
+    history_table[side, from_index, to_index] += depth * depth
+
+
+def next_iteration_fits(elapsed: float, iteration_time: float, previous_time: float, soft_limit: float) -> bool:
+    """
+    Whether the next iteration is expected to finish before soft_limit. It
+    should take as long as the last one times the effective branching
+    factor, the ratio of the last two iteration times kept between
+    MIN_BRANCHING_FACTOR and MAX_BRANCHING_FACTOR.
+    """
+    if previous_time <= 0:
+        return elapsed < soft_limit
+    branching_factor = min(max(iteration_time / previous_time, MIN_BRANCHING_FACTOR), MAX_BRANCHING_FACTOR)
+    return elapsed + iteration_time * branching_factor < soft_limit
+
 
 def next_move(
     board: chess.Board,
     time_limit: float,
     name: str,
-    debug=True
+    debug=True,
+    max_depth: int = MAX_SEARCH_PLY,
+    info=False,
+    soft_limit: float = float("inf")
 ) -> chess.Move:
     """
-    Uses iterative deepening to search deeper until time runs out.
+    Uses iterative deepening to search deeper until max_depth has been
+    searched or the next iteration is not expected to finish within
+    soft_limit seconds; a running iteration is abandoned at time_limit,
+    so at the soft limit the search stops with time to spare. Prints a UCI
+    info line after every completed iteration when info is set.
+    Each iteration starts from the previous one's principal variation,
+    orders the root moves by the scores they got there and searches in an
+    aspiration window around the previous score, widening the failing
+    side to infinity and searching again when the score falls outside.
+    Killer moves and history carry over between iterations and are aged
+    once per call.
     """
     debug_info.clear()
     debug_info["nodes"] = 0
     debug_info["engine"] = name
+    transposition_table.new_search()
+    principal_variation.clear()
+    age_move_ordering()
+    root_scores: Dict[chess.Move, float] = {}
     t0 = time.perf_counter()
     best_move = None
+    score = None
     depth = 1
+    previous_time = 0.0
+
+    global seldepth
+    soft_limit = min(soft_limit, time_limit)
+    while depth <= max_depth and time.perf_counter() - t0 < soft_limit:
+        if score is None or abs(score) >= MATE_THRESHOLD:
+            alpha, beta = -float("inf"), float("inf")
+        else:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        seldepth = 0
+        iteration_start = time.perf_counter()
+
+        while True:
+            current_move, value = negamax_root(
+                depth,
+                board,
+                alpha,
+                beta,
+                t0,
+                time_limit,
+                root_scores
+            )
+            if time.perf_counter() - t0 >= time_limit:
+                break
+            if value <= alpha:
+                alpha = -float("inf")
+            elif value >= beta:
+                beta = float("inf")
+            else:
+                break
 
-    while time.perf_counter() - t0 < time_limit:
-        current_move = minimax_root(
-            depth,
-            board,
-            t0,
-            time_limit
-        )
         if current_move is not None:
             best_move = current_move
-            # Log progress for each completed depth
+            score = value
+            pv = extract_pv(board, depth)
+            update_principal_variation(board, pv)
+            if info:
+                print(uci_info(depth, seldepth, debug_info["nodes"], time.perf_counter() - t0, score, pv), flush=True)
+            iteration_time = time.perf_counter() - iteration_start
+            if not next_iteration_fits(time.perf_counter() - t0, iteration_time, previous_time, soft_limit):
+                break
+            previous_time = iteration_time
         depth += 1
 
     debug_info["time"] = time.perf_counter() - t0
@@ -43,102 +221,350 @@ def next_move(
         log_info(f"Final stats: {debug_info}")
     return best_move if best_move else random.choice(list(board.legal_moves))
 
-def minimax_root(
+
+def uci_info(depth: int, sel_depth: int, nodes: int, elapsed: float, score: float, pv: List[chess.Move]) -> str:
+    """
+    UCI info line for a completed iteration. Mate scores do not carry the
+    distance to mate, so it is counted in moves along the principal variation.
+    """
+    if score >= MATE_THRESHOLD:
+        score_text = f"mate {(len(pv) + 1) // 2}"
+    elif score <= -MATE_THRESHOLD:
+        score_text = f"mate {-(len(pv) // 2)}"
+    else:
+        score_text = f"cp {int(score)}"
+    return (f"info depth {depth} seldepth {max(sel_depth, depth)} nodes {nodes} "
+            f"nps {int(nodes / max(elapsed, 1e-6))} time {int(elapsed * 1000)} "
+            f"score {score_text} pv {' '.join(str(move) for move in pv)}")
+
+def negamax_root(
     max_depth: int,
     board: chess.Board,
+    alpha: float,
+    beta: float,
     start_time: float,
     time_limit: float,
-) -> Optional[chess.Move]:
+    root_scores: Optional[Dict[chess.Move, float]] = None
+) -> Tuple[Optional[chess.Move], float]:
     """
-    Iterative deepening root with node counting.
+    Principal variation search at the root within (alpha, beta). Returns
+    the best move and its score from the side to move's point of view.
+    root_scores holds each root move's score from the previous iteration;
+    moves are tried best score first and the dict is refilled with the
+    scores of this iteration.
     """
-    best_value = -float("inf") if board.turn == chess.WHITE else float("inf")
+    alpha_orig = alpha
+    best_value = -float("inf")
     best_move = None
-    moves = order_moves(board)
+    key = board.zobrist_hash()
+    entry = transposition_table.probe(key)
+    moves = order_root_moves(board, principal_variation.get(key, entry[4] if entry else None))
+    if root_scores:
+        # Stable sort: moves without a previous score keep their heuristic order at the end
+        moves.sort(key=lambda m: -root_scores.get(m, -float("inf")))
+    if root_scores is None:
+        root_scores = {}
 
     for move in moves:
         if time.perf_counter() - start_time >= time_limit:
-            return None
+            return None, best_value
+        if not board.is_legal(move):
+            continue
 
         board.push(move)
-        value = minimax(
-            max_depth - 1,
-            board,
-            -float("inf"),
-            float("inf"),
-            board.turn == chess.WHITE,
-            start_time,
-            time_limit
-        )
+        if best_move is None:
+            value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
+        else:
+            value = -negamax(max_depth - 1, board, -alpha - 1, -alpha, 1, start_time, time_limit)
+            if alpha < value < beta:
+                value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
         board.pop()
+        root_scores[move] = value
 
-        if (board.turn == chess.WHITE and value > best_value) or \
-           (board.turn == chess.BLACK and value < best_value):
+        if value > best_value:
             best_value = value
             best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+
+    if best_move is not None and time.perf_counter() - start_time < time_limit:
+        transposition_table.store(key, max_depth, bound_flag(best_value, alpha_orig, beta), best_value, best_move)
+    return best_move, best_value
+
+def extract_pv(board: chess.Board, max_length: int) -> List[chess.Move]:
+    """
+    Follow the transposition table moves from the current position to
+    recover the principal variation of the last search.
+    """
+    pv = []
+    seen = set()
+    while len(pv) < max_length:
+        key = board.zobrist_hash()
+        entry = transposition_table.probe(key)
+        if entry is None or entry[4] is None or key in seen:
+            break
+        move = entry[4]
+        if move not in board.pseudo_legal_moves() or not board.is_legal(move):
+            break
+        seen.add(key)
+        board.push(move)
+        pv.append(move)
+    for _ in pv:
+        board.pop()
+    return pv
+
+
+def update_principal_variation(board: chess.Board, pv: List[chess.Move]) -> None:
+    """Remember the moves of pv by the key of the position they are played from."""
+    principal_variation.clear()
+    for move in pv:
+        principal_variation[board.zobrist_hash()] = move
+        board.push(move)
+    for _ in pv:
+        board.pop()
 
-    return best_move
 
-def order_moves(board: chess.Board) -> List[chess.Move]:
-    """Generate legal moves sorted by heuristic value."""
+def order_moves(
+    board: chess.Board,
+    moves: List[Optional[chess.Move]],
+    scores: List[int],
+    tt_move: Optional[chess.Move] = None,
+    ply: Optional[int] = None
+) -> int:
+    """
+    Generate the pseudo-legal moves into moves with their ordering scores
+    in scores, higher first for the side to move: the principal variation
+    or transposition table move (if any), captures and promotions by
+    heuristic value, the killer moves of ply, then quiet moves by history.
+    Returns the number of moves. Legality is left to the caller
+    (board.is_legal) so that moves cut off by alpha-beta are never tested.
+    """
     endgame = check_end_game(board)
-    is_white = board.turn == chess.WHITE
+    side = 0 if board.turn == chess.WHITE else 1
+    killers = killer_moves[min(ply, MAX_PLY - 1)] if ply is not None else (None, None)
+
+    count = board.generate_moves(moves)
+    for i in range(count):
+        move = moves[i]
+        if move == tt_move:
+            scores[i] = HASH_MOVE_BONUS
+            continue
+        score = board.turn * move_value(board, move, endgame)
+        if move.promotion or board.piece_at(move.to_square) * board.turn < 0:
+            score += CAPTURE_BONUS
+        elif move == killers[0]:
+            score += KILLER_BONUS + 1
+        elif move == killers[1]:
+            score += KILLER_BONUS
+        else:
+            score += history_table[side, 8 * move.from_square[0] + move.from_square[1],
+                                   8 * move.to_square[0] + move.to_square[1]]
+        scores[i] = score
+    return count
+
+
+def pick_move(moves: List[Optional[chess.Move]], scores: List[int], i: int, count: int) -> chess.Move:
+    """
+    Selection step: bring the best scored of moves[i:count] to i and return
+    it. The moves passed over shift up one place, so equal scores keep their
+    generation order.
+    """
+    best = max(range(i, count), key=scores.__getitem__)
+    if best != i:
+        moves.insert(i, moves.pop(best))
+        scores.insert(i, scores.pop(best))
+    return moves[i]
 
-    moves = []
-    for move in board.legal_moves():
-        score = move_value(board, move, endgame)
-        moves.append((score, move))
 
-    return [m for _, m in sorted(moves, key=lambda x: x[0], reverse=is_white)]
+def order_root_moves(board: chess.Board, tt_move: Optional[chess.Move] = None) -> List[chess.Move]:
+    """The pseudo-legal moves of the root in order_moves order."""
+    moves, scores = move_stack[0], score_stack[0]
+    count = order_moves(board, moves, scores, tt_move)
+    return [pick_move(moves, scores, i, count) for i in range(count)]
 
-def minimax(
+
+def negamax(
     depth: int,
     board: chess.Board,
     alpha: float,
     beta: float,
-    is_maximizing: bool,
+    ply: int,
     start_time: float,
-    time_limit: float
+    time_limit: float,
+    stand_pat: Optional[float] = None
 ) -> float:
     """
-    Updated minimax with proper node counting.
+    Principal variation search over pseudo-legal moves, scored from the
+    side to move's point of view. The first move gets the full window and
+    the rest a null window around alpha, re-searched with the full window
+    only when they land inside it. A move is checked for legality only
+    when it is about to be searched; a node where no move passes is
+    checkmate or stalemate. Results are stored in the transposition table,
+    whose entries cut the search short when deep enough and otherwise
+    supply the move to try first. Quiet moves that cause a beta cutoff
+    become killers for this ply and earn history credit.
+
+    With batch_leaves set, a depth 1 node tests all its moves for legality
+    up front and gets the static evaluations of all children from one
+    evaluate_batch call, handed down as the children's stand_pat.
     """
     debug_info["nodes"] += 1  # Increment node count here
 
     if time.perf_counter() - start_time >= time_limit:
         return 0
 
-    if board.is_checkmate():
-        return -MATE_SCORE if is_maximizing else MATE_SCORE
-    elif board.is_game_over():
+    if board.can_claim_draw():
         return 0
 
-    if depth == 0:
-        return evaluate_board(board)
-
-    moves = order_moves(board)
-    if is_maximizing:
-        max_eval = -float("inf")
-        for move in moves:
-            board.push(move)
-            eval = minimax(depth - 1, board, alpha, beta, False, start_time, time_limit)
-            board.pop()
-            max_eval = max(max_eval, eval)
-            alpha = max(alpha, eval)
-            if beta <= alpha:
-                break
-        return max_eval
-    else:
-        min_eval = float("inf")
-        for move in moves:
-            board.push(move)
-            eval = minimax(depth - 1, board, alpha, beta, True, start_time, time_limit)
-            board.pop()
-            min_eval = min(min_eval, eval)
-            beta = min(beta, eval)
-            if beta <= alpha:
-                break
-        return min_eval
+    if depth == 0 or ply >= MAX_SEARCH_PLY:
+        return quiescence(board, alpha, beta, ply, start_time, time_limit, stand_pat)
+
+    key = board.zobrist_hash()
+    entry = transposition_table.probe(key)
+    tt_move = principal_variation.get(key)
+    if entry is not None:
+        tt_move = tt_move or entry[4]
+        if entry[1] >= depth:
+            flag, score = entry[2], entry[3]
+            if flag == EXACT:
+                return score
+            if flag == LOWER_BOUND:
+                alpha = max(alpha, score)
+            else:
+                beta = min(beta, score)
+            if alpha >= beta:
+                return score
+    alpha_orig, beta_orig = alpha, beta
+
+    best_value = -float("inf")
+    best_move = None
+    moves, scores = move_stack[ply], score_stack[ply]
+    count = order_moves(board, moves, scores, tt_move, ply)
+    child_stand_pats = None
+    if depth == 1 and batch_leaves:
+        moves = [move for move in (pick_move(moves, scores, i, count) for i in range(count)) if board.is_legal(move)]
+        count = len(moves)
+        child_stand_pats = frontier_stand_pats(board, moves)
+    for i in range(count):
+        if child_stand_pats is None:
+            move = pick_move(moves, scores, i, count)
+            if not board.is_legal(move):
+                continue
+            child_stand_pat = None
+        else:
+            move = moves[i]
+            child_stand_pat = child_stand_pats[i]
+        board.push(move)
+        if best_move is None:
+            value = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit, child_stand_pat)
+        else:
+            value = -negamax(depth - 1, board, -alpha - 1, -alpha, ply + 1, start_time, time_limit, child_stand_pat)
+            if alpha < value < beta:
+                value = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit, child_stand_pat)
+        board.pop()
+        if value > best_value:
+            best_value = value
+            best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            if not move.promotion and board.piece_at(move.to_square) * board.turn >= 0:
+                record_cutoff(board, move, depth, ply)
+            break
+
+    if best_move is None:
+        return -MATE_SCORE if board.is_check() else 0
+
+    # Scores of an interrupted search are not trustworthy, keep them out of the table
+    if time.perf_counter() - start_time < time_limit:
+        transposition_table.store(key, depth, bound_flag(best_value, alpha_orig, beta_orig), best_value, best_move)
+    return best_value
+
+
+def quiescence(
+    board: chess.Board,
+    alpha: float,
+    beta: float,
+    ply: int,
+    start_time: float,
+    time_limit: float,
+    stand_pat: Optional[float] = None
+) -> float:
+    """
+    Capture-only search at the horizon so that leaves are not scored in
+    the middle of an exchange. The side to move may stand pat on the
+    static evaluation (evaluated here unless the caller already has it);
+    captures are tried most valuable victim first and skipped when even
+    winning the victim outright cannot reach alpha.
+    """
+    global seldepth
+    debug_info["nodes"] += 1
+    if ply > seldepth:
+        seldepth = ply
+
+    if time.perf_counter() - start_time >= time_limit:
+        return 0
+
+    if stand_pat is None:
+        stand_pat = board.turn * evaluate_board(board)
+    if stand_pat >= beta or ply >= MAX_SEARCH_PLY:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    moves, scores = move_stack[ply], score_stack[ply]
+    count = order_captures(board, moves, scores)
+    for i in range(count):
+        move = pick_move(moves, scores, i, count)
+        # Delta pruning
+        if stand_pat + PIECE_VALUE[abs(board.piece_at(move.to_square))] + DELTA_MARGIN <= alpha:
+            continue
+        if not board.is_legal(move):
+            continue
+        board.push(move)
+        value = -quiescence(board, -beta, -alpha, ply + 1, start_time, time_limit)
+        board.pop()
+        if value >= beta:
+            return value
+        alpha = max(alpha, value)
+    return alpha
+
+
+def frontier_stand_pats(board: chess.Board, moves: List[chess.Move]) -> List[float]:
+    """
+    Static evaluation of the position after each move, from the point of
+    view of the side to move there, scored in one evaluate_batch call.
+    """
+    positions = np.empty((len(moves), 8, 8), dtype=np.int64)
+    for i, move in enumerate(moves):
+        board.push(move)
+        positions[i] = board._board
+        board.pop()
+    return (-board.turn * evaluate_batch(positions)).tolist()
+
+
+def order_captures(board: chess.Board, moves: List[Optional[chess.Move]], scores: List[int]) -> int:
+    """
+    Generate the pseudo-legal captures of enemy pieces into moves with
+    their MVV-LVA scores in scores and return their number.
+    """
+    turn = board.turn
+    captures = 0
+    for i in range(board.generate_moves(moves)):
+        move = moves[i]
+        if board.piece_at(move.to_square) * turn < 0:
+            moves[captures] = move
+            scores[captures] = mvv_lva(board, move)
+            captures += 1
+    return captures
+
+
+def bound_flag(value: float, alpha: float, beta: float) -> int:
+    """Transposition table flag for a score searched in the window (alpha, beta)."""
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
 
 
 def log_info(message: str) -> None:
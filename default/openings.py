@@ -0,0 +1,83 @@
+"""
+Score the opening books in Openings/ and report evaluation throughput.
+
+Every game in the given PGN files is replayed to its final position, the
+positions are stacked into one (N, 8, 8) array and scored both with
+evaluate_batch and position by position with evaluate_board:
+
+    python openings.py ../Openings/Balsa_v500.pgn ../Openings/Balsa_Top50.pgn
+"""
+import argparse
+import re
+import time
+
+import numpy as np
+
+import chess
+from evaluate import evaluate_board, evaluate_batch
+
+MOVE_NUMBER = re.compile(r"^\d+\.+")
+RESULTS = {"*", "1-0", "0-1", "1/2-1/2"}
+
+
+def read_pgn_games(path: str) -> list:
+    """Return the SAN move list of every game in a PGN file."""
+    games = []
+    moves = []
+    with open(path, encoding="utf-8-sig") as pgn:
+        for line in pgn:
+            line = re.sub(r"\{[^}]*\}", "", line.strip())
+            if line.startswith("["):
+                if moves:
+                    games.append(moves)
+                    moves = []
+                continue
+            for token in line.split():
+                token = MOVE_NUMBER.sub("", token)
+                if token and token not in RESULTS:
+                    moves.append(token)
+    if moves:
+        games.append(moves)
+    return games
+
+
+def opening_boards(paths: list) -> list:
+    """Replay every game of the PGN files and return the final Boards."""
+    boards = []
+    for path in paths:
+        for game in read_pgn_games(path):
+            board = chess.Board()
+            for san in game:
+                board.push(chess.parse_san(board, san))
+            boards.append(board)
+    return boards
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score opening books and measure evaluation throughput.")
+    parser.add_argument("pgn", nargs="+", help="PGN files to read")
+    parser.add_argument("--repeat", type=int, default=10, help="timing repetitions (default: 10)")
+    args = parser.parse_args()
+
+    boards = opening_boards(args.pgn)
+    positions = np.array([board._board for board in boards], dtype=np.int64)
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        scores = evaluate_batch(positions)
+    batch_time = (time.perf_counter() - start) / args.repeat
+
+    start = time.perf_counter()
+    for _ in range(args.repeat):
+        single = [evaluate_board(board) for board in boards]
+    single_time = (time.perf_counter() - start) / args.repeat
+
+    assert list(scores) == single, "evaluate_batch disagrees with evaluate_board"
+    print(f"positions {len(boards)}")
+    print(f"score mean {scores.mean():.1f} min {scores.min()} max {scores.max()}")
+    print(f"evaluate_batch {len(boards) / batch_time:.0f} positions/s")
+    print(f"evaluate_board {len(boards) / single_time:.0f} positions/s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,220 @@
+"""
+Root-parallel search over a pool of worker processes (main.py --threads N).
+
+The first root move is searched in the engine process with the full
+window to establish alpha, then the remaining root moves are handed to
+the workers, young brothers wait style. Workers share the best score
+found so far through a shared-memory alpha bound: each one reads it when
+it starts a move, searches the move with a null window around it and,
+when the move beats it, searches it again with the full window and
+raises the shared bound. Every worker keeps its own board, transposition
+table, killers and history, which persist between the moves and searches
+it is given; the board is set up once per search from the root FEN the
+engine process publishes in shared memory, so tasks carry only a move.
+"""
+import multiprocessing
+import random
+import time
+from typing import Dict, Optional, Tuple
+
+import chess
+import movegeneration
+from movegeneration import ASPIRATION_WINDOW, MATE_THRESHOLD, transposition_table, principal_variation, \
+    debug_info, age_move_ordering, order_root_moves, negamax, bound_flag, extract_pv, update_principal_variation, \
+    log_info, uci_info, next_iteration_fits, MAX_SEARCH_PLY
+
+pool = None
+# Best root score so far in the current root search, shared with the workers
+shared_alpha = None
+# FEN of the root position of the current search, shared with the workers
+shared_fen = None
+# Room for the longest FEN, with a piece or gap on every square
+FEN_SIZE = 128
+# Number of the current next_move call, and in a worker the last one it
+# searched for, so that workers age their tables once per search
+search_id = 0
+worker_search_id = 0
+# A worker's copy of the root position, set up from shared_fen for each search
+worker_board = None
+
+
+def start_pool(threads: int, board_class=chess.Board) -> None:
+    """Start the worker processes used by next_move, searching on board_class boards."""
+    global pool, shared_alpha, shared_fen
+    shared_alpha = multiprocessing.Value("d", -float("inf"))
+    shared_fen = multiprocessing.Array("c", FEN_SIZE)
+    pool = multiprocessing.Pool(threads, initializer=init_worker, initargs=(shared_alpha, shared_fen, board_class))
+
+
+def stop_pool() -> None:
+    global pool
+    if pool is not None:
+        pool.terminate()
+        pool = None
+
+
+def init_worker(alpha, fen, board_class) -> None:
+    global shared_alpha, shared_fen, worker_board
+    shared_alpha = alpha
+    shared_fen = fen
+    worker_board = board_class()
+
+
+def search_root_move(task: tuple) -> Tuple[chess.Move, Optional[float], int, int]:
+    """
+    Search one root move in a worker. Returns the move, its score from
+    the root side's point of view (None when skipped or out of time), the
+    nodes searched and the deepest ply reached.
+    """
+    global worker_search_id
+    move, depth, beta, start_time, time_limit, current_search, batch_leaves = task
+    board = worker_board
+    if current_search != worker_search_id:
+        worker_search_id = current_search
+        board.set_fen(shared_fen.value.decode())
+        transposition_table.new_search()
+        principal_variation.clear()
+        age_move_ordering()
+    movegeneration.set_batch_leaves(batch_leaves)
+    debug_info["nodes"] = 0
+    movegeneration.seldepth = 0
+
+    alpha = shared_alpha.value
+    if alpha >= beta:
+        return move, None, 0, 0
+    board.push(move)
+    value = -negamax(depth - 1, board, -alpha - 1, -alpha, 1, start_time, time_limit)
+    if value > alpha:
+        # Only a lower bound: the full window search against the same alpha
+        # gives the score, even if another worker has raised alpha past it
+        value = -negamax(depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
+    board.pop()
+    if time.perf_counter() - start_time >= time_limit:
+        return move, None, debug_info["nodes"], movegeneration.seldepth
+
+    with shared_alpha.get_lock():
+        if value > shared_alpha.value:
+            shared_alpha.value = value
+    return move, value, debug_info["nodes"], movegeneration.seldepth
+
+
+def negamax_root(
+    max_depth: int,
+    board: chess.Board,
+    alpha: float,
+    beta: float,
+    start_time: float,
+    time_limit: float,
+    root_scores: Dict[chess.Move, float]
+) -> Tuple[Optional[chess.Move], float]:
+    """
+    movegeneration.negamax_root with all but the first root move searched
+    by the pool. Returns (None, score) when time runs out.
+    """
+    alpha_orig = alpha
+    key = board.zobrist_hash()
+    entry = transposition_table.probe(key)
+    moves = order_root_moves(board, principal_variation.get(key, entry[4] if entry else None))
+    if root_scores:
+        # Stable sort: moves without a previous score keep their heuristic order at the end
+        moves.sort(key=lambda m: -root_scores.get(m, -float("inf")))
+    moves = [move for move in moves if board.is_legal(move)]
+    if not moves:
+        return None, -float("inf")
+
+    best_move = moves[0]
+    board.push(best_move)
+    best_value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
+    board.pop()
+    if time.perf_counter() - start_time >= time_limit:
+        return None, best_value
+    root_scores[best_move] = best_value
+    alpha = max(alpha, best_value)
+
+    if alpha < beta and len(moves) > 1:
+        shared_alpha.value = alpha
+        tasks = [(move, max_depth, beta, start_time, time_limit, search_id, movegeneration.batch_leaves)
+                 for move in moves[1:]]
+        for move, value, nodes, sel_depth in pool.imap_unordered(search_root_move, tasks):
+            debug_info["nodes"] += nodes
+            movegeneration.seldepth = max(movegeneration.seldepth, sel_depth)
+            if value is None:
+                continue
+            root_scores[move] = value
+            if value > best_value:
+                best_value = value
+                best_move = move
+        if time.perf_counter() - start_time >= time_limit:
+            return None, best_value
+
+    transposition_table.store(key, max_depth, bound_flag(best_value, alpha_orig, beta), best_value, best_move)
+    return best_move, best_value
+
+
+def next_move(
+    board: chess.Board,
+    time_limit: float,
+    name: str,
+    debug=True,
+    max_depth: int = MAX_SEARCH_PLY,
+    info=False,
+    soft_limit: float = float("inf")
+) -> chess.Move:
+    """
+    Iterative deepening with aspiration windows as movegeneration.next_move,
+    each iteration searched by negamax_root above.
+    """
+    global search_id
+    search_id += 1
+    shared_fen.value = board.fen().encode()
+    debug_info.clear()
+    debug_info["nodes"] = 0
+    debug_info["engine"] = name
+    transposition_table.new_search()
+    principal_variation.clear()
+    age_move_ordering()
+    root_scores: Dict[chess.Move, float] = {}
+    t0 = time.perf_counter()
+    best_move = None
+    score = None
+    depth = 1
+    previous_time = 0.0
+    soft_limit = min(soft_limit, time_limit)
+
+    while depth <= max_depth and time.perf_counter() - t0 < soft_limit:
+        if score is None or abs(score) >= MATE_THRESHOLD:
+            alpha, beta = -float("inf"), float("inf")
+        else:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        movegeneration.seldepth = 0
+        iteration_start = time.perf_counter()
+
+        while True:
+            current_move, value = negamax_root(depth, board, alpha, beta, t0, time_limit, root_scores)
+            if current_move is None:
+                break
+            if value <= alpha:
+                alpha = -float("inf")
+            elif value >= beta:
+                beta = float("inf")
+            else:
+                break
+
+        if current_move is not None:
+            best_move = current_move
+            score = value
+            pv = extract_pv(board, depth)
+            update_principal_variation(board, pv)
+            if info:
+                print(uci_info(depth, movegeneration.seldepth, debug_info["nodes"], time.perf_counter() - t0,
+                               score, pv), flush=True)
+            iteration_time = time.perf_counter() - iteration_start
+            if not next_iteration_fits(time.perf_counter() - t0, iteration_time, previous_time, soft_limit):
+                break
+            previous_time = iteration_time
+        depth += 1
+
+    debug_info["time"] = time.perf_counter() - t0
+    if debug:
+        log_info(f"Final stats: {debug_info}")
+    return best_move if best_move else random.choice(list(board.legal_moves()))
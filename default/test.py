@@ -1,6 +1,11 @@
+import os
 import unittest
 import numpy as np
 import chess
+import main
+import movegeneration
+import openings
+import parallel
 
 class TestBoard(unittest.TestCase):
     def setUp(self):
@@ -235,6 +240,139 @@ class TestBoard(unittest.TestCase):
         self.assertEqual(popped_move1.from_square, move1.from_square)
         self.assertEqual(popped_move1.to_square, move1.to_square)
 
+    def test_pop_restores_capture_promotion_and_castling(self):
+        """Test that pop undoes captures, promotions and castling."""
+        self.board.set_fen("r3k3/1P6/8/3p4/4P3/8/8/4K2R w K - 0 1")
+        before = self.board._board.copy()
+        for uci in ["e4d5", "e8c8", "b7b8q", "c8b8", "e1g1"]:
+            self.board.push_uci(uci)
+        self.assertEqual(self.board.piece_at((7, 5)), chess.ROOK)
+        self.assertEqual(self.board.piece_at((0, 3)), -chess.ROOK)
+        self.assertEqual(self.board.castling_rights, 0)
+        for _ in range(5):
+            self.board.pop()
+        np.testing.assert_array_equal(self.board._board, before)
+        self.assertEqual(self.board.turn, chess.WHITE)
+        self.assertEqual(self.board.castling_rights, chess.CASTLE_WHITE_KINGSIDE)
+
+    def test_en_passant_state(self):
+        """Test that double pawn pushes set the ep square and ep captures remove the pawn."""
+        self.board.set_fen("4k3/3p4/8/4P3/8/8/8/4K3 b - - 0 1")
+        self.board.push_uci("d7d5")
+        self.assertEqual(self.board.ep_square, (2, 3))
+        self.board.push_uci("e5d6")
+        self.assertEqual(self.board.piece_at((3, 3)), 0)
+        self.assertIsNone(self.board.ep_square)
+        self.board.pop()
+        self.assertEqual(self.board.piece_at((3, 3)), -chess.PAWN)
+        self.assertEqual(self.board.ep_square, (2, 3))
+
+    def test_pop_empty(self):
+        """Test that popping without moves raises."""
+        with self.assertRaises(IndexError):
+            self.board.pop()
+
+    def test_is_legal_with_pins_and_checks(self):
+        """Test lazy legality checks against the cached pin and check masks."""
+        self.board.set_fen("4k3/4r3/8/8/1b6/8/3PB3/4K2R w - - 0 1")
+        legal = {str(m) for m in self.board.pseudo_legal_moves() if self.board.is_legal(m)}
+        self.assertNotIn("e2d3", legal)  # Bishop pinned on the e-file
+        self.assertNotIn("d2d3", legal)  # Pawn pinned by the b4 bishop
+        self.assertIn("h1h8", legal)
+        self.assertEqual(legal, {str(m) for m in self.board.legal_moves()})
+        self.assertFalse(self.board.is_check())
+
+        self.board.set_fen("4k3/8/8/8/1b6/8/8/R3K3 w - - 0 1")
+        legal = {str(m) for m in self.board.pseudo_legal_moves() if self.board.is_legal(m)}
+        self.assertTrue(self.board.is_check())
+        self.assertEqual(legal, {"e1e2", "e1f2", "e1f1", "e1d1"})
+
+    def test_pseudo_legal_moves_include_illegal(self):
+        """Test that pseudo-legal generation skips the king safety test."""
+        self.board.set_fen("4k3/4r3/8/8/8/8/4B3/4K3 w - - 0 1")
+        pseudo = list(self.board.pseudo_legal_moves())
+        self.assertTrue(any(m.from_square == (6, 4) for m in pseudo))
+        self.assertFalse(any(m.from_square == (6, 4) for m in self.board.legal_moves()))
+
+    def test_piece_lists_follow_push_and_pop(self):
+        """Test that piece lists and king squares are kept up to date by push/pop."""
+        self.board.set_fen("r3k2r/8/8/8/4p3/8/3P4/R3K2R w KQkq - 0 1")
+        before = self.board.piece_map()
+        for move in ["e1g1", "e8c8", "d2d4", "e4d3"]:
+            self.board.push_uci(move)
+        self.assertEqual(self.board._king_squares, {chess.WHITE: (7, 6), chess.BLACK: (0, 2)})
+        self.assertEqual(self.board.piece_list(chess.WHITE), {(7, 0): chess.ROOK, (7, 5): chess.ROOK, (7, 6): chess.KING})
+        self.assertEqual(self.board.piece_list(chess.BLACK),
+                         {(0, 2): -chess.KING, (0, 3): -chess.ROOK, (0, 7): -chess.ROOK, (5, 3): -chess.PAWN})
+        for _ in range(4):
+            self.board.pop()
+        self.assertEqual(self.board.piece_map(), before)
+        self.assertEqual(self.board._king_squares, {chess.WHITE: (7, 4), chess.BLACK: (0, 4)})
+
+    def test_zobrist_hash_is_incremental(self):
+        """Test that the Zobrist key matches a fresh computation and is restored by pop."""
+        start = self.board.zobrist_hash()
+        for move in ["e2e4", "d7d5", "e4d5", "g8f6", "f1b5", "c7c6", "g1f3", "c6b5", "e1g1"]:
+            self.board.push_uci(move)
+            self.assertEqual(self.board.zobrist_hash(), self.board._compute_hash())
+        for _ in range(9):
+            self.board.pop()
+        self.assertEqual(self.board.zobrist_hash(), start)
+
+    def test_zobrist_hash_transposition(self):
+        """Test that move orders reaching the same position share a key."""
+        other = chess.Board()
+        for move in ["g1f3", "g8f6", "b1c3"]:
+            self.board.push_uci(move)
+        for move in ["b1c3", "g8f6", "g1f3"]:
+            other.push_uci(move)
+        self.assertEqual(self.board.zobrist_hash(), other.zobrist_hash())
+        other.push_uci("b8c6")
+        self.assertNotEqual(self.board.zobrist_hash(), other.zobrist_hash())
+
+    def test_scores_follow_push_and_pop(self):
+        """Test that the running evaluation terms match a fresh computation and are restored by pop."""
+        self.board.set_fen("r3k2r/1P6/8/8/4p3/8/3P4/R3K2R w KQkq - 0 1")
+        start = (self.board.scores(), self.board.piece_count(chess.QUEEN), self.board.piece_count(-chess.ROOK),
+                 self.board.phase())
+        for move in ["e1g1", "e8c8", "d2d4", "e4d3", "b7b8q"]:
+            self.board.push_uci(move)
+            scores, counts = chess.score_pieces(self.board.piece_map().items())
+            self.assertEqual(self.board.scores(), scores)
+            self.assertEqual([self.board.piece_count(piece - 6) for piece in range(13)], counts)
+            self.assertEqual(self.board.phase(), chess.game_phase(counts))
+        for _ in range(5):
+            self.board.pop()
+        self.assertEqual(
+            (self.board.scores(), self.board.piece_count(chess.QUEEN), self.board.piece_count(-chess.ROOK),
+             self.board.phase()), start)
+
+    def test_evaluate_batch_matches_evaluate_board(self):
+        """Test that batch evaluation scores each position like evaluate_board."""
+        from evaluate import evaluate_board, evaluate_batch
+        fens = ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                "8/P1k5/8/8/8/8/5Kp1/8 w - - 0 1"]
+        positions, expected = [self.board._board.copy()], [evaluate_board(self.board)]
+        for fen in fens:
+            self.board.set_fen(fen)
+            positions.append(self.board._board.copy())
+            expected.append(evaluate_board(self.board))
+        self.assertEqual(list(evaluate_batch(np.array(positions))), expected)
+
+    def test_parse_san(self):
+        """Test converting PGN move notation, including castling, en passant and promotion."""
+        for san in ["e4", "d5", "exd5", "Nf6", "Nc3", "Nxd5", "Nf3", "e5", "Bc4", "Be7", "O-O"]:
+            self.board.push(chess.parse_san(self.board, san))
+        self.assertEqual(self.board.piece_at((7, 6)), chess.KING)
+        self.assertEqual(self.board.piece_at((7, 5)), chess.ROOK)
+        self.board.set_fen("rnbqkbnr/ppp1p1pp/8/3pPp2/8/8/PPPP1PPP/RNBQKBNR w KQkq f6 0 3")
+        self.assertEqual(str(chess.parse_san(self.board, "exf6")), "e5f6")
+        self.board.set_fen("k7/1P6/8/8/8/8/8/KR3R2 w - - 0 1")
+        self.assertEqual(str(chess.parse_san(self.board, "b8=N")), "b7b8n")
+        self.assertEqual(str(chess.parse_san(self.board, "Rbd1")), "b1d1")
+        self.assertRaises(ValueError, chess.parse_san, self.board, "Rd1")
+
     def test_is_square_attacked_by_pawn(self):
         """Test if a square is attacked by a pawn."""
         self.board.set_fen("8/8/8/8/8/3p4/8/8 w - - 0 1")  # Black pawn at d3
@@ -344,5 +482,263 @@ class TestBoard(unittest.TestCase):
         move.promotion = chess.QUEEN
         self.assertTrue(self.board._is_move_legal(move, chess.WHITE))
 
+    def test_perft(self):
+        """Test leaf counts from the start position and that perft leaves the board unchanged."""
+        before = self.board._board.copy()
+        self.assertEqual([self.board.perft(depth) for depth in range(4)], [1, 20, 400, 8902])
+        np.testing.assert_array_equal(self.board._board, before)
+        self.assertEqual(self.board.zobrist_hash(), self.board._compute_hash())
+
+    def test_perft_divide(self):
+        """Test that the per-move counts add up to perft."""
+        divide = self.board.perft_divide(3)
+        self.assertEqual(len(divide), 20)
+        self.assertEqual(divide["e2e4"], 600)
+        self.assertEqual(sum(divide.values()), 8902)
+
+
+class TestBitboardBoard(unittest.TestCase):
+    def setUp(self):
+        """Initialize a BitboardBoard object for testing."""
+        self.board = chess.BitboardBoard()
+
+    def perft(self, board, depth):
+        if depth == 0:
+            return 1
+        nodes = 0
+        for move in list(board.legal_moves()):
+            board.push(move)
+            nodes += self.perft(board, depth - 1)
+            board.pop()
+        return nodes
+
+    def test_initial_board(self):
+        """Test that the bitboards describe the same start position as Board."""
+        np.testing.assert_array_equal(self.board._board, chess.Board()._board)
+        self.assertEqual(self.board.turn, chess.WHITE)
+
+    def test_set_fen(self):
+        """Test setting the board from a FEN string."""
+        fen = "rnbqkbnr/pppppppp/8/8/4P3/8/PPPP1PPP/RNBQKBNR b KQkq e3 0 1"
+        self.board.set_fen(fen)
+        reference = chess.Board()
+        reference.set_fen(fen)
+        np.testing.assert_array_equal(self.board._board, reference._board)
+        self.assertEqual(self.board.turn, chess.BLACK)
+
+    def test_legal_moves_match_board(self):
+        """Test that move generation agrees with the array board."""
+        for fen in ["rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+                    "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+                    "4k3/1P6/8/8/8/8/6p1/4K3 b - - 0 1"]:
+            reference = chess.Board()
+            reference.set_fen(fen)
+            self.board.set_fen(fen)
+            self.assertEqual(sorted(str(m) for m in self.board.legal_moves()),
+                             sorted(str(m) for m in reference.legal_moves()))
+
+    def test_move_order_and_legality_match_board(self):
+        """Test that moves come in the array board's order and pass the same legality checks."""
+        for fen in ["r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+                    "4k3/4r3/8/8/8/8/4B3/4K3 w - - 0 1",
+                    "4k3/8/8/8/1b6/8/3N4/4K2R w - - 0 1",
+                    "4k3/8/8/8/1b6/8/3r4/4K3 w - - 0 1",
+                    "4k3/1P6/8/8/8/8/6p1/4K3 b - - 0 1"]:
+            reference = chess.Board()
+            reference.set_fen(fen)
+            self.board.set_fen(fen)
+            moves = list(self.board.pseudo_legal_moves())
+            self.assertEqual([str(m) for m in moves], [str(m) for m in reference.pseudo_legal_moves()])
+            self.assertEqual([self.board.is_legal(m) for m in moves], [reference.is_legal(m) for m in moves])
+            self.assertEqual(self.board.is_check(), reference.is_check())
+
+    def test_perft(self):
+        """Test leaf counts from the start position."""
+        self.assertEqual(self.perft(self.board, 3), 8902)
+
+    def test_push_and_pop_restores_position(self):
+        """Test that pop undoes captures, promotions and castling."""
+        self.board.set_fen("r3k3/1P6/8/3p4/4P3/8/8/4K2R w K - 0 1")
+        before = self.board._board
+        for uci in ["e4d5", "e8c8", "b7b8q", "c8b8", "e1g1"]:
+            self.board.push_uci(uci)
+        self.assertEqual(self.board.piece_at((7, 5)), chess.ROOK)
+        self.assertEqual(self.board.piece_at((0, 3)), -chess.ROOK)
+        self.assertEqual(self.board.piece_at((0, 1)), -chess.KING)
+        for _ in range(5):
+            self.board.pop()
+        np.testing.assert_array_equal(self.board._board, before)
+        self.assertEqual(self.board.turn, chess.WHITE)
+
+    def test_en_passant_capture(self):
+        """Test that an en passant move removes the passed pawn."""
+        self.board.set_fen("4k3/8/8/3pP3/8/8/8/4K3 w - d6 0 1")
+        self.board.push_uci("e5d6")
+        self.assertEqual(self.board.piece_at((3, 3)), 0)
+        self.assertEqual(self.board.piece_at((2, 3)), chess.PAWN)
+        self.board.pop()
+        self.assertEqual(self.board.piece_at((3, 3)), -chess.PAWN)
+
+    def test_pop_empty(self):
+        """Test that popping without moves raises."""
+        with self.assertRaises(IndexError):
+            self.board.pop()
+
+    def test_is_checkmate(self):
+        """Test checkmate detection for the side to move."""
+        self.board.set_fen("k7/8/1K6/8/8/8/8/7Q b - - 0 1")
+        self.assertFalse(self.board.is_checkmate())
+        self.board.set_fen("k7/1Q6/1K6/8/8/8/8/8 b - - 0 1")
+        self.assertTrue(self.board.is_checkmate())
+        self.assertTrue(self.board.is_game_over())
+
+    def test_piece_map(self):
+        """Test the piece map generation."""
+        piece_map = self.board.piece_map()
+        self.assertEqual(piece_map, chess.Board().piece_map())
+
+    def test_is_square_attacked(self):
+        """Test attack detection through the bitboards."""
+        self.board.set_fen("8/8/8/8/8/2b5/8/8 w - - 0 1")
+        self.assertTrue(self.board.is_square_attacked((4, 1), chess.BLACK))
+        self.assertFalse(self.board.is_square_attacked((4, 2), chess.BLACK))
+        self.assertTrue(self.board.is_square_attacked((7, 0), chess.BLACK))
+
+    def test_illegal_move_leaving_king_in_check(self):
+        """Test that pinned pieces cannot leave the pin line."""
+        self.board.set_fen("4k3/4r3/8/8/8/8/4B3/4K3 w - - 0 1")
+        moves = {str(m) for m in self.board.legal_moves()}
+        self.assertFalse(any(m.startswith("e2") for m in moves))
+
+
+class TestTimeBudget(unittest.TestCase):
+    def test_parse_go(self):
+        """Test that clock fields are read in seconds and other tokens ignored."""
+        go = main.parse_go("go wtime 10000 btime 8000 winc 3000 binc 2000 movestogo 12 ponder".split())
+        self.assertEqual(go, {"wtime": 10.0, "btime": 8.0, "winc": 3.0, "binc": 2.0, "movestogo": 12})
+
+    def test_clock_of_side_to_move(self):
+        """Test that the side to move's clock and increment are used."""
+        go = main.parse_go("go wtime 60000 btime 1000 winc 1000 binc 0".split())
+        white_soft, white_hard = main.time_budget(go, chess.WHITE, 1)
+        black_soft, black_hard = main.time_budget(go, chess.BLACK, 1)
+        self.assertGreater(white_soft, black_soft)
+        self.assertLessEqual(white_soft, white_hard)
+        self.assertLessEqual(black_soft, black_hard)
+
+    def test_hard_limit_leaves_time_on_the_clock(self):
+        """Test that neither limit exceeds half the remaining time, even with one move to go."""
+        for fields in ("wtime 10000 winc 3000", "wtime 500 winc 3000", "wtime 10000 movestogo 1"):
+            soft, hard = main.time_budget(main.parse_go(f"go {fields}".split()), chess.WHITE, 1)
+            self.assertLessEqual(soft, hard)
+            self.assertLessEqual(hard, int(fields.split()[1]) / 2000)
+
+    def test_next_iteration_fits(self):
+        """Test the next iteration's time prediction from the effective branching factor."""
+        fits = movegeneration.next_iteration_fits
+        self.assertTrue(fits(0.5, 0.3, 0.1, 2.0))
+        self.assertFalse(fits(0.5, 0.3, 0.1, 1.0))
+        # Iterations of microseconds do not extrapolate to seconds
+        self.assertTrue(fits(0.09, 0.051, 0.0005, 2.58))
+        # Nor do noisy timings predict the next iteration to be cheaper than this one
+        self.assertFalse(fits(0.5, 0.3, 0.6, 1.0))
+
+    def test_fallbacks(self):
+        """Test that movetime is used as it is and that no clock falls back to --time."""
+        self.assertEqual(main.time_budget(main.parse_go(["go"]), chess.WHITE, 3), (3, 3))
+        soft, hard = main.time_budget(main.parse_go("go movetime 2000".split()), chess.WHITE, 3)
+        self.assertEqual(soft, hard)
+        self.assertAlmostEqual(hard, 2 - main.MOVE_OVERHEAD)
+
+
+class TestBench(unittest.TestCase):
+    def test_node_count(self):
+        """Test that bench searches the same tree on every run and on both boards."""
+        self.assertEqual(main.run_bench(chess.Board, 2)[0], 9011)
+        self.assertEqual(main.run_bench(chess.Board, 2)[0], 9011)
+        self.assertEqual(main.run_bench(chess.BitboardBoard, 2)[0], 9011)
+
+
+class TestSearch(unittest.TestCase):
+    # (fen, depth, mating moves)
+    MATES = [
+        ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 2, {"a1a8"}),
+        ("r5k1/8/8/8/8/8/5PPP/6K1 b - - 0 1", 2, {"a8a1"}),
+        ("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR w KQkq - 0 1", 2, {"f3f7"}),
+        ("7k/8/6K1/8/8/8/8/R7 w - - 0 1", 4, {"a1a8"}),
+        ("k7/8/2K5/8/8/8/8/7R w - - 0 1", 4, {"c6b6", "c6c7"}),
+    ]
+    POSITIONS = [
+        "r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2PP1N2/PP3PPP/RNBQ1RK1 w - - 0 1",
+        "r1bk1b1r/ppp2ppp/2p5/4Pn2/8/5N2/PPP2PPP/RNB2RK1 w - - 0 1",
+    ]
+
+    @classmethod
+    def setUpClass(cls):
+        parallel.start_pool(2)
+
+    @classmethod
+    def tearDownClass(cls):
+        parallel.stop_pool()
+
+    def setUp(self):
+        movegeneration.transposition_table.clear()
+        movegeneration.clear_move_ordering()
+
+    def search(self, fen, depth, next_move=movegeneration.next_move):
+        """Search fen to depth and return the best move and the root score."""
+        board = chess.Board()
+        board.set_fen(fen)
+        move = next_move(board, float("inf"), "test", debug=False, max_depth=depth)
+        return str(move), movegeneration.transposition_table.probe(board.zobrist_hash())[3]
+
+    def test_mate_found(self):
+        """Test that a fixed-depth search plays a mate within its horizon and scores it as one."""
+        for fen, depth, mates in self.MATES:
+            with self.subTest(fen=fen):
+                self.setUp()
+                move, score = self.search(fen, depth)
+                self.assertIn(move, mates)
+                self.assertGreaterEqual(score, movegeneration.MATE_THRESHOLD)
+
+    def test_parallel_matches_serial(self):
+        """Test that splitting the root moves over the pool finds the serial search's move and score."""
+        for fen in self.POSITIONS:
+            with self.subTest(fen=fen):
+                self.setUp()
+                serial = self.search(fen, 3)
+                self.setUp()
+                self.assertEqual(self.search(fen, 3, parallel.next_move), serial)
+
+    def test_age_move_ordering(self):
+        """Test that aging halves history and forgets the killers."""
+        move = chess.Move((6, 4), (4, 4))
+        movegeneration.history_table[0, 52, 36] = 9
+        movegeneration.history_table[1, 12, 28] = 4
+        movegeneration.killer_moves[3][:] = [move, move]
+        movegeneration.age_move_ordering()
+        self.assertEqual(movegeneration.history_table[0, 52, 36], 4)
+        self.assertEqual(movegeneration.history_table[1, 12, 28], 2)
+        self.assertEqual(movegeneration.history_table.sum(), 6)
+        self.assertTrue(all(killers == [None, None] for killers in movegeneration.killer_moves))
+
+
+class TestOpenings(unittest.TestCase):
+    BOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "Openings",
+                        "NCC_openings_6mvs_2600+_6k.pgn")
+
+    def test_read_book_with_byte_order_mark(self):
+        """Test that a book starting with a UTF-8 byte order mark reads as games of SAN moves."""
+        with open(self.BOOK, encoding="utf-8-sig") as pgn:
+            headers = sum(1 for line in pgn if line.startswith("[Event "))
+        games = openings.read_pgn_games(self.BOOK)
+        self.assertEqual(len(games), headers)
+        for game in games[:20]:
+            board = chess.Board()
+            for san in game:
+                board.push(chess.parse_san(board, san))
+
+
 if __name__ == "__main__":
     unittest.main()
\ No newline at end of file
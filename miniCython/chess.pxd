@@ -1,5 +1,6 @@
 # chess.pxd
 cimport numpy as np
+from libc.stdint cimport uint64_t
 
 ctypedef np.int32_t DTYPE_t
 
@@ -12,10 +13,26 @@ cdef enum PieceType:
     QUEEN = 5
     KING = 6
 
+# Total game phase with every knight, bishop, rook and queen on the board
+cdef enum:
+    TOTAL_PHASE = 24
+
 cdef enum Color:
     WHITE = 1
     BLACK = -1
 
+# Upper bound on the number of legal moves in a position (the most known is 218)
+cdef enum:
+    MAX_MOVES = 256
+
+# Fixed-capacity move list filled by Board.generate_moves: moves packed as
+# from | to << 6 | promotion << 12 (squares 8 * x + y), each with a sort key
+# the search orders them by in place, so no Move objects or lists are built
+cdef struct MoveList:
+    unsigned short moves[MAX_MOVES]
+    long long scores[MAX_MOVES]
+    int count
+
 cdef class Move:
     cdef public int from_x
     cdef public int from_y
@@ -30,6 +47,22 @@ cdef class Board:
     cdef public int turn
     cdef public list event
 
+    # Piece lists: squares (8 * x + y) per side, index 0 white and 1 black
+    cdef int _king_sq[2]
+    cdef int _piece_list[2][32]
+    cdef int _piece_count[2]
+    cdef int _piece_slot[64]
+
+    # Zobrist key of the position, updated by push_uci/pop
+    cdef uint64_t _hash
+
+    # Running (midgame, endgame) material plus piece-square score from
+    # white's point of view, the number of each piece (index piece + 6) and
+    # the game phase
+    cdef int _scores[2]
+    cdef int _material_count[13]
+    cdef int _phase
+
     # Core functionality
     cpdef void reset(self)
     cpdef void set_fen(self, unicode fen)
@@ -37,17 +70,33 @@ cdef class Board:
     cpdef void push(self, Move move)
     cpdef Move pop(self)
     cdef Move _retract_move(self, Move move)
+    cdef void _init_piece_lists(self)
+    cdef void _add_piece(self, int side, int square)
+    cdef void _remove_piece(self, int side, int square)
+    cdef void _move_piece(self, int side, int from_square, int to_square)
+    cdef void _update_scores(self, int piece, int square, int sign)
+    cdef uint64_t _compute_hash(self)
+    cpdef uint64_t zobrist_hash(self)
+    cpdef tuple scores(self)
+    cpdef int phase(self)
 
     # Move generation
     cpdef list legal_moves(self)
+    cdef void generate_moves(self, MoveList *moves)
+    cdef void _add_if_legal(self, MoveList *moves, int from_square, int to_square, int promotion)
     cpdef bint _is_move_legal(self, Move move)
+    cdef bint _is_legal(self, int from_square, int to_square, int promotion)
+    cpdef unsigned long long perft(self, int depth)
+    cpdef dict perft_divide(self, int depth)
 
     # Game state checks
     cpdef bint is_checkmate(self)
     cpdef bint is_game_over(self)
     cpdef bint can_claim_draw(self)
     cpdef bint _is_square_attacked(self, tuple square, int color)
+    cdef bint _square_attacked(self, int square, int enemy_color)
     cpdef tuple _find_king(self, int color)
 
     cpdef dict piece_map(self)
+    cpdef list piece_list(self, int color)
     cpdef int piece_at(self, tuple square)
\ No newline at end of file
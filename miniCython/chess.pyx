@@ -1,5 +1,109 @@
 # cython: language_level=3
 import numpy as np
+
+# Zobrist keys indexed [piece + 6][8 * x + y] plus one for black to move,
+# filled from a fixed-seed splitmix64 sequence at import
+cdef uint64_t ZOBRIST_PIECES[13][64]
+cdef uint64_t ZOBRIST_TURN
+cdef uint64_t _zobrist_state = 0x5A0B
+
+cdef uint64_t _splitmix64():
+    global _zobrist_state
+    _zobrist_state += 0x9E3779B97F4A7C15ULL
+    cdef uint64_t z = _zobrist_state
+    z = (z ^ (z >> 30)) * 0xBF58476D1CE4E5B9ULL
+    z = (z ^ (z >> 27)) * 0x94D049BB133111EBULL
+    return z ^ (z >> 31)
+
+cdef int _zi, _zj
+for _zi in range(13):
+    for _zj in range(64):
+        ZOBRIST_PIECES[_zi][_zj] = _splitmix64()
+ZOBRIST_TURN = _splitmix64()
+
+# Material plus piece-square value [midgame/endgame][piece + 6][8 * x + y],
+# white positive, behind the running Board scores. evaluate cimports this
+# module, so the values are copied in from it when the first Board is built
+cdef int PIECE_SQUARE[2][13][64]
+cdef bint _piece_square_loaded = False
+
+# Game phase weight of each piece type, indexed by abs(piece): TOTAL_PHASE
+# with every knight, bishop, rook and queen on the board, 0 with only kings
+# and pawns left
+cdef int PHASE_WEIGHT[7]
+PHASE_WEIGHT[:] = [0, 0, 1, 1, 2, 4, 0]
+
+# Precomputed attack tables indexed by square 8 * x + y: the squares a knight,
+# king or pawn (index 0 white, 1 black) attacks with their counts, and the
+# squares along each ray, nearest first (rays 0-3 diagonal, 4-7 straight)
+cdef int KNIGHT_TARGETS[64][8]
+cdef int KNIGHT_TARGET_COUNT[64]
+cdef int KING_TARGETS[64][8]
+cdef int KING_TARGET_COUNT[64]
+cdef int PAWN_TARGETS[2][64][2]
+cdef int PAWN_TARGET_COUNT[2][64]
+cdef int RAYS[64][8][7]
+cdef int RAY_LENGTH[64][8]
+
+cdef int KNIGHT_DX[8]
+cdef int KNIGHT_DY[8]
+cdef int KING_DX[8]
+cdef int KING_DY[8]
+KNIGHT_DX[:] = [-2, -1, 1, 2, 2, 1, -1, -2]
+KNIGHT_DY[:] = [-1, -2, -2, -1, 1, 2, 2, 1]
+KING_DX[:] = [-1, -1, -1, 0, 0, 1, 1, 1]
+KING_DY[:] = [-1, 0, 1, -1, 1, -1, 0, 1]
+
+cdef void _init_attack_tables():
+    cdef int square, i, d, x, y, side, dx
+    cdef int ray_dx[8]
+    cdef int ray_dy[8]
+    ray_dx[:] = [-1, -1, 1, 1, -1, 1, 0, 0]
+    ray_dy[:] = [-1, 1, -1, 1, 0, 0, -1, 1]
+    for square in range(64):
+        KNIGHT_TARGET_COUNT[square] = 0
+        KING_TARGET_COUNT[square] = 0
+        for i in range(8):
+            x = square // 8 + KNIGHT_DX[i]
+            y = square % 8 + KNIGHT_DY[i]
+            if 0 <= x < 8 and 0 <= y < 8:
+                KNIGHT_TARGETS[square][KNIGHT_TARGET_COUNT[square]] = 8 * x + y
+                KNIGHT_TARGET_COUNT[square] += 1
+            x = square // 8 + KING_DX[i]
+            y = square % 8 + KING_DY[i]
+            if 0 <= x < 8 and 0 <= y < 8:
+                KING_TARGETS[square][KING_TARGET_COUNT[square]] = 8 * x + y
+                KING_TARGET_COUNT[square] += 1
+        for side in range(2):
+            PAWN_TARGET_COUNT[side][square] = 0
+            dx = -1 if side == 0 else 1
+            for i in (-1, 1):
+                x = square // 8 + dx
+                y = square % 8 + i
+                if 0 <= x < 8 and 0 <= y < 8:
+                    PAWN_TARGETS[side][square][PAWN_TARGET_COUNT[side][square]] = 8 * x + y
+                    PAWN_TARGET_COUNT[side][square] += 1
+        for d in range(8):
+            RAY_LENGTH[square][d] = 0
+            x = square // 8 + ray_dx[d]
+            y = square % 8 + ray_dy[d]
+            while 0 <= x < 8 and 0 <= y < 8:
+                RAYS[square][d][RAY_LENGTH[square][d]] = 8 * x + y
+                RAY_LENGTH[square][d] += 1
+                x += ray_dx[d]
+                y += ray_dy[d]
+
+_init_attack_tables()
+
+cdef void _load_piece_square_tables():
+    global _piece_square_loaded
+    from evaluate import piece_square_value
+    cdef int phase, piece, square
+    for phase in range(2):
+        for piece in range(-KING, KING + 1):
+            for square in range(64):
+                PIECE_SQUARE[phase][piece + 6][square] = piece_square_value(piece, square, phase == 1)
+    _piece_square_loaded = True
 cdef class Move:
     def __init__(self):
         self.from_x = -1
@@ -36,6 +140,15 @@ cdef class Move:
         else:
             return f"{from_notation}{to_notation}"
 
+cdef Move _unpack_move(int packed):
+    cdef Move move = Move()
+    move.from_x = (packed & 63) // 8
+    move.from_y = packed & 7
+    move.to_x = (packed >> 6 & 63) // 8
+    move.to_y = packed >> 6 & 7
+    move.promotion = packed >> 12
+    return move
+
 cdef class Board:
     def __init__(self):
         self.turn = WHITE
@@ -51,6 +164,80 @@ cdef class Board:
         ], dtype=np.int32)
         self._board_view = self._board_array.copy()
         self.event = []
+        self._init_piece_lists()
+
+    cdef void _init_piece_lists(self):
+        cdef int x, y, piece, side
+        if not _piece_square_loaded:
+            _load_piece_square_tables()
+        self._piece_count[0] = 0
+        self._piece_count[1] = 0
+        self._scores[0] = 0
+        self._scores[1] = 0
+        self._phase = 0
+        for x in range(13):
+            self._material_count[x] = 0
+        self._king_sq[0] = -1
+        self._king_sq[1] = -1
+        for x in range(64):
+            self._piece_slot[x] = -1
+        for x in range(8):
+            for y in range(8):
+                piece = self._board_view[x, y]
+                if piece == 0:
+                    continue
+                side = 0 if piece > 0 else 1
+                self._add_piece(side, 8 * x + y)
+                self._update_scores(piece, 8 * x + y, 1)
+                self._material_count[piece + 6] += 1
+                self._phase += PHASE_WEIGHT[abs(piece)]
+                if abs(piece) == KING:
+                    self._king_sq[side] = 8 * x + y
+        self._hash = self._compute_hash()
+
+    cdef uint64_t _compute_hash(self):
+        cdef uint64_t key = ZOBRIST_TURN if self.turn == BLACK else 0
+        cdef int side, i, square
+        for side in range(2):
+            for i in range(self._piece_count[side]):
+                square = self._piece_list[side][i]
+                key ^= ZOBRIST_PIECES[self._board_view[square // 8, square % 8] + 6][square]
+        return key
+
+    cdef void _update_scores(self, int piece, int square, int sign):
+        self._scores[0] += sign * PIECE_SQUARE[0][piece + 6][square]
+        self._scores[1] += sign * PIECE_SQUARE[1][piece + 6][square]
+
+    cpdef tuple scores(self):
+        return (self._scores[0], self._scores[1])
+
+    cpdef int phase(self):
+        return self._phase
+
+    cpdef uint64_t zobrist_hash(self):
+        return self._hash
+
+    cdef void _add_piece(self, int side, int square):
+        cdef int slot = self._piece_count[side]
+        self._piece_list[side][slot] = square
+        self._piece_slot[square] = slot
+        self._piece_count[side] = slot + 1
+
+    cdef void _remove_piece(self, int side, int square):
+        # Fill the hole with the last entry so the list stays dense
+        cdef int last = self._piece_count[side] - 1
+        cdef int slot = self._piece_slot[square]
+        cdef int moved = self._piece_list[side][last]
+        self._piece_list[side][slot] = moved
+        self._piece_slot[moved] = slot
+        self._piece_slot[square] = -1
+        self._piece_count[side] = last
+
+    cdef void _move_piece(self, int side, int from_square, int to_square):
+        cdef int slot = self._piece_slot[from_square]
+        self._piece_list[side][slot] = to_square
+        self._piece_slot[to_square] = slot
+        self._piece_slot[from_square] = -1
 
     cpdef void reset(self):
         self.__init__()
@@ -90,6 +277,8 @@ cdef class Board:
                 col += 1
 
         self.turn = WHITE if parts[1] == "w" else BLACK
+        self.event = []
+        self._init_piece_lists()
 
     cpdef void push_uci(self, unicode move):
         if len(move) < 4:
@@ -114,231 +303,246 @@ cdef class Board:
 
         cdef int piece = self._board_view[from_x, from_y]
         cdef int old_piece = self._board_view[to_x, to_y]
+        cdef int side = 0 if piece > 0 else 1
+        cdef int old_side = 0 if old_piece > 0 else 1
+        cdef int rook
+        cdef uint64_t key = self._hash ^ ZOBRIST_TURN ^ ZOBRIST_PIECES[piece + 6][8 * from_x + from_y]
 
         # Handle castling
         if abs(piece) == KING and abs(from_y - to_y) == 2:
             if to_y > from_y:  # Kingside
-                self._board_view[from_x, 5] = self._board_view[from_x, 7]
+                rook = self._board_view[from_x, 7]
+                self._board_view[from_x, 5] = rook
                 self._board_view[from_x, 7] = 0
+                self._move_piece(side, 8 * from_x + 7, 8 * from_x + 5)
+                self._update_scores(rook, 8 * from_x + 7, -1)
+                self._update_scores(rook, 8 * from_x + 5, 1)
+                key ^= ZOBRIST_PIECES[rook + 6][8 * from_x + 7] ^ ZOBRIST_PIECES[rook + 6][8 * from_x + 5]
             else:  # Queenside
-                self._board_view[from_x, 3] = self._board_view[from_x, 0]
+                rook = self._board_view[from_x, 0]
+                self._board_view[from_x, 3] = rook
                 self._board_view[from_x, 0] = 0
+                self._move_piece(side, 8 * from_x, 8 * from_x + 3)
+                self._update_scores(rook, 8 * from_x, -1)
+                self._update_scores(rook, 8 * from_x + 3, 1)
+                key ^= ZOBRIST_PIECES[rook + 6][8 * from_x] ^ ZOBRIST_PIECES[rook + 6][8 * from_x + 3]
 
         if old_piece != 0:
             self.event.append(old_piece)
+            self._remove_piece(old_side, 8 * to_x + to_y)
+            self._update_scores(old_piece, 8 * to_x + to_y, -1)
+            self._material_count[old_piece + 6] -= 1
+            self._phase -= PHASE_WEIGHT[abs(old_piece)]
+            key ^= ZOBRIST_PIECES[old_piece + 6][8 * to_x + to_y]
+            if abs(old_piece) == KING:
+                self._king_sq[old_side] = -1
+
+        self._move_piece(side, 8 * from_x + from_y, 8 * to_x + to_y)
+        if abs(piece) == KING:
+            self._king_sq[side] = 8 * to_x + to_y
 
         self._board_view[to_x, to_y] = piece
         self._board_view[from_x, from_y] = 0
 
         if promotion:
             self._board_view[to_x, to_y] = promotion * self.turn
+            self._material_count[piece + 6] -= 1
+            self._material_count[promotion * self.turn + 6] += 1
+            self._phase += PHASE_WEIGHT[promotion]
 
+        self._update_scores(piece, 8 * from_x + from_y, -1)
+        self._update_scores(self._board_view[to_x, to_y], 8 * to_x + to_y, 1)
+        self._hash = key ^ ZOBRIST_PIECES[self._board_view[to_x, to_y] + 6][8 * to_x + to_y]
         self.turn = -self.turn
 
+    cdef void _add_if_legal(self, MoveList *moves, int from_square, int to_square, int promotion):
+        if self._is_legal(from_square, to_square, promotion):
+            moves.moves[moves.count] = from_square | to_square << 6 | promotion << 12
+            moves.count += 1
+
     cpdef list legal_moves(self):
-        cdef list moves = []
-        cdef list directions = []
-        cdef int x, y, dx, dy, direction, start_row, promotion_row
-        cdef int x2, y2, piece, piece_type, promo
+        cdef MoveList moves
+        cdef int i
+        self.generate_moves(&moves)
+        return [_unpack_move(moves.moves[i]) for i in range(moves.count)]
+
+    cpdef unsigned long long perft(self, int depth):
+        """Number of leaves of the legal move tree to depth, the last ply counted without being played."""
+        cdef MoveList moves
+        cdef unsigned long long nodes = 0
+        cdef int i
+        if depth <= 0:
+            return 1
+        self.generate_moves(&moves)
+        if depth == 1:
+            return moves.count
+        for i in range(moves.count):
+            self.push(_unpack_move(moves.moves[i]))
+            nodes += self.perft(depth - 1)
+            self.pop()
+        return nodes
+
+    cpdef dict perft_divide(self, int depth):
+        """perft(depth - 1) below each legal move, by UCI string."""
+        cdef MoveList moves
         cdef Move move
-
-        for x in range(8):
-            for y in range(8):
-                piece = self._board_view[x, y]
-                if piece == 0 or (piece * self.turn) <= 0:
-                    continue
-
-                piece_type = abs(piece)
-
-                if piece_type == PAWN:
-                    direction = -self.turn
-                    start_row = 6 if self.turn == WHITE else 1
-                    promotion_row = 0 if self.turn == WHITE else 7
-
-                    # Single move forward
-                    if 0 <= x + direction < 8 and self._board_view[x + direction, y] == 0:
-                        if x + direction == promotion_row:
-                            for promo in [QUEEN, ROOK, BISHOP, KNIGHT]:
-                                move = Move()
-                                move.from_x, move.from_y = (x, y)
-                                move.to_x, move.to_y = (x + direction, y)
-                                move.promotion = promo
-                                if self._is_move_legal(move):
-                                    moves.append(move)
+        cdef dict result = {}
+        cdef int i
+        self.generate_moves(&moves)
+        for i in range(moves.count):
+            move = _unpack_move(moves.moves[i])
+            self.push(move)
+            result[str(move)] = self.perft(depth - 1)
+            self.pop()
+        return result
+
+    cdef void generate_moves(self, MoveList *moves):
+        """Write the legal moves into moves, in the order legal_moves returns them."""
+        cdef int x, y, direction, start_row, promotion_row
+        cdef int x2, y2, piece, piece_type, promo, target
+        cdef int side = 0 if self.turn == WHITE else 1
+        cdef int i, j, d, first, last, square
+        cdef int promotions[4]
+        promotions[:] = [QUEEN, ROOK, BISHOP, KNIGHT]
+        moves.count = 0
+
+        for i in range(self._piece_count[side]):
+            square = self._piece_list[side][i]
+            x = square // 8
+            y = square % 8
+            piece = self._board_view[x, y]
+
+            piece_type = abs(piece)
+
+            if piece_type == PAWN:
+                direction = -self.turn
+                start_row = 6 if self.turn == WHITE else 1
+                promotion_row = 0 if self.turn == WHITE else 7
+
+                # Single move forward
+                if 0 <= x + direction < 8 and self._board_view[x + direction, y] == 0:
+                    if x + direction == promotion_row:
+                        for promo in promotions:
+                            self._add_if_legal(moves, square, square + 8 * direction, promo)
+                    else:
+                        self._add_if_legal(moves, square, square + 8 * direction, 0)
+
+                # Double move
+                if x == start_row and self._board_view[x + direction, y] == 0 \
+                        and self._board_view[x + 2 * direction, y] == 0:
+                    self._add_if_legal(moves, square, square + 16 * direction, 0)
+
+                # Captures
+                for j in range(PAWN_TARGET_COUNT[side][square]):
+                    target = PAWN_TARGETS[side][square][j]
+                    x2 = target // 8
+                    y2 = target % 8
+                    if (self._board_view[x2, y2] * self.turn) < 0:
+                        if x2 == promotion_row:
+                            for promo in promotions:
+                                self._add_if_legal(moves, square, target, promo)
                         else:
-                            move = Move()
-                            move.from_x, move.from_y = (x, y)
-                            move.to_x, move.to_y = (x + direction, y)
-                            if self._is_move_legal(move):
-                                moves.append(move)
-
-                    # Double move
-                    if x == start_row and self._board_view[x + direction, y] == 0 \
-                            and self._board_view[x + 2 * direction, y] == 0:
-                        move = Move()
-                        move.from_x, move.from_y  = (x, y)
-                        move.to_x, move.to_y = (x + 2 * direction, y)
-                        if self._is_move_legal(move):
-                            moves.append(move)
-
-                    # Captures
-                    for dy in [-1, 1]:
-                        if 0 <= y + dy < 8 and 0 <= x + direction < 8:
-                            if (self._board_view[x + direction, y + dy] * self.turn) < 0:
-                                if x + direction == promotion_row:
-                                    for promo in [QUEEN, ROOK, BISHOP, KNIGHT]:
-                                        move = Move()
-                                        move.from_x, move.from_y = (x, y)
-                                        move.to_x, move.to_y = (x + direction, y + dy)
-                                        move.promotion = promo
-                                        if self._is_move_legal(move):
-                                            moves.append(move)
-                                else:
-                                    move = Move()
-                                    move.from_x, move.from_y = (x, y)
-                                    move.to_x, move.to_y = (x + direction, y + dy)
-                                    if self._is_move_legal(move):
-                                        moves.append(move)
-
-                elif piece_type == KNIGHT:
-                    for dx, dy in [(-2, -1), (-1, -2), (1, -2), (2, -1),
-                                   (2, 1), (1, 2), (-1, 2), (-2, 1)]:
-                        x2 = x + dx
-                        y2 = y + dy
-                        if 0 <= x2 < 8 and 0 <= y2 < 8:
-                            if (self._board_view[x2, y2] * self.turn) <= 0:
-                                move = Move()
-                                move.from_x, move.from_y = (x, y)
-                                move.to_x, move.to_y= (x2, y2)
-                                if self._is_move_legal(move):
-                                    moves.append(move)
-
-                elif piece_type in (BISHOP, ROOK, QUEEN):
-                    directions = []  # Reset directions for each piece
-                    if piece_type in (BISHOP, QUEEN):
-                        directions.extend([(-1, -1), (-1, 1), (1, -1), (1, 1)])
-                    if piece_type in (ROOK, QUEEN):
-                        directions.extend([(-1, 0), (1, 0), (0, -1), (0, 1)])
-
-                    for dx, dy in directions:
-                        x2, y2 = x + dx, y + dy
-                        while 0 <= x2 < 8 and 0 <= y2 < 8:
-                            if (self._board_view[x2, y2] * self.turn) <= 0:
-                                move = Move()
-                                move.from_x, move.from_y = (x, y)
-                                move.to_x, move.to_y = (x2, y2)
-                                if self._is_move_legal(move):
-                                    moves.append(move)
-                            if self._board_view[x2, y2] != 0:
-                                break
-                            x2 += dx
-                            y2 += dy
-
-                elif piece_type == KING:
-                    for dx in [-1, 0, 1]:
-                        for dy in [-1, 0, 1]:
-                            if dx == 0 and dy == 0:
-                                continue
-                            x2 = x + dx
-                            y2 = y + dy
-                            if 0 <= x2 < 8 and 0 <= y2 < 8:
-                                if (self._board_view[x2, y2] * self.turn) <= 0:
-                                    move = Move()
-                                    move.from_x, move.from_y = (x, y)
-                                    move.to_x, move.to_y = (x2, y2)
-                                    if self._is_move_legal(move):
-                                        moves.append(move)
-        return moves
+                            self._add_if_legal(moves, square, target, 0)
+
+            elif piece_type == KNIGHT:
+                for j in range(KNIGHT_TARGET_COUNT[square]):
+                    target = KNIGHT_TARGETS[square][j]
+                    if (self._board_view[target // 8, target % 8] * self.turn) <= 0:
+                        self._add_if_legal(moves, square, target, 0)
+
+            elif piece_type in (BISHOP, ROOK, QUEEN):
+                # Bishops use the diagonal rays 0-3, rooks the straight rays 4-7, queens all
+                first = 4 if piece_type == ROOK else 0
+                last = 4 if piece_type == BISHOP else 8
+                for d in range(first, last):
+                    for j in range(RAY_LENGTH[square][d]):
+                        target = RAYS[square][d][j]
+                        x2 = target // 8
+                        y2 = target % 8
+                        if (self._board_view[x2, y2] * self.turn) <= 0:
+                            self._add_if_legal(moves, square, target, 0)
+                        if self._board_view[x2, y2] != 0:
+                            break
+
+            elif piece_type == KING:
+                for j in range(KING_TARGET_COUNT[square]):
+                    target = KING_TARGETS[square][j]
+                    if (self._board_view[target // 8, target % 8] * self.turn) <= 0:
+                        self._add_if_legal(moves, square, target, 0)
 
     cpdef bint _is_move_legal(self, Move move):
-        cdef int original_piece = self._board_view[move.to_x, move.to_y]
-        cdef int moving_piece = self._board_view[move.from_x, move.from_y]
-        cdef tuple king_pos
+        return self._is_legal(8 * move.from_x + move.from_y, 8 * move.to_x + move.to_y, move.promotion)
+
+    cdef bint _is_legal(self, int from_square, int to_square, int promotion):
+        cdef int from_x = from_square // 8, from_y = from_square % 8
+        cdef int to_x = to_square // 8, to_y = to_square % 8
+        cdef int original_piece = self._board_view[to_x, to_y]
+        cdef int moving_piece = self._board_view[from_x, from_y]
+        cdef int king_sq = self._king_sq[0 if self.turn == WHITE else 1]
         cdef bint is_legal
 
         # Make the move
-        self._board_view[move.to_x, move.to_y] = moving_piece
-        self._board_view[move.from_x, move.from_y] = 0
+        self._board_view[to_x, to_y] = moving_piece
+        self._board_view[from_x, from_y] = 0
 
         # Apply promotion
-        if move.promotion:
-            self._board_view[move.to_x, move.to_y] = move.promotion * self.turn
+        if promotion:
+            self._board_view[to_x, to_y] = promotion * self.turn
 
-        # Find king position
-        king_pos = self._find_king(self.turn)
+        # The king is either the moving piece or on its tracked square
+        if king_sq == from_square:
+            king_sq = to_square
 
         # Check safety
-        is_legal = not self._is_square_attacked(king_pos, -self.turn)
+        is_legal = king_sq == -1 or not self._square_attacked(king_sq, -self.turn)
 
         # Undo the move
-        self._board_view[move.from_x, move.from_y] = moving_piece
-        self._board_view[move.to_x, move.to_y] = original_piece
+        self._board_view[from_x, from_y] = moving_piece
+        self._board_view[to_x, to_y] = original_piece
 
         return is_legal
 
     cpdef tuple _find_king(self, int color):
-        cdef int x, y
-        for x in range(8):
-            for y in range(8):
-                if self._board_view[x, y] == KING * color:
-                    return (x, y)
-        return (-1, -1)
+        cdef int square = self._king_sq[0 if color == WHITE else 1]
+        if square == -1:
+            return (-1, -1)
+        return (square // 8, square % 8)
 
     cpdef bint _is_square_attacked(self, tuple square, int enemy_color):
         if square[0] == -1:
             return False
-
-        cdef int x, y, dx, dy, x2, y2, piece_type
-        cdef list directions
-
-        # Pawn attacks
-        cdef list pawn_dirs = [(1, -1), (1, 1)] if enemy_color == WHITE else [(-1, -1), (-1, 1)]
-        for dx, dy in pawn_dirs:
-            x = square[0] + dx
-            y = square[1] + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if self._board_view[x, y] == PAWN * enemy_color:
-                    return True
-
-        # Knight attacks
-        cdef list knight_dirs = [(-2, -1), (-1, -2), (1, -2), (2, -1),
-                                 (2, 1), (1, 2), (-1, 2), (-2, 1)]
-        for dx, dy in knight_dirs:
-            x = square[0] + dx
-            y = square[1] + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if self._board_view[x, y] == KNIGHT * enemy_color:
-                    return True
-
-        # King attacks
-        cdef list king_dirs = [(-1, -1), (-1, 0), (-1, 1),
-                               (0, -1), (0, 1),
-                               (1, -1), (1, 0), (1, 1)]
-        for dx, dy in king_dirs:
-            x = square[0] + dx
-            y = square[1] + dy
-            if 0 <= x < 8 and 0 <= y < 8:
-                if self._board_view[x, y] == KING * enemy_color:
-                    return True
-
-        # Sliding pieces
-        cdef dict sliding_dirs = {
-            BISHOP: [(-1, -1), (-1, 1), (1, -1), (1, 1)],
-            ROOK: [(-1, 0), (1, 0), (0, -1), (0, 1)],
-            QUEEN: [(-1, -1), (-1, 1), (1, -1), (1, 1),
-                    (-1, 0), (1, 0), (0, -1), (0, 1)]
-        }
-
-        for piece_type, directions in sliding_dirs.items():
-            for dx, dy in directions:
-                x, y = square[0] + dx, square[1] + dy
-                while 0 <= x < 8 and 0 <= y < 8:
-                    if self._board_view[x, y] != 0:
-                        if self._board_view[x, y] == piece_type * enemy_color:
-                            return True
-                        break
-                    x += dx
-                    y += dy
+        return self._square_attacked(8 * square[0] + square[1], enemy_color)
+
+    cdef bint _square_attacked(self, int square, int enemy_color):
+        cdef int i, d, target, piece, slider
+        # Pawns stand where a pawn of the other color on the square would capture
+        cdef int side = 1 if enemy_color == WHITE else 0
+
+        for i in range(PAWN_TARGET_COUNT[side][square]):
+            target = PAWN_TARGETS[side][square][i]
+            if self._board_view[target // 8, target % 8] == PAWN * enemy_color:
+                return True
+
+        for i in range(KNIGHT_TARGET_COUNT[square]):
+            target = KNIGHT_TARGETS[square][i]
+            if self._board_view[target // 8, target % 8] == KNIGHT * enemy_color:
+                return True
+
+        for i in range(KING_TARGET_COUNT[square]):
+            target = KING_TARGETS[square][i]
+            if self._board_view[target // 8, target % 8] == KING * enemy_color:
+                return True
+
+        # Sliders: the first piece on each ray decides
+        for d in range(8):
+            slider = BISHOP if d < 4 else ROOK
+            for i in range(RAY_LENGTH[square][d]):
+                target = RAYS[square][d][i]
+                piece = self._board_view[target // 8, target % 8]
+                if piece != 0:
+                    if piece == slider * enemy_color or piece == QUEEN * enemy_color:
+                        return True
+                    break
 
         return False
 
@@ -346,28 +550,32 @@ cdef class Board:
         if not self._is_square_attacked(self._find_king(-self.turn), self.turn):
             return False
 
-        cdef Move move
+        cdef MoveList moves
+        cdef int i, from_x, from_y, to_x, to_y, king_sq
         cdef int original_piece
         cdef bint has_legal_moves = False
 
-        for move in self.legal_moves():
-            original_piece = self._board_view[move.to_x, move.to_y]
+        self.generate_moves(&moves)
+        for i in range(moves.count):
+            from_x = (moves.moves[i] & 63) // 8
+            from_y = moves.moves[i] & 7
+            to_x = (moves.moves[i] >> 6 & 63) // 8
+            to_y = moves.moves[i] >> 6 & 7
+            original_piece = self._board_view[to_x, to_y]
 
             # Make move
-            self._board_view[move.to_x, move.to_y] = self._board_view[
-                move.from_x, move.from_y]
-            self._board_view[move.from_x, move.from_y] = 0
+            self._board_view[to_x, to_y] = self._board_view[from_x, from_y]
+            self._board_view[from_x, from_y] = 0
 
             # Check king safety
-            king_pos = (move.to_x, move.to_y) if abs(
-                self._board_view[move.to_x, move.to_y]) == KING else self._find_king(-self.turn)
-            if not self._is_square_attacked(king_pos, self.turn):
+            king_sq = 8 * to_x + to_y if abs(self._board_view[to_x, to_y]) == KING \
+                else self._king_sq[0 if -self.turn == WHITE else 1]
+            if king_sq == -1 or not self._square_attacked(king_sq, self.turn):
                 has_legal_moves = True
 
             # Undo move
-            self._board_view[move.from_x, move.from_y] = self._board_view[
-                move.to_x, move.to_y]
-            self._board_view[move.to_x, move.to_y] = original_piece
+            self._board_view[from_x, from_y] = self._board_view[to_x, to_y]
+            self._board_view[to_x, to_y] = original_piece
 
             if has_legal_moves:
                 return False
@@ -375,28 +583,19 @@ cdef class Board:
         return True
 
     cpdef bint can_claim_draw(self):
-        cdef int count_pawns = 0, count_queens = 0, count_rooks = 0, minor_count = 0
-        cdef int x, y, piece
+        cdef int minor_count = 0
+        cdef int side, i, square, piece
 
-        for x in range(8):
-            for y in range(8):
-                piece = abs(self._board_view[x, y])
-                if piece == PAWN:
-                    count_pawns += 1
-                elif piece == QUEEN:
-                    count_queens += 1
-                elif piece == ROOK:
-                    count_rooks += 1
-
-        if count_pawns == 0 and count_queens == 0 and count_rooks == 0:
-            for x in range(8):
-                for y in range(8):
-                    piece = abs(self._board_view[x, y])
-                    if piece in (BISHOP, KNIGHT):
-                        minor_count += 1
-            return minor_count <= 1
+        for side in range(2):
+            for i in range(self._piece_count[side]):
+                square = self._piece_list[side][i]
+                piece = abs(self._board_view[square // 8, square % 8])
+                if piece == PAWN or piece == QUEEN or piece == ROOK:
+                    return False
+                if piece == BISHOP or piece == KNIGHT:
+                    minor_count += 1
 
-        return False
+        return minor_count <= 1
 
     cpdef void push(self, Move move):
         self.event.append(move)
@@ -408,49 +607,88 @@ cdef class Board:
 
         cdef object last_event = self.event.pop()
         cdef Move last_move = None
+        cdef int captured, captured_side
         if type(last_event).__name__ in "Type[Move]":
             last_move = self._retract_move(last_event)
         else:
             last_move = self._retract_move(self.event.pop())
-            self._board_view[last_move.to_x, last_move.to_y] = last_event
+            captured = last_event
+            captured_side = 0 if captured > 0 else 1
+            self._board_view[last_move.to_x, last_move.to_y] = captured
+            self._add_piece(captured_side, 8 * last_move.to_x + last_move.to_y)
+            self._update_scores(captured, 8 * last_move.to_x + last_move.to_y, 1)
+            self._material_count[captured + 6] += 1
+            self._phase += PHASE_WEIGHT[abs(captured)]
+            self._hash ^= ZOBRIST_PIECES[captured + 6][8 * last_move.to_x + last_move.to_y]
+            if abs(captured) == KING:
+                self._king_sq[captured_side] = 8 * last_move.to_x + last_move.to_y
         return last_move
 
     cdef Move _retract_move(self, Move move):
         cdef int moving_piece = self._board_view[move.to_x, move.to_y]
+        cdef int side = 0 if moving_piece > 0 else 1
+        cdef int rook
+        cdef uint64_t key = self._hash ^ ZOBRIST_TURN ^ ZOBRIST_PIECES[moving_piece + 6][8 * move.to_x + move.to_y]
 
         # Revert move
         self._board_view[move.from_x, move.from_y] = moving_piece
         self._board_view[move.to_x, move.to_y] = 0
+        self._move_piece(side, 8 * move.to_x + move.to_y, 8 * move.from_x + move.from_y)
+        self._update_scores(moving_piece, 8 * move.to_x + move.to_y, -1)
+        if abs(moving_piece) == KING:
+            self._king_sq[side] = 8 * move.from_x + move.from_y
 
         # Handle castling
         if abs(moving_piece) == KING and abs(move.from_y - move.to_y) == 2:
             if move.to_y > move.from_y:  # Kingside
-                self._board_view[move.from_x, 7] = self._board_view[move.from_x, 5]
+                rook = self._board_view[move.from_x, 5]
+                self._board_view[move.from_x, 7] = rook
                 self._board_view[move.from_x, 5] = 0
+                self._move_piece(side, 8 * move.from_x + 5, 8 * move.from_x + 7)
+                self._update_scores(rook, 8 * move.from_x + 5, -1)
+                self._update_scores(rook, 8 * move.from_x + 7, 1)
+                key ^= ZOBRIST_PIECES[rook + 6][8 * move.from_x + 5] ^ ZOBRIST_PIECES[rook + 6][8 * move.from_x + 7]
             else:  # Queenside
-                self._board_view[move.from_x, 0] = self._board_view[move.from_x, 3]
+                rook = self._board_view[move.from_x, 3]
+                self._board_view[move.from_x, 0] = rook
                 self._board_view[move.from_x, 3] = 0
+                self._move_piece(side, 8 * move.from_x + 3, 8 * move.from_x)
+                self._update_scores(rook, 8 * move.from_x + 3, -1)
+                self._update_scores(rook, 8 * move.from_x, 1)
+                key ^= ZOBRIST_PIECES[rook + 6][8 * move.from_x + 3] ^ ZOBRIST_PIECES[rook + 6][8 * move.from_x]
 
         # Handle promotion
         if move.promotion:
             original_color = -self.turn
             self._board_view[move.from_x, move.from_y] = PAWN * original_color
+            self._material_count[moving_piece + 6] -= 1
+            self._material_count[PAWN * original_color + 6] += 1
+            self._phase -= PHASE_WEIGHT[abs(moving_piece)]
 
+        self._update_scores(self._board_view[move.from_x, move.from_y], 8 * move.from_x + move.from_y, 1)
+        self._hash = key ^ ZOBRIST_PIECES[self._board_view[move.from_x, move.from_y] + 6][8 * move.from_x + move.from_y]
         self.turn = -self.turn
         return move
 
     cpdef bint is_game_over(self):
-        return self.is_checkmate() or not self.legal_moves() or self.can_claim_draw()
+        cdef MoveList moves
+        if self.is_checkmate():
+            return True
+        self.generate_moves(&moves)
+        return moves.count == 0 or self.can_claim_draw()
 
     cpdef int piece_at(self, tuple square):
         return self._board_view[square[0], square[1]]
 
     cpdef dict piece_map(self):
         cdef dict pmap = {}
-        cdef int x, y, piece
-        for x in range(8):
-            for y in range(8):
-                piece = self._board_view[x, y]
-                if piece != 0:
-                    pmap[(x, y)] = piece
+        cdef int side, i, square
+        for side in range(2):
+            for i in range(self._piece_count[side]):
+                square = self._piece_list[side][i]
+                pmap[(square // 8, square % 8)] = self._board_view[square // 8, square % 8]
         return pmap
+
+    cpdef list piece_list(self, int color):
+        cdef int side = 0 if color == WHITE else 1
+        return [self._piece_list[side][i] for i in range(self._piece_count[side])]
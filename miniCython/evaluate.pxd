@@ -22,6 +22,10 @@ cdef int[64] KING_ENDGAME_BLACK
 cpdef int evaluate_board(Board board)
 cpdef int move_value(Board board, Move move, bint endgame)
 cpdef bint check_end_game(Board board)
+cpdef int mvv_lva(Board board, Move move)
+cpdef int piece_square_value(int piece, int square, bint endgame)
 
 # Internal helper functions
-cdef int evaluate_piece(int piece, int x, int y, bint endgame)
\ No newline at end of file
+cdef int evaluate_piece(int piece, int x, int y, bint endgame)
+cdef int packed_move_value(Board board, int move, bint endgame)
+cdef int packed_mvv_lva(Board board, int move)
\ No newline at end of file
@@ -1,6 +1,6 @@
 # cython: language_level=3
 cimport numpy as np
-from chess cimport Board, Move
+from chess cimport Board, Move, TOTAL_PHASE
 
 ctypedef np.int32_t DTYPE_t
 
@@ -113,13 +113,18 @@ for i in range(64):
 
 cpdef int move_value(Board board, Move move, bint endgame):
     """Calculate the score for a given move (optimized for Cython)."""
-    if move.promotion:
+    return packed_move_value(board, 8 * move.from_x + move.from_y + ((8 * move.to_x + move.to_y) << 6)
+                             + (move.promotion << 12), endgame)
+
+cdef int packed_move_value(Board board, int move, bint endgame):
+    """move_value of a move packed as from | to << 6 | promotion << 12."""
+    if move >> 12:
         return PIECE_VALUE[QUEEN] * board.turn
 
-    cdef int from_x = move.from_x
-    cdef int from_y = move.from_y
-    cdef int to_x = move.to_x
-    cdef int to_y = move.to_y
+    cdef int from_x = (move & 63) // 8
+    cdef int from_y = move & 7
+    cdef int to_x = (move >> 6 & 63) // 8
+    cdef int to_y = move >> 6 & 7
 
     cdef int from_piece = board._board_view[from_x, from_y]
     cdef int to_piece = board._board_view[to_x, to_y]
@@ -134,6 +139,16 @@ cpdef int move_value(Board board, Move move, bint endgame):
 
     return total * board.turn
 
+cpdef int mvv_lva(Board board, Move move):
+    """Most valuable victim, least valuable attacker ordering score for a capture."""
+    return 10 * PIECE_VALUE[abs(board._board_view[move.to_x, move.to_y])] - \
+        PIECE_VALUE[abs(board._board_view[move.from_x, move.from_y])]
+
+cdef int packed_mvv_lva(Board board, int move):
+    """mvv_lva of a move packed as from | to << 6 | promotion << 12."""
+    return 10 * PIECE_VALUE[abs(board._board_view[(move >> 6 & 63) // 8, move >> 6 & 7])] - \
+        PIECE_VALUE[abs(board._board_view[(move & 63) // 8, move & 7])]
+
 cdef int evaluate_piece(int piece, int x, int y, bint endgame):
     """Positional evaluation for a single piece (C-only)."""
     cdef int piece_type = abs(piece)
@@ -163,41 +178,26 @@ cdef int evaluate_piece(int piece, int x, int y, bint endgame):
 
     return table[idx]
 
-cpdef int evaluate_board(Board board):
-    """Evaluate the entire board position (optimized Cython)."""
-    cdef int total_score = 0
-    cdef bint endgame = check_end_game(board)
-    cdef int x, y, piece, piece_type, value, score
-
-    for x in range(8):
-        for y in range(8):
-            piece = board._board_view[x, y]
-            if piece == 0:
-                continue
-
-            piece_type = abs(piece)
-            value = PIECE_VALUE[piece_type]
-            score = evaluate_piece(piece, x, y, endgame)
-            total_score += (value + score) * (1 if piece > 0 else -1)
+cpdef int piece_square_value(int piece, int square, bint endgame):
+    """Material plus positional value of a piece on a square, white positive."""
+    if piece == 0:
+        return 0
+    cdef int score = PIECE_VALUE[abs(piece)] + evaluate_piece(piece, square // 8, square % 8, endgame)
+    return score if piece > 0 else -score
 
-    return total_score
+cpdef int evaluate_board(Board board):
+    """
+    Evaluate the board from the scores Board keeps up to date in push/pop,
+    blending midgame and endgame by game phase so the score moves smoothly
+    as pieces come off.
+    """
+    cdef int phase = min(board._phase, TOTAL_PHASE)
+    return (board._scores[0] * phase + board._scores[1] * (TOTAL_PHASE - phase)) // TOTAL_PHASE
 
 cpdef bint check_end_game(Board board):
-    """Determine if position is endgame (C-optimized)."""
-    cdef int queens = 0
-    cdef int minors = 0
-    cdef int x, y, piece, pt
-
-    for x in range(8):
-        for y in range(8):
-            piece = board._board_view[x, y]
-            if piece == 0:
-                continue
-
-            pt = abs(piece)
-            if pt == QUEEN:
-                queens += 1
-            elif pt == BISHOP or pt == KNIGHT:
-                minors += 1
-
-    return queens == 0 or (queens == 2 and minors <= 1)
\ No newline at end of file
+    """Determine if position is endgame from the Board's piece counts."""
+    cdef int queens = board._material_count[QUEEN + 6] + board._material_count[-QUEEN + 6]
+    cdef int minors = board._material_count[BISHOP + 6] + board._material_count[-BISHOP + 6] + \
+        board._material_count[KNIGHT + 6] + board._material_count[-KNIGHT + 6]
+
+    return queens == 0 or (queens == 2 and minors <= 1)
@@ -1,5 +1,6 @@
 # movegeneration.pxd
-from chess cimport Board, Move
+from libc.stdint cimport uint64_t
+from chess cimport Board, Move, MoveList
 
 cdef struct MoveOrderEntry:
     double score
@@ -9,12 +10,27 @@ cdef struct MoveOrderEntry:
     int to_y
     int promotion
 
-cdef double minimax(
+# Transposition table slot; move is from | to << 6 | promotion << 12
+cdef struct TTEntry:
+    uint64_t key
+    int depth
+    int flag
+    double score
+    int move
+    int generation
+
+cdef TTEntry *tt_probe(uint64_t key)
+cdef void tt_store(uint64_t key, int depth, int flag, double score, int move)
+cdef int encode_move(Move move)
+cpdef void clear_transposition_table()
+cpdef void clear_move_ordering()
+
+cdef double negamax(
     int depth,
     Board board,
     double alpha,
     double beta,
-    bint is_maximizing,
+    int ply,
     double start_time,
     double time_limit
 )
@@ -23,5 +39,8 @@ cpdef Move next_move(
     Board board,
     double time_limit,
     unicode engine_name,
-    bint debug
+    bint debug,
+    int max_depth=*,
+    bint info=*,
+    double soft_limit=*
 )
\ No newline at end of file
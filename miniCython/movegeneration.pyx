@@ -1,65 +1,326 @@
 # cython: language_level=3
 # movegeneration.pyx
 from libc.stdlib cimport malloc, free, qsort
+from libc.stdint cimport uint64_t
 from posix.time cimport clock_gettime, timespec, CLOCK_MONOTONIC
-from libc.math cimport INFINITY as DBL_MAX
+from libc.math cimport INFINITY as DBL_MAX, fabs
 cimport evaluate
 
+cdef enum:
+    MAX_PLY = 64
+    # Depth of the move stack; quiescence stands pat beyond it
+    MAX_SEARCH_PLY = 128
+
 cdef:
     double MATE_SCORE = 1000000000.0
+    double MATE_THRESHOLD = 999000000.0
+    # Half width of the aspiration window around the previous iteration's score
+    double ASPIRATION_WINDOW = 50.0
+    # Bounds on the effective branching factor used to predict the next
+    # iteration's time: the ratio of two iteration times is noise while
+    # they take microseconds
+    double MIN_BRANCHING_FACTOR = 2.0
+    double MAX_BRANCHING_FACTOR = 8.0
+    # Slack for positional gains when pruning captures that cannot raise alpha
+    int DELTA_MARGIN = 200
     dict debug_info = {}
+    # Node count and deepest ply of the current iteration (UCI seldepth) as
+    # plain C counters, copied into debug_info once per search
+    long long search_nodes = 0
+    int seldepth = 0
     int MAX_DEPTH = 64
 
+    # Transposition table bound types
+    int EXACT = 0
+    int LOWER_BOUND = 1
+    int UPPER_BOUND = 2
+    int TT_SIZE = 1 << 20
+    int NO_MOVE = -1
+    TTEntry *transposition_table = <TTEntry *> malloc(TT_SIZE * sizeof(TTEntry))
+    int tt_generation = 0
+
+    # Zobrist key -> encoded move along the previous iteration's principal variation
+    dict principal_variation = {}
+    # Offset that keeps moves scored in the previous iteration ahead of the rest
+    double ROOT_SCORE_OFFSET = 1e12
+
+    # Move ordering: captures and promotions, then killer moves, then quiet moves by history
+    long long CAPTURE_BONUS = 1 << 30
+    long long KILLER_BONUS = 1 << 29
+    # Two encoded quiet moves per ply that caused a beta cutoff, most recent first
+    int killer_moves[MAX_PLY][2]
+    # Butterfly history: cutoff credit of quiet moves by side to move, from and to square
+    long long history_table[2][64][64]
+    # Moves of every ply on the current search path, reused from node to node
+    MoveList move_stack[MAX_SEARCH_PLY]
+
+cpdef void clear_transposition_table():
+    global tt_generation
+    cdef int i
+    for i in range(TT_SIZE):
+        transposition_table[i].key = 0
+        transposition_table[i].depth = -1
+        transposition_table[i].move = NO_MOVE
+    tt_generation = 0
+
+clear_transposition_table()
+
+cpdef void clear_move_ordering():
+    """Forget killer moves and history, e.g. for a new game."""
+    cdef int i, j, k
+    for i in range(MAX_PLY):
+        killer_moves[i][0] = killer_moves[i][1] = NO_MOVE
+    for i in range(2):
+        for j in range(64):
+            for k in range(64):
+                history_table[i][j][k] = 0
+
+clear_move_ordering()
+
+def get_debug_info():
+    """The statistics of the last next_move call: nodes, engine and time."""
+    return dict(debug_info)
+
+cdef void age_move_ordering():
+    """Drop the killers, which no longer match their plies, and halve history between searches."""
+    cdef int i, j, k
+    for i in range(MAX_PLY):
+        killer_moves[i][0] = killer_moves[i][1] = NO_MOVE
+    for i in range(2):
+        for j in range(64):
+            for k in range(64):
+                history_table[i][j][k] //= 2
+
+cdef void record_cutoff(int side, int move, int depth, int ply):
+    """Credit an encoded quiet move that caused a beta cutoff."""
+    ply = min(ply, MAX_PLY - 1)
+    if killer_moves[ply][0] != move:
+        killer_moves[ply][1] = killer_moves[ply][0]
+        killer_moves[ply][0] = move
+    history_table[side][move & 63][(move >> 6) & 63] += depth * depth
+
+cdef TTEntry *tt_probe(uint64_t key):
+    cdef TTEntry *entry = &transposition_table[key & (TT_SIZE - 1)]
+    if entry.depth >= 0 and entry.key == key:
+        return entry
+    return NULL
+
+cdef void tt_store(uint64_t key, int depth, int flag, double score, int move):
+    cdef TTEntry *entry = &transposition_table[key & (TT_SIZE - 1)]
+    # Keep a deeper entry of another position from the current search
+    if entry.depth > depth and entry.key != key and entry.generation == tt_generation:
+        return
+    entry.key = key
+    entry.depth = depth
+    entry.flag = flag
+    entry.score = score
+    entry.move = move
+    entry.generation = tt_generation
+
+cdef int encode_move(Move move):
+    return 8 * move.from_x + move.from_y + ((8 * move.to_x + move.to_y) << 6) + (move.promotion << 12)
+
+cdef Move decode_move(int move):
+    cdef Move decoded = Move()
+    decoded.from_x = (move & 63) // 8
+    decoded.from_y = move & 7
+    decoded.to_x = (move >> 6 & 63) // 8
+    decoded.to_y = move >> 6 & 7
+    decoded.promotion = move >> 12
+    return decoded
+
 cdef double perf_counter():
     cdef timespec ts
     clock_gettime(CLOCK_MONOTONIC, &ts)
     return ts.tv_sec + ts.tv_nsec * 1e-9
 
+cdef inline bint next_iteration_fits(double elapsed, double iteration_time, double previous_time,
+                                     double soft_limit):
+    """
+    Whether the next iteration is expected to finish before soft_limit: the
+    last one's time times the effective branching factor, the ratio of the
+    last two iteration times kept between MIN_BRANCHING_FACTOR and
+    MAX_BRANCHING_FACTOR.
+    """
+    if previous_time <= 0:
+        return elapsed < soft_limit
+    cdef double branching_factor = min(max(iteration_time / previous_time, MIN_BRANCHING_FACTOR),
+                                       MAX_BRANCHING_FACTOR)
+    return elapsed + iteration_time * branching_factor < soft_limit
+
 cpdef Move next_move(
     Board board,
     double time_limit,
     unicode engine_name,
-    bint debug
+    bint debug,
+    int max_depth=MAX_DEPTH,
+    bint info=False,
+    double soft_limit=DBL_MAX
 ):
+    """
+    Iterative deepening with aspiration windows until max_depth has been
+    searched or the next iteration is not expected to finish within
+    soft_limit seconds; a running iteration is abandoned at time_limit.
+    Prints a UCI info line after every completed iteration when info is set.
+    """
+    global search_nodes, seldepth
     cdef:
         double t0 = perf_counter()
         int depth = 1
         Move best_move = Move()
         Move current_move
+        dict root_scores = {}
+        double alpha, beta
+        double value = 0.0
+        double score = 0.0
+        double iteration_start, iteration_time
+        double previous_time = 0.0
+        bint have_score = False
+        list pv
 
     debug_info.clear()
-    debug_info[b"nodes"] = 0
     debug_info[b"engine"] = str(engine_name)
+    search_nodes = 0
+    global tt_generation
+    tt_generation += 1
+    principal_variation.clear()
+    age_move_ordering()
+    soft_limit = min(soft_limit, time_limit)
+
+    while perf_counter() - t0 < soft_limit:
+        if not have_score or fabs(score) >= MATE_THRESHOLD:
+            alpha, beta = -DBL_MAX, DBL_MAX
+        else:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        seldepth = 0
+        iteration_start = perf_counter()
+
+        while True:
+            current_move = negamax_root(depth, board, alpha, beta, t0, time_limit, root_scores, &value)
+            if current_move is None:
+                break
+            if value <= alpha:
+                alpha = -DBL_MAX
+            elif value >= beta:
+                beta = DBL_MAX
+            else:
+                break
 
-    while perf_counter() - t0 < time_limit:
-        current_move = minimax_root(depth, board, t0, time_limit)
+        # Only a completed iteration replaces the move and score of the previous one
         if current_move is not None:
             best_move = current_move
+            score = value
+            have_score = True
+            pv = extract_pv(board, depth)
+            update_principal_variation(board, pv)
+            if info:
+                print(uci_info(depth, seldepth, search_nodes, perf_counter() - t0, score, pv), flush=True)
+            iteration_time = perf_counter() - iteration_start
+            if not next_iteration_fits(perf_counter() - t0, iteration_time, previous_time, soft_limit):
+                break
+            previous_time = iteration_time
         depth += 1
-        if depth > MAX_DEPTH:
+        if depth > max_depth:
             break
 
+    debug_info[b"nodes"] = search_nodes
     debug_info[b"time"] = perf_counter() - t0
     if debug:
         log_info(f"Final stats: {debug_info}")
     return best_move
 
-cdef Move minimax_root(int max_depth, Board board, double start_time, double time_limit):
+cdef str uci_info(int depth, int sel_depth, long long nodes, double elapsed, double score, list pv):
+    """
+    UCI info line for a completed iteration. Mate scores do not carry the
+    distance to mate, so it is counted in moves along the principal variation.
+    """
+    cdef str score_text
+    if score >= MATE_THRESHOLD:
+        score_text = f"mate {(len(pv) + 1) // 2}"
+    elif score <= -MATE_THRESHOLD:
+        score_text = f"mate {-(len(pv) // 2)}"
+    else:
+        score_text = f"cp {int(score)}"
+    return (f"info depth {depth} seldepth {max(sel_depth, depth)} nodes {nodes} "
+            f"nps {int(nodes / max(elapsed, 1e-6))} time {int(elapsed * 1000)} "
+            f"score {score_text} pv {' '.join(str(move) for move in pv)}")
+
+cdef list extract_pv(Board board, int max_length):
+    """Follow the transposition table moves from the current position."""
     cdef:
-        double best_value = -DBL_MAX if board.turn == 1 else DBL_MAX
+        list pv = []
+        set seen = set()
+        TTEntry *entry
+        uint64_t key
+        MoveList *moves = &move_stack[0]
+        Move move
+        int i
+
+    while len(pv) < max_length:
+        key = board.zobrist_hash()
+        entry = tt_probe(key)
+        if entry == NULL or entry.move == NO_MOVE or key in seen:
+            break
+        seen.add(key)
+        board.generate_moves(moves)
+        for i in range(moves.count):
+            if moves.moves[i] == entry.move:
+                break
+        else:
+            break
+        move = decode_move(entry.move)
+        pv.append(move)
+        board.push(move)
+
+    for _ in range(len(pv)):
+        board.pop()
+    return pv
+
+cdef void update_principal_variation(Board board, list pv):
+    """Remember the PV move of every position along the principal variation."""
+    cdef Move move
+    principal_variation.clear()
+    for move in pv:
+        principal_variation[board.zobrist_hash()] = encode_move(move)
+        board.push(move)
+    for _ in range(len(pv)):
+        board.pop()
+
+cdef Move negamax_root(int max_depth, Board board, double alpha, double beta, double start_time,
+                       double time_limit, dict root_scores, double *score):
+    """
+    Principal variation search at the root; the best score from the side to
+    move's view goes to score. Returns None when time runs out.
+    """
+    cdef:
+        double alpha_orig = alpha
+        double best_value = -DBL_MAX
         Move best_move = Move()
         MoveOrderEntry *entries
         int i, num_moves
         list moves = list(board.legal_moves())
         Move current_move
+        uint64_t key = board.zobrist_hash()
+        TTEntry *entry = tt_probe(key)
+        int tt_move = entry.move if entry != NULL else NO_MOVE
+        int encoded
+        double value
 
+    tt_move = principal_variation.get(key, tt_move)
     num_moves = len(moves)
     entries = <MoveOrderEntry *> malloc(num_moves * sizeof(MoveOrderEntry))
 
     try:
-        # Populate entries
+        # Populate entries, best first for the side to move
         for i in range(num_moves):
-            entries[i].score = evaluate.move_value(board, moves[i], evaluate.check_end_game(board))
+            encoded = encode_move(moves[i])
+            if encoded == tt_move:
+                entries[i].score = DBL_MAX
+            elif encoded in root_scores:
+                # Best moves of the previous iteration before the untried ones
+                entries[i].score = ROOT_SCORE_OFFSET + root_scores[encoded]
+            else:
+                entries[i].score = board.turn * evaluate.move_value(board, moves[i], evaluate.check_end_game(board))
             entries[i].from_x = moves[i].from_x
             entries[i].from_y = moves[i].from_y
             entries[i].to_x = moves[i].to_x
@@ -78,61 +339,187 @@ cdef Move minimax_root(int max_depth, Board board, double start_time, double tim
             current_move.promotion = entries[i].promotion
 
             board.push(current_move)
-            value = minimax(max_depth - 1, board, -DBL_MAX, DBL_MAX,
-                            board.turn == 1, start_time, time_limit)
+            if i == 0:
+                value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
+            else:
+                value = -negamax(max_depth - 1, board, -alpha - 1, -alpha, 1, start_time, time_limit)
+                if alpha < value < beta:
+                    value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
             board.pop()
+            root_scores[encode_move(current_move)] = value
 
-            if (value > best_value and board.turn == 1) or \
-                    (value < best_value and board.turn == -1):
+            if value > best_value:
                 best_value = value
                 best_move = current_move
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                break
     finally:
         free(entries)
 
+    score[0] = best_value
+    if perf_counter() - start_time >= time_limit:
+        return None
+    if best_move.from_x != -1:
+        tt_store(key, max_depth, bound_flag(best_value, alpha_orig, beta), best_value, encode_move(best_move))
     return best_move
 
-cdef double minimax(int depth, Board board, double alpha, double beta, bint is_maximizing,
+cdef double negamax(int depth, Board board, double alpha, double beta, int ply,
                     double start_time, double time_limit):
-    """Optimized alpha-beta minimax with node counting."""
-    debug_info[b"nodes"] += 1
+    """Principal variation search from the side to move's view with node counting and transposition table.
+    Moves are ordered PV/TT move, captures, killers, then quiet moves by history.
+    A node without legal moves is checkmate or stalemate."""
+    global search_nodes
+    search_nodes += 1
 
     if perf_counter() - start_time >= time_limit:
         return 0.0
 
-    if board.is_checkmate():
-        return -MATE_SCORE if is_maximizing else MATE_SCORE
-    if board.is_game_over() or depth == 0:
-        return evaluate.evaluate_board(board)
+    if board.can_claim_draw():
+        return 0.0
+    if depth == 0 or ply >= MAX_SEARCH_PLY:
+        return quiescence(board, alpha, beta, ply, start_time, time_limit)
 
     cdef:
-        list moves = board.legal_moves()
-        int num_moves = len(moves)
-        Move move
+        uint64_t key = board.zobrist_hash()
+        TTEntry *entry = tt_probe(key)
+        int tt_move = NO_MOVE
+        double alpha_orig, beta_orig
+        MoveList *moves = &move_stack[ply]
+        int i, j, best, move
+        int side = 0 if board.turn == 1 else 1
+        int ply_index = min(ply, MAX_PLY - 1)
+        bint endgame, is_capture
+        int best_move = NO_MOVE
         double value
-        double best_value
+        double best_value = -DBL_MAX
 
-    if is_maximizing:
-        best_value = -DBL_MAX
-        for move in moves:
-            board.push(move)
-            value = minimax(depth - 1, board, alpha, beta, False, start_time, time_limit)
-            board.pop()
-            best_value = max(best_value, value)
-            alpha = max(alpha, best_value)
-            if beta <= alpha:
-                break
-        return best_value
-    else:
-        best_value = DBL_MAX
-        for move in moves:
-            board.push(move)
-            value = minimax(depth - 1, board, alpha, beta, True, start_time, time_limit)
-            board.pop()
-            best_value = min(best_value, value)
-            beta = min(beta, best_value)
-            if beta <= alpha:
-                break
-        return best_value
+    if entry != NULL:
+        tt_move = entry.move
+    tt_move = principal_variation.get(key, tt_move)
+    if entry != NULL:
+        if entry.depth >= depth:
+            if entry.flag == EXACT:
+                return entry.score
+            if entry.flag == LOWER_BOUND:
+                alpha = max(alpha, entry.score)
+            else:
+                beta = min(beta, entry.score)
+            if alpha >= beta:
+                return entry.score
+    alpha_orig = alpha
+    beta_orig = beta
+
+    board.generate_moves(moves)
+    if moves.count == 0:
+        return -MATE_SCORE if board._is_square_attacked(board._find_king(board.turn), -board.turn) else 0.0
+    endgame = evaluate.check_end_game(board)
+    for i in range(moves.count):
+        move = moves.moves[i]
+        moves.scores[i] = board.turn * evaluate.packed_move_value(board, move, endgame)
+        if move == tt_move:
+            moves.scores[i] = CAPTURE_BONUS << 1
+        elif move >> 12 or board._board_view[(move >> 6 & 63) // 8, move >> 6 & 7] * board.turn < 0:
+            moves.scores[i] += CAPTURE_BONUS
+        elif move == killer_moves[ply_index][0]:
+            moves.scores[i] += KILLER_BONUS + 1
+        elif move == killer_moves[ply_index][1]:
+            moves.scores[i] += KILLER_BONUS
+        else:
+            moves.scores[i] += history_table[side][move & 63][(move >> 6) & 63]
+
+    for i in range(moves.count):
+        # Pick the best remaining move, so a cutoff skips sorting the rest
+        best = i
+        for j in range(i + 1, moves.count):
+            if moves.scores[j] > moves.scores[best]:
+                best = j
+        moves.scores[i], moves.scores[best] = moves.scores[best], moves.scores[i]
+        moves.moves[i], moves.moves[best] = moves.moves[best], moves.moves[i]
+        move = moves.moves[i]
+
+        is_capture = move >> 12 or board._board_view[(move >> 6 & 63) // 8, move >> 6 & 7] * board.turn < 0
+        board.push(decode_move(move))
+        if best_move == NO_MOVE:
+            value = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit)
+        else:
+            # Null window first, the full window only if the move may beat alpha
+            value = -negamax(depth - 1, board, -alpha - 1, -alpha, ply + 1, start_time, time_limit)
+            if alpha < value < beta:
+                value = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit)
+        board.pop()
+        if value > best_value or best_move == NO_MOVE:
+            best_value = value
+            best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            if not is_capture:
+                record_cutoff(side, move, depth, ply)
+            break
+
+    # Scores of an interrupted search are not trustworthy, keep them out of the table
+    if perf_counter() - start_time < time_limit:
+        tt_store(key, depth, bound_flag(best_value, alpha_orig, beta_orig), best_value, best_move)
+    return best_value
+
+cdef double quiescence(Board board, double alpha, double beta, int ply, double start_time, double time_limit):
+    """Capture-only search with stand-pat, MVV-LVA ordering and delta pruning."""
+    global search_nodes, seldepth
+    search_nodes += 1
+    if ply > seldepth:
+        seldepth = ply
+
+    if perf_counter() - start_time >= time_limit:
+        return 0.0
+
+    cdef:
+        double stand_pat = board.turn * evaluate.evaluate_board(board)
+        MoveList *captures
+        int i, j, best, move, num_captures = 0
+        double value
+
+    if stand_pat >= beta or ply >= MAX_SEARCH_PLY:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    # Keep the captures of the legal moves, in place
+    captures = &move_stack[ply]
+    board.generate_moves(captures)
+    for i in range(captures.count):
+        move = captures.moves[i]
+        if board._board_view[(move >> 6 & 63) // 8, move >> 6 & 7] * board.turn < 0:
+            captures.moves[num_captures] = move
+            captures.scores[num_captures] = evaluate.packed_mvv_lva(board, move)
+            num_captures += 1
+
+    for i in range(num_captures):
+        # Pick the best remaining capture, so a cutoff skips sorting the rest
+        best = i
+        for j in range(i + 1, num_captures):
+            if captures.scores[j] > captures.scores[best]:
+                best = j
+        captures.scores[i], captures.scores[best] = captures.scores[best], captures.scores[i]
+        captures.moves[i], captures.moves[best] = captures.moves[best], captures.moves[i]
+        move = captures.moves[i]
+
+        # Delta pruning
+        if stand_pat + evaluate.PIECE_VALUE[abs(board._board_view[(move >> 6 & 63) // 8, move >> 6 & 7])] \
+                + DELTA_MARGIN <= alpha:
+            continue
+        board.push(decode_move(move))
+        value = -quiescence(board, -beta, -alpha, ply + 1, start_time, time_limit)
+        board.pop()
+        if value >= beta:
+            return value
+        alpha = max(alpha, value)
+    return alpha
+
+cdef int bound_flag(double value, double alpha, double beta):
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
 
 cpdef void log_info(str message):
     """Optimized logging function."""
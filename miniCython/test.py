@@ -1,5 +1,6 @@
 import pytest
 from chess import Board, Move
+import movegeneration
 
 PAWN = 1
 KNIGHT = 2
@@ -135,6 +136,31 @@ def test_multiple_move_rollback():
     assert board.turn == WHITE
 
 
+
+def test_scores_follow_push_and_pop():
+    from evaluate import piece_square_value
+
+    def recomputed(board):
+        pieces = board.piece_map().items()
+        return (sum(piece_square_value(p, 8 * x + y, False) for (x, y), p in pieces),
+                sum(piece_square_value(p, 8 * x + y, True) for (x, y), p in pieces))
+
+    board = Board()
+    board.set_fen("r3k3/1P6/8/8/4p3/8/3P4/4K2R w - - 0 1")
+    start = (board.scores(), board.phase())
+    moves = [create_move(7, 4, 7, 6),  # e1g1 castles
+             create_move(0, 0, 0, 3),  # a8d8
+             create_move(6, 3, 4, 3),  # d2d4
+             create_move(4, 4, 5, 4),  # e4e3
+             create_move(1, 1, 0, 1, QUEEN)]  # b7b8q
+    for move in moves:
+        board.push(move)
+        assert board.scores() == recomputed(board)
+    assert board.phase() == 2 * 2 + 4  # two rooks and the new queen
+    for _ in moves:
+        board.pop()
+    assert (board.scores(), board.phase()) == start
+
 def test_check_state_rollback():
     board = Board()
     board.set_fen("4k3/4r3/8/8/8/8/4R3/4K3 w - - 0 1")
@@ -185,6 +211,35 @@ def test_stack_underflow_protection():
     with pytest.raises(IndexError):
         board.pop()
 
+def test_perft():
+    board = Board()
+    board.reset()
+    key = board.zobrist_hash()
+
+    assert [board.perft(depth) for depth in range(4)] == [1, 20, 400, 8902]
+    assert board.zobrist_hash() == key
+
+    divide = board.perft_divide(3)
+    assert len(divide) == 20
+    assert divide["e2e4"] == 600
+    assert sum(divide.values()) == 8902
+
+@pytest.mark.parametrize("fen, depth, mates", [
+    ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 2, {"a1a8"}),
+    ("r5k1/8/8/8/8/8/5PPP/6K1 b - - 0 1", 2, {"a8a1"}),
+    ("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR w KQkq - 0 1", 2, {"f3f7"}),
+    ("k7/8/2K5/8/8/8/8/7R w - - 0 1", 4, {"c6b6", "c6c7"}),
+])
+def test_mate_found(fen, depth, mates, capsys):
+    board = Board()
+    board.set_fen(fen)
+    movegeneration.clear_transposition_table()
+    movegeneration.clear_move_ordering()
+    move = movegeneration.next_move(board, float("inf"), "test", False, depth, True)
+
+    assert str(move) in mates
+    assert " score mate " in capsys.readouterr().out.splitlines()[-1]
+
 def test_whatever():
     # Test 1: Pawn shouldn't capture same color
     board = Board()
@@ -1,7 +1,8 @@
+import random
 from typing import Tuple
 import numpy as np
-from queue import LifoQueue
 from numba import njit
+from evaluate import PIECE_SQUARE_MG, PIECE_SQUARE_EG, PHASE_WEIGHT
 
 # Constants
 WHITE = 1
@@ -12,6 +13,20 @@ BISHOP = 3
 ROOK = 4
 QUEEN = 5
 KING = 6
+PROMOTION_PIECES = {'q': QUEEN, 'r': ROOK, 'b': BISHOP, 'n': KNIGHT}
+
+# Columns of the undo buffer, one row per move played: the packed move, the
+# piece it captured and the key, scores and phase from before the move
+UNDO_MOVE, UNDO_CAPTURED, UNDO_KEY, UNDO_MG, UNDO_EG, UNDO_PHASE = range(6)
+UNDO_SIZE = 6
+# Rows allocated up front; a longer game doubles the buffer
+UNDO_CAPACITY = 1024
+
+# Zobrist keys indexed [piece + 6][8 * x + y] plus one for black to move. They
+# are kept below 2**63 so keys fit the int64 arrays of the transposition table.
+_zobrist_random = random.Random(0x5A0B)
+ZOBRIST_PIECES = [[_zobrist_random.getrandbits(63) for _ in range(64)] for _ in range(13)]
+ZOBRIST_TURN = _zobrist_random.getrandbits(63)
 
 class Move:
     def __init__(self):
@@ -43,180 +58,261 @@ class Move:
         else:
             return from_notation + to_notation
 
+def encode_move(move: Move) -> int:
+    """Pack a move into from_square | to_square << 6 | promotion << 12 (squares as 8 * x + y)."""
+    return 8 * move.from_square[0] + move.from_square[1] + \
+        ((8 * move.to_square[0] + move.to_square[1]) << 6) + ((move.promotion or 0) << 12)
+
+def decode_move(move: int) -> Move:
+    """Move from its packed form from_square | to_square << 6 | promotion << 12."""
+    decoded = Move()
+    decoded.from_square = ((move & 63) >> 3, move & 7)
+    decoded.to_square = ((move >> 6 & 63) >> 3, move >> 6 & 7)
+    decoded.promotion = (move >> 12) or None
+    return decoded
+
 class Piece:
     def __init__(self, color=None, piece_type=None):
         self.color = color
         self.piece_type = piece_type
 
-@njit
-def is_square_attacked_numba(board, square_x, square_y, enemy_color):
-    # Check pawn attacks
-    pawn_directions = [(1, -1), (1, 1)] if enemy_color == WHITE else [(-1, -1), (-1, 1)]
-    for dx, dy in pawn_directions:
-        x = square_x + dx
-        y = square_y + dy
-        if 0 <= x < 8 and 0 <= y < 8:
-            if board[x, y] == PAWN * enemy_color:
-                return True
-
-    # Check knight attacks
-    knight_moves = [(-2, -1), (-1, -2), (1, -2), (2, -1),
-                    (2, 1), (1, 2), (-1, 2), (-2, 1)]
-    for dx, dy in knight_moves:
-        x = square_x + dx
-        y = square_y + dy
-        if 0 <= x < 8 and 0 <= y < 8:
-            if board[x, y] == KNIGHT * enemy_color:
-                return True
-
-    # Check king attacks
-    king_moves = [(-1, -1), (-1, 0), (-1, 1),
-                  (0, -1), (0, 1),
-                  (1, -1), (1, 0), (1, 1)]
-    for dx, dy in king_moves:
-        x = square_x + dx
-        y = square_y + dy
-        if 0 <= x < 8 and 0 <= y < 8:
-            if board[x, y] == KING * enemy_color:
-                return True
-
-    # Check sliding pieces
-    sliding_directions = [
-        (BISHOP, [(-1, -1), (-1, 1), (1, -1), (1, 1)]),
-        (ROOK, [(-1, 0), (1, 0), (0, -1), (0, 1)]),
-        (QUEEN, [(-1, -1), (-1, 1), (1, -1), (1, 1),
-                 (-1, 0), (1, 0), (0, -1), (0, 1)])
-    ]
-
-    for piece_type, directions in sliding_directions:
-        for dx, dy in directions:
-            x, y = square_x + dx, square_y + dy
+def _target_table(offsets):
+    """Squares 8 * x + y reached from each square by the offsets, -1 padded, and their counts."""
+    targets = np.full((64, len(offsets)), -1, dtype=np.int64)
+    counts = np.zeros(64, dtype=np.int64)
+    for square in range(64):
+        for dx, dy in offsets:
+            x, y = square // 8 + dx, square % 8 + dy
+            if 0 <= x < 8 and 0 <= y < 8:
+                targets[square, counts[square]] = 8 * x + y
+                counts[square] += 1
+    return targets, counts
+
+
+def _ray_table(directions):
+    """Squares along each direction from each square, nearest first, and the ray lengths."""
+    rays = np.full((64, len(directions), 7), -1, dtype=np.int64)
+    lengths = np.zeros((64, len(directions)), dtype=np.int64)
+    for square in range(64):
+        for d, (dx, dy) in enumerate(directions):
+            x, y = square // 8 + dx, square % 8 + dy
             while 0 <= x < 8 and 0 <= y < 8:
-                if board[x, y] != 0:
-                    if board[x, y] == piece_type * enemy_color:
-                        return True
-                    break
+                rays[square, d, lengths[square, d]] = 8 * x + y
+                lengths[square, d] += 1
                 x += dx
                 y += dy
+    return rays, lengths
+
+
+# Precomputed attack tables indexed by square 8 * x + y, read as constants by
+# the jitted functions below
+KNIGHT_TARGETS, KNIGHT_TARGET_COUNT = _target_table([(-2, -1), (-1, -2), (1, -2), (2, -1),
+                                                     (2, 1), (1, 2), (-1, 2), (-2, 1)])
+KING_TARGETS, KING_TARGET_COUNT = _target_table([(-1, -1), (-1, 0), (-1, 1),
+                                                 (0, -1), (0, 1),
+                                                 (1, -1), (1, 0), (1, 1)])
+# Squares attacked by a white (index 0) or black (index 1) pawn on each square
+WHITE_PAWN_TARGETS, WHITE_PAWN_TARGET_COUNT = _target_table([(-1, -1), (-1, 1)])
+BLACK_PAWN_TARGETS, BLACK_PAWN_TARGET_COUNT = _target_table([(1, -1), (1, 1)])
+PAWN_TARGETS = np.stack((WHITE_PAWN_TARGETS, BLACK_PAWN_TARGETS))
+PAWN_TARGET_COUNT = np.stack((WHITE_PAWN_TARGET_COUNT, BLACK_PAWN_TARGET_COUNT))
+# Rays 0-3 are diagonal, 4-7 straight
+RAYS, RAY_LENGTH = _ray_table([(-1, -1), (-1, 1), (1, -1), (1, 1),
+                               (-1, 0), (1, 0), (0, -1), (0, 1)])
+
+
+@njit(cache=True)
+def is_square_attacked_numba(board, square_x, square_y, enemy_color):
+    square = 8 * square_x + square_y
 
-    return False
+    # Pawns stand where a pawn of the other color on the square would capture
+    side = 1 if enemy_color == WHITE else 0
+    for i in range(PAWN_TARGET_COUNT[side, square]):
+        target = PAWN_TARGETS[side, square, i]
+        if board[target >> 3, target & 7] == PAWN * enemy_color:
+            return True
 
-@njit
-def is_move_legal_numba(board, from_x, from_y, to_x, to_y, promotion_piece, color):
-    board_copy = board.copy()
-    moving_piece = board_copy[from_x, from_y]
-    board_copy[to_x, to_y] = moving_piece
-    board_copy[from_x, from_y] = 0
-
-    if promotion_piece != 0:
-        board_copy[to_x, to_y] = promotion_piece * color
-
-    king_found = False
-    king_x, king_y = -1, -1
-    for x in range(8):
-        for y in range(8):
-            if board_copy[x, y] == KING * color:
-                king_x, king_y = x, y
-                king_found = True
-                break
-        if king_found:
-            break
+    for i in range(KNIGHT_TARGET_COUNT[square]):
+        target = KNIGHT_TARGETS[square, i]
+        if board[target >> 3, target & 7] == KNIGHT * enemy_color:
+            return True
 
-    if king_x == -1 or king_y == -1:
-        return False
+    for i in range(KING_TARGET_COUNT[square]):
+        target = KING_TARGETS[square, i]
+        if board[target >> 3, target & 7] == KING * enemy_color:
+            return True
 
-    return not is_square_attacked_numba(board_copy, king_x, king_y, -color)
+    # Sliders: the first piece on each ray decides
+    for d in range(8):
+        slider = BISHOP if d < 4 else ROOK
+        for i in range(RAY_LENGTH[square, d]):
+            target = RAYS[square, d, i]
+            piece = board[target >> 3, target & 7]
+            if piece != 0:
+                if piece == slider * enemy_color or piece == QUEEN * enemy_color:
+                    return True
+                break
+
+    return False
 
-@njit
-def generate_pawn_moves(board, x, y, color):
-    moves = []
+@njit(cache=True)
+def is_move_legal_numba(board, from_x, from_y, to_x, to_y, promotion_piece, color, king_x, king_y):
+    if king_x == -1:
+        return False
+    if from_x == king_x and from_y == king_y:
+        king_x, king_y = to_x, to_y
+
+    # Make the move in place, test the king and take it back
+    moving_piece = board[from_x, from_y]
+    captured = board[to_x, to_y]
+    board[to_x, to_y] = moving_piece
+    board[from_x, from_y] = 0
+    legal = not is_square_attacked_numba(board, king_x, king_y, -color)
+    board[from_x, from_y] = moving_piece
+    board[to_x, to_y] = captured
+    return legal
+
+@njit(cache=True)
+def piece_list_add(piece_list, piece_count, piece_slot, side, square):
+    slot = piece_count[side]
+    piece_list[side, slot] = square
+    piece_slot[square] = slot
+    piece_count[side] = slot + 1
+
+@njit(cache=True)
+def piece_list_remove(piece_list, piece_count, piece_slot, side, square):
+    # Fill the hole with the last entry so the list stays dense
+    last = piece_count[side] - 1
+    slot = piece_slot[square]
+    moved = piece_list[side, last]
+    piece_list[side, slot] = moved
+    piece_slot[moved] = slot
+    piece_slot[square] = -1
+    piece_count[side] = last
+
+@njit(cache=True)
+def piece_list_move(piece_list, piece_count, piece_slot, side, from_square, to_square):
+    slot = piece_slot[from_square]
+    piece_list[side, slot] = to_square
+    piece_slot[to_square] = slot
+    piece_slot[from_square] = -1
+
+# Upper bound on the number of legal moves in a position (the most known is
+# 218); move buffers passed to generate_moves_numba hold this many
+MAX_MOVES = 256
+
+
+@njit(cache=True)
+def add_move(moves, count, from_square, to_square, promotion):
+    moves[count] = from_square | (to_square << 6) | (promotion << 12)
+    return count + 1
+
+@njit(cache=True)
+def generate_pawn_moves(board, x, y, color, moves, count):
     direction = -color
     start_row = 6 if color == WHITE else 1
     promotion_row = 0 if color == WHITE else 7
+    square = 8 * x + y
 
     # Single move
     new_x = x + direction
     if 0 <= new_x < 8 and board[new_x, y] == 0:
         if new_x == promotion_row:
-            for promo in [QUEEN, ROOK, BISHOP, KNIGHT]:
-                moves.append((x, y, new_x, y, promo))
+            for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                count = add_move(moves, count, square, 8 * new_x + y, promo)
         else:
-            moves.append((x, y, new_x, y, 0))
+            count = add_move(moves, count, square, 8 * new_x + y, 0)
 
     # Double move
     if x == start_row and board[x + direction, y] == 0 and board[x + 2 * direction, y] == 0:
-        new_x = x + 2 * direction
-        moves.append((x, y, new_x, y, 0))
+        count = add_move(moves, count, square, 8 * (x + 2 * direction) + y, 0)
 
     # Captures
-    for dy in (-1, 1):
-        new_x = x + direction
-        new_y = y + dy
-        if 0 <= new_x < 8 and 0 <= new_y < 8:
-            if board[new_x, new_y] * color < 0:
-                if new_x == promotion_row:
-                    for promo in [QUEEN, ROOK, BISHOP, KNIGHT]:
-                        moves.append((x, y, new_x, new_y, promo))
-                else:
-                    moves.append((x, y, new_x, new_y, 0))
-
-    return moves
-
-@njit
-def generate_knight_moves(board, x, y, color):
-    moves = []
-    knight_moves = [(-2, -1), (-1, -2), (1, -2), (2, -1),
-                    (2, 1), (1, 2), (-1, 2), (-2, 1)]
-    for dx, dy in knight_moves:
-        new_x = x + dx
-        new_y = y + dy
-        if 0 <= new_x < 8 and 0 <= new_y < 8:
-            if board[new_x, new_y] * color <= 0:
-                moves.append((x, y, new_x, new_y, 0))
-    return moves
-
-@njit
-def generate_sliding_moves(board, x, y, color, piece_type):
-    moves = []
-    if piece_type == BISHOP:
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1)]
-    elif piece_type == ROOK:
-        directions = [(-1, 0), (1, 0), (0, -1), (0, 1)]
-    elif piece_type == QUEEN:
-        directions = [(-1, -1), (-1, 1), (1, -1), (1, 1),
-                      (-1, 0), (1, 0), (0, -1), (0, 1)]
-    else:
-        return moves
-
-    for dx, dy in directions:
-        step = 1
-        while True:
-            new_x = x + dx * step
-            new_y = y + dy * step
-            if not (0 <= new_x < 8 and 0 <= new_y < 8):
-                break
-            target = board[new_x, new_y]
-            if target * color > 0:
+    side = 0 if color == WHITE else 1
+    for i in range(PAWN_TARGET_COUNT[side, square]):
+        target = PAWN_TARGETS[side, square, i]
+        if board[target >> 3, target & 7] * color < 0:
+            if target >> 3 == promotion_row:
+                for promo in (QUEEN, ROOK, BISHOP, KNIGHT):
+                    count = add_move(moves, count, square, target, promo)
+            else:
+                count = add_move(moves, count, square, target, 0)
+
+    return count
+
+@njit(cache=True)
+def generate_leaper_moves(board, x, y, color, targets, target_count, moves, count):
+    square = 8 * x + y
+    for i in range(target_count[square]):
+        target = targets[square, i]
+        if board[target >> 3, target & 7] * color <= 0:
+            count = add_move(moves, count, square, target, 0)
+    return count
+
+@njit(cache=True)
+def generate_sliding_moves(board, x, y, color, piece_type, moves, count):
+    # Bishops use the diagonal rays 0-3, rooks the straight rays 4-7, queens all
+    first = 4 if piece_type == ROOK else 0
+    last = 4 if piece_type == BISHOP else 8
+    square = 8 * x + y
+    for d in range(first, last):
+        for i in range(RAY_LENGTH[square, d]):
+            target = RAYS[square, d, i]
+            piece = board[target >> 3, target & 7]
+            if piece * color > 0:
                 break
-            moves.append((x, y, new_x, new_y, 0))
-            if target * color < 0:
+            count = add_move(moves, count, square, target, 0)
+            if piece != 0:
                 break
-            step += 1
-    return moves
-
-@njit
-def generate_king_moves(board, x, y, color):
-    moves = []
-    king_moves = [(-1, -1), (-1, 0), (-1, 1),
-                  (0, -1), (0, 1),
-                  (1, -1), (1, 0), (1, 1)]
-    for dx, dy in king_moves:
-        new_x = x + dx
-        new_y = y + dy
-        if 0 <= new_x < 8 and 0 <= new_y < 8:
-            if board[new_x, new_y] * color <= 0:
-                moves.append((x, y, new_x, new_y, 0))
-    return moves
+    return count
+
+@njit(cache=True)
+def generate_moves_numba(board, piece_list, piece_count, color, king_x, king_y, moves):
+    """
+    Write the legal moves of color into moves, packed as from_square |
+    to_square << 6 | promotion << 12 (squares as 8 * x + y), and return
+    how many there are.
+    """
+    side = 0 if color == WHITE else 1
+    count = 0
+    for i in range(piece_count[side]):
+        square = piece_list[side, i]
+        x = square >> 3
+        y = square & 7
+        piece_type = abs(board[x, y])
+        first = count
+        if piece_type == PAWN:
+            count = generate_pawn_moves(board, x, y, color, moves, count)
+        elif piece_type == KNIGHT:
+            count = generate_leaper_moves(board, x, y, color, KNIGHT_TARGETS, KNIGHT_TARGET_COUNT, moves, count)
+        elif piece_type == KING:
+            count = generate_leaper_moves(board, x, y, color, KING_TARGETS, KING_TARGET_COUNT, moves, count)
+        else:
+            count = generate_sliding_moves(board, x, y, color, piece_type, moves, count)
+
+        # Keep the moves that do not leave the king in check, in place
+        legal = first
+        for j in range(first, count):
+            move = moves[j]
+            target = (move >> 6) & 63
+            if is_move_legal_numba(board, x, y, target >> 3, target & 7, move >> 12, color, king_x, king_y):
+                moves[legal] = move
+                legal += 1
+        count = legal
+    return count
+
+@njit(cache=True)
+def can_claim_draw_numba(board, piece_list, piece_count):
+    minors = 0
+    for side in range(2):
+        for i in range(piece_count[side]):
+            square = piece_list[side, i]
+            piece_type = abs(board[square // 8, square % 8])
+            if piece_type == PAWN or piece_type == ROOK or piece_type == QUEEN:
+                return False
+            if piece_type != KING:
+                minors += 1
+    return minors <= 1
 
 class Board:
     def __init__(self):
@@ -229,7 +325,55 @@ class Board:
                                [0,0,0,0,0,0,0,0],
                                [1,1,1,1,1,1,1,1],
                                [4,2,3,5,6,3,2,4]], dtype=np.int64)
-        self.event = LifoQueue()
+        # Undo records of the moves played, one row per move (see UNDO_MOVE)
+        self._undo = np.zeros((UNDO_CAPACITY, UNDO_SIZE), dtype=np.int64)
+        self._undo_count = 0
+        # Scratch buffer for the packed moves of legal_moves and the game state checks
+        self._moves = np.empty(MAX_MOVES, dtype=np.int64)
+        self._init_piece_lists()
+
+    def _compute_hash(self):
+        key = ZOBRIST_TURN if self.turn == BLACK else 0
+        for (x, y), piece in self.piece_map().items():
+            key ^= ZOBRIST_PIECES[piece + 6][8 * x + y]
+        return key
+
+    def zobrist_hash(self):
+        return self._hash
+
+    def _init_piece_lists(self):
+        # Squares (8 * x + y) of each side's pieces, index 0 for white and
+        # 1 for black, plus each square's slot so removal is O(1)
+        self.piece_list = np.zeros((2, 32), dtype=np.int64)
+        self.piece_count = np.zeros(2, dtype=np.int64)
+        self.piece_slot = np.full(64, -1, dtype=np.int64)
+        self._king_squares = {WHITE: None, BLACK: None}
+        # Running (midgame, endgame) material plus piece-square score from
+        # white's point of view, the number of each piece (index piece + 6)
+        # and the game phase
+        mg = eg = 0
+        self.phase = 0
+        self.material_count = [0] * 13
+        for x in range(8):
+            for y in range(8):
+                piece = int(self._board[x, y])
+                if piece == 0:
+                    continue
+                color = WHITE if piece > 0 else BLACK
+                piece_list_add(self.piece_list, self.piece_count, self.piece_slot,
+                               0 if color == WHITE else 1, 8 * x + y)
+                if abs(piece) == KING:
+                    self._king_squares[color] = (x, y)
+                mg += PIECE_SQUARE_MG[piece + 6][8 * x + y]
+                eg += PIECE_SQUARE_EG[piece + 6][8 * x + y]
+                self.material_count[piece + 6] += 1
+                self.phase += PHASE_WEIGHT[abs(piece)]
+        self.scores = (mg, eg)
+        self._hash = self._compute_hash()
+
+    def _king_args(self, color: int):
+        king = self._king_squares[color]
+        return (-1, -1) if king is None else king
 
     def reset(self):
         self.__init__()
@@ -265,73 +409,167 @@ class Board:
                 self._board[row, col] = piece_type if color == WHITE else -piece_type
                 col += 1
         self.turn = WHITE if parts[1] == "w" else BLACK
+        self._undo_count = 0
+        self._init_piece_lists()
 
     def push_uci(self, move: str):
-        from_square = (8 - int(move[1]), ord(move[0]) - ord('a'))
-        to_square = (8 - int(move[3]), ord(move[2]) - ord('a'))
-        promotion = None
-        if len(move) == 5:
-            promotion = move[4].lower()
-            promotion_map = {'q': QUEEN, 'r': ROOK, 'b': BISHOP, 'n': KNIGHT}
-            promotion = promotion_map.get(promotion, None)
-        piece = self._board[from_square[0], from_square[1]]
-        if abs(piece) == KING and abs(from_square[1] - to_square[1]) == 2:
-            if to_square[1] > from_square[1]:
-                rook_from = (from_square[0], 7)
-                rook_to = (from_square[0], 5)
-            else:
-                rook_from = (from_square[0], 0)
-                rook_to = (from_square[0], 3)
-            rook_piece = self._board[rook_from[0], rook_from[1]]
-            self._board[rook_to[0], rook_to[1]] = rook_piece
-            self._board[rook_from[0], rook_from[1]] = 0
-        old_piece = self._board[to_square[0], to_square[1]]
-        if old_piece != 0:
-            self.event.put(old_piece)
-        self._board[to_square[0], to_square[1]] = piece
-        self._board[from_square[0], from_square[1]] = 0
-        if np.sign(old_piece) == np.sign(piece):
-            self._board[from_square[0], from_square[1]] = old_piece
+        from_square = 8 * (8 - int(move[1])) + ord(move[0]) - ord('a')
+        to_square = 8 * (8 - int(move[3])) + ord(move[2]) - ord('a')
+        promotion = PROMOTION_PIECES.get(move[4].lower(), 0) if len(move) == 5 else 0
+        self.push_move(from_square | to_square << 6 | promotion << 12)
+
+    def push_move(self, move: int):
+        """
+        Play a packed move (see decode_move), keeping what pop_move needs to
+        take it back in the next row of the preallocated undo buffer.
+        """
+        board = self._board
+        from_index = move & 63
+        to_index = move >> 6 & 63
+        promotion = move >> 12
+        from_x, from_y = from_index >> 3, from_index & 7
+        to_x, to_y = to_index >> 3, to_index & 7
+        piece = board.item(from_x, from_y)
+        captured = board.item(to_x, to_y)
+        color = WHITE if piece > 0 else BLACK
+        side = 0 if color == WHITE else 1
+        lists = (self.piece_list, self.piece_count, self.piece_slot)
+        mg, eg = self.scores
+
+        if self._undo_count == len(self._undo):
+            self._undo = np.concatenate((self._undo, np.zeros_like(self._undo)))
+        self._undo[self._undo_count] = (move, captured, self._hash, mg, eg, self.phase)
+        self._undo_count += 1
+
+        key = self._hash ^ ZOBRIST_TURN ^ ZOBRIST_PIECES[piece + 6][from_index]
+        if abs(piece) == KING and abs(from_y - to_y) == 2:
+            rook_from = 8 * from_x + (7 if to_y > from_y else 0)
+            rook_to = 8 * from_x + (5 if to_y > from_y else 3)
+            rook_piece = board.item(from_x, rook_from & 7)
+            board[from_x, rook_to & 7] = rook_piece
+            board[from_x, rook_from & 7] = 0
+            piece_list_move(*lists, side, rook_from, rook_to)
+            key ^= ZOBRIST_PIECES[rook_piece + 6][rook_from] ^ ZOBRIST_PIECES[rook_piece + 6][rook_to]
+            mg += PIECE_SQUARE_MG[rook_piece + 6][rook_to] - PIECE_SQUARE_MG[rook_piece + 6][rook_from]
+            eg += PIECE_SQUARE_EG[rook_piece + 6][rook_to] - PIECE_SQUARE_EG[rook_piece + 6][rook_from]
+        board[to_x, to_y] = piece
+        board[from_x, from_y] = 0
+        if captured * piece > 0:
+            # Own piece swapped onto the from square, both squares stay occupied
+            board[from_x, from_y] = captured
+            key ^= ZOBRIST_PIECES[captured + 6][to_index] ^ ZOBRIST_PIECES[captured + 6][from_index]
+            mg += PIECE_SQUARE_MG[captured + 6][from_index] - PIECE_SQUARE_MG[captured + 6][to_index]
+            eg += PIECE_SQUARE_EG[captured + 6][from_index] - PIECE_SQUARE_EG[captured + 6][to_index]
+            if abs(captured) == KING:
+                self._king_squares[color] = (from_x, from_y)
+        else:
+            if captured != 0:
+                key ^= ZOBRIST_PIECES[captured + 6][to_index]
+                piece_list_remove(*lists, 1 - side, to_index)
+                mg -= PIECE_SQUARE_MG[captured + 6][to_index]
+                eg -= PIECE_SQUARE_EG[captured + 6][to_index]
+                self.material_count[captured + 6] -= 1
+                self.phase -= PHASE_WEIGHT[abs(captured)]
+                if abs(captured) == KING:
+                    self._king_squares[-color] = None
+            piece_list_move(*lists, side, from_index, to_index)
+        if abs(piece) == KING:
+            self._king_squares[color] = (to_x, to_y)
+        placed = piece
         if promotion:
-            self._board[to_square[0], to_square[1]] = promotion * self.turn
+            placed = promotion * self.turn
+            board[to_x, to_y] = placed
+            self.material_count[piece + 6] -= 1
+            self.material_count[placed + 6] += 1
+            self.phase += PHASE_WEIGHT[promotion]
+        mg += PIECE_SQUARE_MG[placed + 6][to_index] - PIECE_SQUARE_MG[piece + 6][from_index]
+        eg += PIECE_SQUARE_EG[placed + 6][to_index] - PIECE_SQUARE_EG[piece + 6][from_index]
+        self.scores = (mg, eg)
+        self._hash = key ^ ZOBRIST_PIECES[placed + 6][to_index]
         self.turn = -self.turn
 
-    def legal_moves(self):
-        moves = []
+    def pop_move(self) -> int:
+        """Take back the last move played and return it packed."""
+        if self._undo_count == 0:
+            raise IndexError("No moves to pop")
+        self._undo_count -= 1
+        move, captured, key, mg, eg, phase = self._undo[self._undo_count].tolist()
         board = self._board
-        color = self.turn
-        for x in range(8):
-            for y in range(8):
-                piece = board[x, y]
-                if piece == 0 or np.sign(piece) != color:
-                    continue
-                piece_type = abs(piece)
-                if piece_type == PAWN:
-                    pawn_moves = generate_pawn_moves(board, x, y, color)
-                    for move in pawn_moves:
-                        if is_move_legal_numba(board, move[0], move[1], move[2], move[3], move[4], color):
-                            moves.append(move)
-                elif piece_type == KNIGHT:
-                    knight_moves = generate_knight_moves(board, x, y, color)
-                    for move in knight_moves:
-                        if is_move_legal_numba(board, move[0], move[1], move[2], move[3], 0, color):
-                            moves.append(move)
-                elif piece_type in [BISHOP, ROOK, QUEEN]:
-                    sliding_moves = generate_sliding_moves(board, x, y, color, piece_type)
-                    for move in sliding_moves:
-                        if is_move_legal_numba(board, move[0], move[1], move[2], move[3], 0, color):
-                            moves.append(move)
-                elif piece_type == KING:
-                    king_moves = generate_king_moves(board, x, y, color)
-                    for move in king_moves:
-                        if is_move_legal_numba(board, move[0], move[1], move[2], move[3], 0, color):
-                            moves.append(move)
-        for move_tuple in moves:
-            move = Move()
-            move.from_square = (move_tuple[0], move_tuple[1])
-            move.to_square = (move_tuple[2], move_tuple[3])
-            move.promotion = move_tuple[4] if move_tuple[4] != 0 else None
-            yield move
+        from_index = move & 63
+        to_index = move >> 6 & 63
+        from_x, from_y = from_index >> 3, from_index & 7
+        to_x, to_y = to_index >> 3, to_index & 7
+        self.turn = color = -self.turn
+        side = 0 if color == WHITE else 1
+        lists = (self.piece_list, self.piece_count, self.piece_slot)
+
+        placed = board.item(to_x, to_y)
+        piece = placed
+        if move >> 12:
+            piece = PAWN * color
+            self.material_count[placed + 6] -= 1
+            self.material_count[piece + 6] += 1
+        board[from_x, from_y] = piece
+        board[to_x, to_y] = captured
+        if captured * piece > 0:
+            if abs(captured) == KING:
+                self._king_squares[color] = (to_x, to_y)
+        else:
+            piece_list_move(*lists, side, to_index, from_index)
+            if captured != 0:
+                piece_list_add(*lists, 1 - side, to_index)
+                self.material_count[captured + 6] += 1
+                if abs(captured) == KING:
+                    self._king_squares[-color] = (to_x, to_y)
+        if abs(piece) == KING:
+            self._king_squares[color] = (from_x, from_y)
+            if abs(from_y - to_y) == 2:
+                rook_from = 8 * from_x + (7 if to_y > from_y else 0)
+                rook_to = 8 * from_x + (5 if to_y > from_y else 3)
+                board[from_x, rook_from & 7] = board.item(from_x, rook_to & 7)
+                board[from_x, rook_to & 7] = 0
+                piece_list_move(*lists, side, rook_to, rook_from)
+        self._hash = key
+        self.scores = (mg, eg)
+        self.phase = phase
+        return move
+
+    def generate_moves(self, moves) -> int:
+        """Write the packed legal moves into the int64 array moves and return their number."""
+        return generate_moves_numba(self._board, self.piece_list, self.piece_count, self.turn,
+                                    *self._king_args(self.turn), moves)
+
+    def legal_moves(self):
+        count = self.generate_moves(self._moves)
+        for move in self._moves[:count].tolist():
+            yield decode_move(move)
+
+    def perft(self, depth: int) -> int:
+        """Count the leaves of the legal move tree to depth, the last ply without playing it."""
+        if depth <= 0:
+            return 1
+        return self._perft(depth, np.empty((depth, MAX_MOVES), dtype=np.int64))
+
+    def _perft(self, depth: int, buffers) -> int:
+        moves = buffers[depth - 1]
+        count = self.generate_moves(moves)
+        if depth == 1:
+            return count
+        nodes = 0
+        for move in moves[:count].tolist():
+            self.push_move(move)
+            nodes += self._perft(depth - 1, buffers)
+            self.pop_move()
+        return nodes
+
+    def perft_divide(self, depth: int) -> dict:
+        """perft(depth - 1) below each legal move, keyed by its UCI string."""
+        counts = {}
+        for move in list(self.legal_moves()):
+            self.push(move)
+            counts[str(move)] = self.perft(depth - 1)
+            self.pop()
+        return counts
 
     def _is_move_legal(self, move: Move, color: int):
         from_sq = move.from_square
@@ -342,80 +580,36 @@ class Board:
             from_sq[0], from_sq[1],
             to_sq[0], to_sq[1],
             promotion,
-            color
+            color,
+            *self._king_args(color)
         )
 
     def push(self, move: Move):
-        self.event.put(move)
-        self.push_uci(str(move))
+        self.push_move(encode_move(move))
 
-    def pop(self):
-        if self.event.empty():
-            raise IndexError("No moves to pop")
-        event = self.event.get()
-        if isinstance(event, Move):
-            last_move = self.retractMove(event)
-        else:
-            last_move = self.retractMove(self.event.get())
-            self._board[last_move.to_square[0], last_move.to_square[1]] = event
-        return last_move
-
-    def is_numeric(self, ev) -> bool:
-        attrs = ['__add__', '__sub__', '__mul__', '__truediv__', '__pow__']
-        return all(hasattr(ev, attr) for attr in attrs)
-
-    def retractMove(self, event):
-        last_move = event
-        from_sq = last_move.from_square
-        to_sq = last_move.to_square
-        moving_piece = self._board[to_sq[0], to_sq[1]]
-        self._board[from_sq[0], from_sq[1]] = moving_piece
-        self._board[to_sq[0], to_sq[1]] = 0
-        if abs(moving_piece) == KING and abs(from_sq[1] - to_sq[1]) == 2:
-            if to_sq[1] > from_sq[1]:
-                rook_from = (from_sq[0], 5)
-                rook_to = (from_sq[0], 7)
-            else:
-                rook_from = (from_sq[0], 3)
-                rook_to = (from_sq[0], 0)
-            rook_piece = self._board[rook_from[0], rook_from[1]]
-            self._board[rook_to[0], rook_to[1]] = rook_piece
-            self._board[rook_from[0], rook_from[1]] = 0
-        if last_move.promotion:
-            original_color = -self.turn
-            self._board[from_sq[0], from_sq[1]] = PAWN * original_color
-        self.turn = -self.turn
-        return last_move
+    def pop(self) -> Move:
+        return decode_move(self.pop_move())
 
     def can_claim_draw(self):
-        pieces = np.abs(self._board).flatten()
-        if np.sum(pieces == PAWN) == 0 and np.sum(pieces == QUEEN) == 0 and np.sum(pieces == ROOK) == 0:
-            if np.sum(pieces == BISHOP) + np.sum(pieces == KNIGHT) <= 1:
-                return True
-        return False
+        return can_claim_draw_numba(self._board, self.piece_list, self.piece_count)
 
     def is_checkmate(self):
-        king_position = None
-        for x in range(8):
-            for y in range(8):
-                if self._board[x, y] == KING * -self.turn:
-                    king_position = (x, y)
-                    break
-            if king_position:
-                break
+        king_position = self._king_squares[-self.turn]
         if not self.is_square_attacked(king_position, self.turn):
             return False
-        for move in self.legal_moves():
-            original_piece = self._board[move.to_square[0], move.to_square[1]]
-            self._board[move.to_square[0], move.to_square[1]] = self._board[move.from_square[0], move.from_square[1]]
-            self._board[move.from_square[0], move.from_square[1]] = 0
-            king_pos_new = move.to_square if move.from_square == king_position else king_position
-            if not self.is_square_attacked(king_pos_new, self.turn):
-                self._board[move.from_square[0], move.from_square[1]] = self._board[move.to_square[0], move.to_square[1]]
-                self._board[move.to_square[0], move.to_square[1]] = original_piece
+        board = self._board
+        for move in self._moves[:self.generate_moves(self._moves)].tolist():
+            from_square = ((move & 63) >> 3, move & 7)
+            to_square = ((move >> 6 & 63) >> 3, move >> 6 & 7)
+            original_piece = board[to_square]
+            board[to_square] = board[from_square]
+            board[from_square] = 0
+            king_pos_new = to_square if from_square == king_position else king_position
+            safe = not self.is_square_attacked(king_pos_new, self.turn)
+            board[from_square] = board[to_square]
+            board[to_square] = original_piece
+            if safe:
                 return False
-            self._board[move.from_square[0], move.from_square[1]] = self._board[move.to_square[0], move.to_square[1]]
-            self._board[move.to_square[0], move.to_square[1]] = original_piece
         return True
 
     def is_square_attacked(self, square: Tuple, enemy_color: int):
@@ -426,7 +620,7 @@ class Board:
     def is_game_over(self):
         if self.is_checkmate():
             return True
-        if not any(self.legal_moves()):
+        if self.generate_moves(self._moves) == 0:
             return True
         if self.can_claim_draw():
             return True
@@ -437,11 +631,10 @@ class Board:
 
     def piece_map(self):
         piece_map = {}
-        for x in range(8):
-            for y in range(8):
-                piece_value = self._board[x, y]
-                if piece_value != 0:
-                    piece_map[(x, y)] = piece_value
+        for side in range(2):
+            for square in self.piece_list[side, :self.piece_count[side]].tolist():
+                x, y = divmod(square, 8)
+                piece_map[(x, y)] = self._board[x, y]
         return piece_map
 
 if __name__ == "__main__":
@@ -98,7 +98,7 @@ KING_ENDGAME_WHITE = np.array([
 KING_ENDGAME_BLACK = KING_ENDGAME_WHITE[::-1].copy()
 
 
-@njit(nogil=True)
+@njit(nogil=True, cache=True)
 def get_pst_value(piece_type, color, square_x, square_y, endgame):
     idx = square_x * 8 + square_y
     if piece_type == PAWN:
@@ -118,7 +118,7 @@ def get_pst_value(piece_type, color, square_x, square_y, endgame):
     return 0
 
 
-@njit(nogil=True)
+@njit(nogil=True, cache=True)
 def evaluate_piece_numba(piece, square_x, square_y, endgame):
     piece_type = abs(piece)
     color = 1 if piece > 0 else -1
@@ -126,38 +126,32 @@ def evaluate_piece_numba(piece, square_x, square_y, endgame):
     return pst + PIECE_VALUE[piece_type]
 
 
-@njit(nogil=True)
-def check_end_game_numba(board):
-    queens = 0
-    minors = 0
-    for x in range(8):
-        for y in range(8):
-            piece = board[x, y]
-            if piece == 0:
-                continue
-            pt = abs(piece)
-            if pt == QUEEN:
-                queens += 1
-            elif pt in (BISHOP, KNIGHT):
-                minors += 1
-    return queens == 0 or (queens == 2 and minors <= 1)
-
-
-@njit(nogil=True)
-def evaluate_board_numba(board):
-    total = 0
-    endgame = check_end_game_numba(board)
-    for x in range(8):
-        for y in range(8):
-            piece = board[x, y]
-            if piece == 0:
-                continue
-            value = evaluate_piece_numba(piece, x, y, endgame)
-            total += value if piece > 0 else -value
-    return total
-
-
-@njit(nogil=True)
+def _piece_square_table(endgame):
+    # Material plus piece-square value of every signed piece (index piece + 6)
+    # on every square, white positive. Plain lists: Board.push reads single
+    # entries from Python, where list indexing beats numpy scalar access.
+    table = [[0] * 64 for _ in range(13)]
+    for piece in range(-KING, KING + 1):
+        if piece == 0:
+            continue
+        for square in range(64):
+            value = int(evaluate_piece_numba(piece, square // 8, square % 8, endgame))
+            table[piece + 6][square] = value if piece > 0 else -value
+    return table
+
+
+# Tables behind the running Board scores, updated in push/pop
+PIECE_SQUARE_MG = _piece_square_table(False)
+PIECE_SQUARE_EG = _piece_square_table(True)
+
+# Game phase weight of each piece type, indexed by abs(piece): TOTAL_PHASE
+# with every knight, bishop, rook and queen on the board, 0 with only kings
+# and pawns left
+PHASE_WEIGHT = (0, 0, 1, 1, 2, 4, 0)
+TOTAL_PHASE = 24
+
+
+@njit(nogil=True, cache=True)
 def move_value_numba(board, from_x, from_y, to_x, to_y, promotion, turn, endgame):
     if promotion:
         return PIECE_VALUE[QUEEN] * turn
@@ -174,24 +168,39 @@ def move_value_numba(board, from_x, from_y, to_x, to_y, promotion, turn, endgame
     return (capture_value + position_score) * turn
 
 
+@njit(nogil=True, cache=True)
+def mvv_lva_numba(board, from_x, from_y, to_x, to_y):
+    return 10 * PIECE_VALUE[abs(board[to_x, to_y])] - PIECE_VALUE[abs(board[from_x, from_y])]
+
+
 # Python wrapper functions
-def evaluate_board(board: np.ndarray) -> int:
-    return evaluate_board_numba(board)
+def evaluate_board(board) -> int:
+    # Midgame and endgame scores blended by game phase, so the score moves
+    # smoothly as pieces come off instead of jumping at an endgame cutoff
+    mg, eg = board.scores
+    phase = min(board.phase, TOTAL_PHASE)
+    return (mg * phase + eg * (TOTAL_PHASE - phase)) // TOTAL_PHASE
 
 
-def move_value(board: np.ndarray, move, turn: int) -> float:
-    from_sq = (move.from_square[0] // 8, move.from_square[1] % 8)
-    to_sq = (move.to_square[0] // 8, move.to_square[1] % 8)
-    endgame = check_end_game_numba(board)
+def move_value(board, move, endgame: bool) -> float:
     return move_value_numba(
-        board,
-        from_sq[0], from_sq[1],
-        to_sq[0], to_sq[1],
-        move.promotion,
-        turn,
+        board._board,
+        move.from_square[0], move.from_square[1],
+        move.to_square[0], move.to_square[1],
+        move.promotion or 0,
+        board.turn,
         endgame
     )
 
 
-def check_end_game(board: np.ndarray) -> bool:
-    return check_end_game_numba(board)
\ No newline at end of file
+def mvv_lva(board, move) -> int:
+    """Most valuable victim, least valuable attacker ordering score for a capture."""
+    return mvv_lva_numba(board._board, move.from_square[0], move.from_square[1],
+                         move.to_square[0], move.to_square[1])
+
+
+def check_end_game(board) -> bool:
+    count = board.material_count
+    queens = count[QUEEN + 6] + count[-QUEEN + 6]
+    minors = count[BISHOP + 6] + count[-BISHOP + 6] + count[KNIGHT + 6] + count[-KNIGHT + 6]
+    return queens == 0 or (queens == 2 and minors <= 1)
\ No newline at end of file
@@ -0,0 +1,655 @@
+"""
+Search that runs entirely in nopython mode.
+
+The position is one int64 array: the squares 8 * x + y, the piece counts,
+the side to move, the Zobrist key, the running (midgame, endgame) scores,
+the game phase and both king squares. Moves are encoded ints (the
+movegeneration encoding) written to preallocated per-ply buffers, and
+make/unmake, move generation, ordering, quiescence and the principal
+variation search are all jitted. Python only copies a Board into the
+array, runs iterative deepening against the clock and turns the chosen
+move back into a Move:
+
+    python main.py --search=jit
+"""
+import random
+import time
+
+import numpy as np
+from numba import njit, objmode
+
+import chess
+import movegeneration
+from chess import WHITE, PAWN, KNIGHT, BISHOP, ROOK, QUEEN, KING, ZOBRIST_PIECES, ZOBRIST_TURN, \
+    KNIGHT_TARGETS, KNIGHT_TARGET_COUNT, KING_TARGETS, KING_TARGET_COUNT, PAWN_TARGETS, PAWN_TARGET_COUNT, \
+    RAYS, RAY_LENGTH
+from evaluate import PIECE_VALUE, PIECE_SQUARE_MG, PIECE_SQUARE_EG, PHASE_WEIGHT, TOTAL_PHASE
+from movegeneration import MATE_SCORE, MATE_THRESHOLD, ASPIRATION_WINDOW, DELTA_MARGIN, MAX_PLY, \
+    CAPTURE_BONUS, KILLER_BONUS, EXACT, LOWER_BOUND, UPPER_BOUND, NO_MOVE, tt_probe, tt_store, record_cutoff, \
+    transposition_table, killer_moves, history_table, age_move_ordering, clear_transposition_table, \
+    clear_move_ordering, debug_info, log_info, uci_info, extract_pv, next_iteration_fits, WARM_UP_FEN
+
+# Layout of the position array after the 64 squares
+COUNTS = 64  # 13 piece counts, index COUNTS + piece + 6
+TURN = 77
+KEY = 78
+SCORE_MG = 79
+SCORE_EG = 80
+PHASE = 81
+KING_SQUARE = 82  # white king at KING_SQUARE, black at KING_SQUARE + 1, -1 if missing
+POSITION_SIZE = 84
+
+# Undo record per ply: captured piece and the key, scores and phase before the move
+UNDO_CAPTURED, UNDO_KEY, UNDO_MG, UNDO_EG, UNDO_PHASE = range(5)
+
+# Search statistics shared with Python: node count, the stop flag and the
+# deepest ply of the current iteration (UCI seldepth)
+NODES, STOP, SELDEPTH = range(3)
+
+SEARCH_PLY = 128
+MAX_MOVES = 256
+INFINITY = 2 * MATE_SCORE
+# The clock is read through object mode once per this many nodes
+CLOCK_INTERVAL = 2048
+# The warm-up search goes this deep, which passes CLOCK_INTERVAL nodes in
+# the warm-up position, and is given this many seconds, which it never needs
+WARM_UP_DEPTH = 4
+WARM_UP_TIME = 60.0
+
+# Tables as arrays, read as constants by the jitted functions. The compiled
+# code is cached on disk keyed on this file alone, so clear __pycache__
+# after changing the tables in chess.py or evaluate.py.
+ZOBRIST_PIECE_KEYS = np.array(ZOBRIST_PIECES, dtype=np.int64)
+PSQ_MG = np.array(PIECE_SQUARE_MG, dtype=np.int64)
+PSQ_EG = np.array(PIECE_SQUARE_EG, dtype=np.int64)
+PHASE_WEIGHTS = np.array(PHASE_WEIGHT, dtype=np.int64)
+
+# Preallocated search buffers: the moves generated at each ply with their
+# ordering scores, the undo records, the root moves with the scores of the
+# last iteration and the statistics
+move_buffer = np.zeros((SEARCH_PLY, MAX_MOVES), dtype=np.int64)
+score_buffer = np.zeros((SEARCH_PLY, MAX_MOVES), dtype=np.int64)
+undo_buffer = np.zeros((SEARCH_PLY, 5), dtype=np.int64)
+root_moves = np.zeros(MAX_MOVES, dtype=np.int64)
+root_values = np.zeros(MAX_MOVES, dtype=np.int64)
+search_stats = np.zeros(3, dtype=np.int64)
+
+
+@njit(nogil=True, cache=True)
+def square_attacked(pos, square, enemy_color):
+    # Pawns stand where a pawn of the other color on the square would capture
+    side = 1 if enemy_color == WHITE else 0
+    for i in range(PAWN_TARGET_COUNT[side, square]):
+        if pos[PAWN_TARGETS[side, square, i]] == PAWN * enemy_color:
+            return True
+
+    for i in range(KNIGHT_TARGET_COUNT[square]):
+        if pos[KNIGHT_TARGETS[square, i]] == KNIGHT * enemy_color:
+            return True
+
+    for i in range(KING_TARGET_COUNT[square]):
+        if pos[KING_TARGETS[square, i]] == KING * enemy_color:
+            return True
+
+    # Sliders: the first piece on each ray decides
+    for d in range(8):
+        slider = BISHOP if d < 4 else ROOK
+        for i in range(RAY_LENGTH[square, d]):
+            piece = pos[RAYS[square, d, i]]
+            if piece != 0:
+                if piece == slider * enemy_color or piece == QUEEN * enemy_color:
+                    return True
+                break
+
+    return False
+
+
+@njit(nogil=True, cache=True)
+def in_check(pos, color):
+    king = pos[KING_SQUARE + (0 if color == WHITE else 1)]
+    return king >= 0 and square_attacked(pos, king, -color)
+
+
+@njit(nogil=True, cache=True)
+def add_move(pos, moves, count, from_square, to_square, promotion, color):
+    """Append the move if it does not leave the own king attacked, return the new count."""
+    king = pos[KING_SQUARE + (0 if color == WHITE else 1)]
+    if king < 0:
+        return count
+    if king == from_square:
+        king = to_square
+    moving = pos[from_square]
+    captured = pos[to_square]
+    pos[to_square] = moving
+    pos[from_square] = 0
+    safe = not square_attacked(pos, king, -color)
+    pos[from_square] = moving
+    pos[to_square] = captured
+    if safe:
+        moves[count] = from_square | (to_square << 6) | (promotion << 12)
+        count += 1
+    return count
+
+
+@njit(nogil=True, cache=True)
+def add_pawn_move(pos, moves, count, from_square, to_square, color):
+    if to_square >> 3 == (0 if color == WHITE else 7):
+        for promotion in (QUEEN, ROOK, BISHOP, KNIGHT):
+            count = add_move(pos, moves, count, from_square, to_square, promotion, color)
+        return count
+    return add_move(pos, moves, count, from_square, to_square, 0, color)
+
+
+@njit(nogil=True, cache=True)
+def add_leaper_moves(pos, moves, count, square, color, targets, target_count, captures_only):
+    for i in range(target_count[square]):
+        target = targets[square, i]
+        piece = pos[target] * color
+        if piece < 0 or (piece == 0 and not captures_only):
+            count = add_move(pos, moves, count, square, target, 0, color)
+    return count
+
+
+@njit(nogil=True, cache=True)
+def generate_moves(pos, moves, captures_only):
+    """
+    Write the legal moves of the side to move to moves and return their
+    number. With captures_only only moves onto an enemy piece are kept.
+    """
+    color = pos[TURN]
+    side = 0 if color == WHITE else 1
+    start_row = 6 if color == WHITE else 1
+    count = 0
+    for square in range(64):
+        piece = pos[square] * color
+        if piece <= 0:
+            continue
+        if piece == PAWN:
+            ahead = square - 8 * color
+            if not captures_only and 0 <= ahead < 64 and pos[ahead] == 0:
+                count = add_pawn_move(pos, moves, count, square, ahead, color)
+                if square >> 3 == start_row and pos[ahead - 8 * color] == 0:
+                    count = add_move(pos, moves, count, square, ahead - 8 * color, 0, color)
+            for i in range(PAWN_TARGET_COUNT[side, square]):
+                target = PAWN_TARGETS[side, square, i]
+                if pos[target] * color < 0:
+                    count = add_pawn_move(pos, moves, count, square, target, color)
+        elif piece == KNIGHT:
+            count = add_leaper_moves(pos, moves, count, square, color, KNIGHT_TARGETS, KNIGHT_TARGET_COUNT,
+                                     captures_only)
+        elif piece == KING:
+            count = add_leaper_moves(pos, moves, count, square, color, KING_TARGETS, KING_TARGET_COUNT,
+                                     captures_only)
+        else:
+            # Bishops use the diagonal rays 0-3, rooks the straight rays 4-7, queens all
+            first = 4 if piece == ROOK else 0
+            last = 4 if piece == BISHOP else 8
+            for d in range(first, last):
+                for i in range(RAY_LENGTH[square, d]):
+                    target = RAYS[square, d, i]
+                    other = pos[target] * color
+                    if other > 0:
+                        break
+                    if other < 0 or not captures_only:
+                        count = add_move(pos, moves, count, square, target, 0, color)
+                    if other < 0:
+                        break
+    return count
+
+
+@njit(nogil=True, cache=True)
+def make_move(pos, move, undo):
+    """Play an encoded move, saving what unmake_move needs in undo."""
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    promotion = move >> 12
+    color = pos[TURN]
+    piece = pos[from_square]
+    captured = pos[to_square]
+    undo[UNDO_CAPTURED] = captured
+    undo[UNDO_KEY] = pos[KEY]
+    undo[UNDO_MG] = pos[SCORE_MG]
+    undo[UNDO_EG] = pos[SCORE_EG]
+    undo[UNDO_PHASE] = pos[PHASE]
+
+    key = pos[KEY] ^ ZOBRIST_TURN ^ ZOBRIST_PIECE_KEYS[piece + 6, from_square]
+    mg = pos[SCORE_MG] - PSQ_MG[piece + 6, from_square]
+    eg = pos[SCORE_EG] - PSQ_EG[piece + 6, from_square]
+    if captured != 0:
+        key ^= ZOBRIST_PIECE_KEYS[captured + 6, to_square]
+        mg -= PSQ_MG[captured + 6, to_square]
+        eg -= PSQ_EG[captured + 6, to_square]
+        pos[COUNTS + captured + 6] -= 1
+        pos[PHASE] -= PHASE_WEIGHTS[abs(captured)]
+        if abs(captured) == KING:
+            pos[KING_SQUARE + (1 if color == WHITE else 0)] = -1
+    placed = piece
+    if promotion != 0:
+        placed = promotion * color
+        pos[COUNTS + piece + 6] -= 1
+        pos[COUNTS + placed + 6] += 1
+        pos[PHASE] += PHASE_WEIGHTS[promotion]
+    elif abs(piece) == KING:
+        pos[KING_SQUARE + (0 if color == WHITE else 1)] = to_square
+
+    pos[to_square] = placed
+    pos[from_square] = 0
+    pos[KEY] = key ^ ZOBRIST_PIECE_KEYS[placed + 6, to_square]
+    pos[SCORE_MG] = mg + PSQ_MG[placed + 6, to_square]
+    pos[SCORE_EG] = eg + PSQ_EG[placed + 6, to_square]
+    pos[TURN] = -color
+
+
+@njit(nogil=True, cache=True)
+def unmake_move(pos, move, undo):
+    """Take back an encoded move played by make_move with the same undo record."""
+    from_square = move & 63
+    to_square = (move >> 6) & 63
+    promotion = move >> 12
+    color = -pos[TURN]
+    placed = pos[to_square]
+    captured = undo[UNDO_CAPTURED]
+    piece = placed
+    if promotion != 0:
+        piece = PAWN * color
+        pos[COUNTS + placed + 6] -= 1
+        pos[COUNTS + piece + 6] += 1
+    elif abs(piece) == KING:
+        pos[KING_SQUARE + (0 if color == WHITE else 1)] = from_square
+    if captured != 0:
+        pos[COUNTS + captured + 6] += 1
+        if abs(captured) == KING:
+            pos[KING_SQUARE + (1 if color == WHITE else 0)] = to_square
+
+    pos[from_square] = piece
+    pos[to_square] = captured
+    pos[KEY] = undo[UNDO_KEY]
+    pos[SCORE_MG] = undo[UNDO_MG]
+    pos[SCORE_EG] = undo[UNDO_EG]
+    pos[PHASE] = undo[UNDO_PHASE]
+    pos[TURN] = color
+
+
+@njit(nogil=True, cache=True)
+def evaluate(pos):
+    """Tapered evaluation from white's point of view, as evaluate.evaluate_board."""
+    phase = min(pos[PHASE], TOTAL_PHASE)
+    return (pos[SCORE_MG] * phase + pos[SCORE_EG] * (TOTAL_PHASE - phase)) // TOTAL_PHASE
+
+
+@njit(nogil=True, cache=True)
+def is_end_game(pos):
+    queens = pos[COUNTS + QUEEN + 6] + pos[COUNTS - QUEEN + 6]
+    minors = pos[COUNTS + BISHOP + 6] + pos[COUNTS - BISHOP + 6] + \
+        pos[COUNTS + KNIGHT + 6] + pos[COUNTS - KNIGHT + 6]
+    return queens == 0 or (queens == 2 and minors <= 1)
+
+
+@njit(nogil=True, cache=True)
+def is_insufficient_material(pos):
+    """Only kings and at most one knight or bishop left, as Board.can_claim_draw."""
+    for piece in (PAWN, ROOK, QUEEN):
+        if pos[COUNTS + piece + 6] + pos[COUNTS - piece + 6] > 0:
+            return False
+    return pos[COUNTS + BISHOP + 6] + pos[COUNTS - BISHOP + 6] + \
+        pos[COUNTS + KNIGHT + 6] + pos[COUNTS - KNIGHT + 6] <= 1
+
+
+@njit(nogil=True, cache=True)
+def score_moves(pos, moves, scores, count, tt_move, killer, second_killer, history):
+    """
+    Ordering scores as movegeneration.order_moves: the table move first,
+    captures and promotions by value, the killers, then quiet moves by
+    history, each plus the piece-square gain of the move.
+    """
+    color = pos[TURN]
+    side = 0 if color == WHITE else 1
+    psq = PSQ_EG if is_end_game(pos) else PSQ_MG
+    for i in range(count):
+        move = moves[i]
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        piece = pos[from_square]
+        victim = pos[to_square]
+        if move >> 12:
+            score = PIECE_VALUE[QUEEN]
+        else:
+            score = PIECE_VALUE[abs(victim)] + color * (psq[piece + 6, to_square] - psq[piece + 6, from_square])
+        if move == tt_move:
+            score = CAPTURE_BONUS << 1
+        elif move >> 12 or victim != 0:
+            score += CAPTURE_BONUS
+        elif move == killer:
+            score += KILLER_BONUS + 1
+        elif move == second_killer:
+            score += KILLER_BONUS
+        else:
+            score += history[side, from_square, to_square]
+        scores[i] = score
+
+
+@njit(nogil=True, cache=True)
+def pick_move(moves, scores, start, count):
+    """Swap the best scored move of moves[start:count] to start and return it."""
+    best = start
+    for i in range(start + 1, count):
+        if scores[i] > scores[best]:
+            best = i
+    move = moves[best]
+    moves[best] = moves[start]
+    moves[start] = move
+    score = scores[best]
+    scores[best] = scores[start]
+    scores[start] = score
+    return move
+
+
+@njit(nogil=True, cache=True)
+def bound_flag(value, alpha, beta):
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
+
+
+@njit(cache=True)
+def tick(stats, deadline):
+    """Count a node and return whether the search has to stop."""
+    stats[NODES] += 1
+    if stats[STOP] == 0 and stats[NODES] % CLOCK_INTERVAL == 0:
+        with objmode(now="float64"):
+            now = time.perf_counter()
+        if now >= deadline:
+            stats[STOP] = 1
+    return stats[STOP] != 0
+
+
+@njit(nogil=True, cache=True)
+def quiescence(pos, alpha, beta, ply, moves, scores, undo, stats, deadline):
+    """
+    Capture-only search at the horizon with stand-pat on the static
+    evaluation, captures in MVV-LVA order with delta pruning.
+    """
+    if tick(stats, deadline):
+        return 0
+    if ply > stats[SELDEPTH]:
+        stats[SELDEPTH] = ply
+
+    stand_pat = pos[TURN] * evaluate(pos)
+    if stand_pat >= beta:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+    if ply >= SEARCH_PLY:
+        return alpha
+
+    count = generate_moves(pos, moves[ply], True)
+    for i in range(count):
+        move = moves[ply, i]
+        scores[ply, i] = 10 * PIECE_VALUE[abs(pos[(move >> 6) & 63])] - PIECE_VALUE[abs(pos[move & 63])]
+
+    for i in range(count):
+        move = pick_move(moves[ply], scores[ply], i, count)
+        victim = pos[(move >> 6) & 63]
+        if stand_pat + PIECE_VALUE[abs(victim)] + DELTA_MARGIN <= alpha:
+            continue
+        make_move(pos, move, undo[ply])
+        value = -quiescence(pos, -beta, -alpha, ply + 1, moves, scores, undo, stats, deadline)
+        unmake_move(pos, move, undo[ply])
+        if value >= beta:
+            return value
+        alpha = max(alpha, value)
+    return alpha
+
+
+@njit(nogil=True, cache=True)
+def negamax(pos, depth, alpha, beta, ply, moves, scores, undo, table, killers, history, generation,
+            stats, deadline):
+    """
+    Principal variation search as movegeneration.negamax, on the position
+    array. The transposition table move is tried first; it also stands in
+    for the principal variation of the previous iteration.
+    """
+    if tick(stats, deadline):
+        return 0
+    if ply >= SEARCH_PLY:
+        return pos[TURN] * evaluate(pos)
+
+    count = generate_moves(pos, moves[ply], False)
+    if count == 0:
+        return -MATE_SCORE if in_check(pos, pos[TURN]) else 0
+    if is_insufficient_material(pos):
+        return 0
+
+    if depth == 0:
+        return quiescence(pos, alpha, beta, ply, moves, scores, undo, stats, deadline)
+
+    key = pos[KEY]
+    found, tt_depth, tt_flag, tt_score, tt_move = tt_probe(table, key)
+    if found and tt_depth >= depth:
+        if tt_flag == EXACT:
+            return tt_score
+        if tt_flag == LOWER_BOUND:
+            alpha = max(alpha, tt_score)
+        else:
+            beta = min(beta, tt_score)
+        if alpha >= beta:
+            return tt_score
+    alpha_orig = alpha
+    beta_orig = beta
+
+    row = min(ply, killers.shape[0] - 1)
+    score_moves(pos, moves[ply], scores[ply], count, tt_move, killers[row, 0], killers[row, 1], history)
+    best_value = -INFINITY
+    best_move = moves[ply, 0]
+    for i in range(count):
+        move = pick_move(moves[ply], scores[ply], i, count)
+        make_move(pos, move, undo[ply])
+        if i == 0:
+            value = -negamax(pos, depth - 1, -beta, -alpha, ply + 1, moves, scores, undo, table, killers,
+                             history, generation, stats, deadline)
+        else:
+            value = -negamax(pos, depth - 1, -alpha - 1, -alpha, ply + 1, moves, scores, undo, table, killers,
+                             history, generation, stats, deadline)
+            if alpha < value < beta:
+                value = -negamax(pos, depth - 1, -beta, -alpha, ply + 1, moves, scores, undo, table, killers,
+                                 history, generation, stats, deadline)
+        unmake_move(pos, move, undo[ply])
+        if value > best_value:
+            best_value = value
+            best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            if move >> 12 == 0 and undo[ply, UNDO_CAPTURED] == 0:
+                record_cutoff(killers, history, ply, 0 if pos[TURN] == WHITE else 1, move, depth)
+            break
+
+    # Scores of an interrupted search are not trustworthy, keep them out of the table
+    if stats[STOP] == 0:
+        tt_store(table, key, depth, bound_flag(best_value, alpha_orig, beta_orig), best_value, best_move,
+                 generation)
+    return best_value
+
+
+@njit(nogil=True, cache=True)
+def order_root_moves(pos, moves, values, table, killers, history):
+    """Generate the root moves into moves with their heuristic scores in values, return the count."""
+    count = generate_moves(pos, moves, False)
+    tt_move = tt_probe(table, pos[KEY])[4]
+    score_moves(pos, moves, values, count, tt_move, killers[0, 0], killers[0, 1], history)
+    return count
+
+
+@njit(nogil=True, cache=True)
+def search_root(pos, depth, alpha, beta, root, values, count, moves, scores, undo, table, killers, history,
+                generation, stats, deadline):
+    """
+    Principal variation search at the root within (alpha, beta). The root
+    moves are tried in order of values, the scores of the previous
+    iteration, which are refilled with this iteration's scores. Returns
+    the best move and its score, or NO_MOVE when the clock ran out.
+    """
+    # Stable insertion sort: best first, ties keep their order
+    for i in range(1, count):
+        move = root[i]
+        value = values[i]
+        j = i - 1
+        while j >= 0 and values[j] < value:
+            root[j + 1] = root[j]
+            values[j + 1] = values[j]
+            j -= 1
+        root[j + 1] = move
+        values[j + 1] = value
+
+    # Typed int64 rather than a literal so negamax compiles for one signature
+    ply = np.int64(1)
+    alpha_orig = alpha
+    best_value = -INFINITY
+    best_move = NO_MOVE
+    for i in range(count):
+        move = root[i]
+        make_move(pos, move, undo[0])
+        if best_move == NO_MOVE:
+            value = -negamax(pos, depth - 1, -beta, -alpha, ply, moves, scores, undo, table, killers, history,
+                             generation, stats, deadline)
+        else:
+            value = -negamax(pos, depth - 1, -alpha - 1, -alpha, ply, moves, scores, undo, table, killers, history,
+                             generation, stats, deadline)
+            if alpha < value < beta:
+                value = -negamax(pos, depth - 1, -beta, -alpha, ply, moves, scores, undo, table, killers, history,
+                                 generation, stats, deadline)
+        unmake_move(pos, move, undo[0])
+        if stats[STOP] != 0:
+            return NO_MOVE, best_value
+        values[i] = value
+
+        if value > best_value:
+            best_value = value
+            best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
+
+    tt_store(table, pos[KEY], depth, bound_flag(best_value, alpha_orig, beta), best_value, best_move,
+             generation)
+    return best_move, best_value
+
+
+def load_position(board: chess.Board) -> np.ndarray:
+    """Copy a Board into a position array."""
+    pos = np.zeros(POSITION_SIZE, dtype=np.int64)
+    pos[:64] = board._board.ravel()
+    pos[COUNTS:COUNTS + 13] = board.material_count
+    pos[TURN] = board.turn
+    pos[KEY] = board.zobrist_hash()
+    pos[SCORE_MG], pos[SCORE_EG] = board.scores
+    pos[PHASE] = board.phase
+    for side, color in enumerate((chess.WHITE, chess.BLACK)):
+        king = board._king_squares[color]
+        pos[KING_SQUARE + side] = -1 if king is None else 8 * king[0] + king[1]
+    return pos
+
+
+def decode_move(move: int) -> chess.Move:
+    decoded = chess.Move()
+    decoded.from_square = divmod(move & 63, 8)
+    decoded.to_square = divmod((move >> 6) & 63, 8)
+    decoded.promotion = (move >> 12) or None
+    return decoded
+
+
+def warm_up() -> None:
+    """
+    Compile the jitted search, or load it from the on-disk cache, with a
+    next_move search under a deadline that runs through the clock check in
+    tick, followed by the principal variation walk and the legality test
+    main.py puts its move through, so that nothing on the way from go to
+    bestmove compiles during the first move. Leaves the search tables empty.
+    """
+    board = chess.Board()
+    board.set_fen(WARM_UP_FEN)
+    move = next_move(board, WARM_UP_TIME, "warm-up", debug=False, max_depth=WARM_UP_DEPTH)
+    extract_pv(board, WARM_UP_DEPTH)
+    board._is_move_legal(move, board.turn)
+    clear_transposition_table()
+    clear_move_ordering()
+
+
+def next_move(
+        board: chess.Board,
+        time_limit: float,
+        name: str,
+        debug=True,
+        max_depth: int = MAX_PLY,
+        info=False,
+        soft_limit: float = float("inf")
+) -> chess.Move:
+    """
+    Iterative deepening with aspiration windows as movegeneration.next_move,
+    each iteration one call into the jitted search_root. The search checks
+    the clock itself and gives up an iteration when time runs out, so
+    only completed iterations choose the move, and only they print a UCI
+    info line when info is set. No iteration starts that is not expected
+    to finish within soft_limit.
+    """
+    debug_info.clear()
+    debug_info["nodes"] = 0
+    debug_info["engine"] = name
+    movegeneration.tt_generation += 1
+    generation = movegeneration.tt_generation
+    age_move_ordering()
+    search_stats[:] = 0
+    pos = load_position(board)
+    t0 = time.perf_counter()
+    deadline = t0 + time_limit
+    soft_limit = min(soft_limit, time_limit)
+    soft_deadline = t0 + soft_limit
+    count = order_root_moves(pos, root_moves, root_values, transposition_table, killer_moves, history_table)
+    best_move = NO_MOVE
+    score = None
+    completed = 0
+    depth = 1
+    previous_time = 0.0
+
+    while count and time.perf_counter() < soft_deadline and depth <= min(max_depth, MAX_PLY):
+        if score is None or abs(score) >= MATE_THRESHOLD:
+            alpha, beta = -INFINITY, INFINITY
+        else:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        search_stats[SELDEPTH] = 0
+        iteration_start = time.perf_counter()
+
+        while True:
+            current_move, value = search_root(pos, depth, alpha, beta, root_moves, root_values, count,
+                                              move_buffer, score_buffer, undo_buffer, transposition_table,
+                                              killer_moves, history_table, generation, search_stats, deadline)
+            if search_stats[STOP]:
+                break
+            if value <= alpha:
+                alpha = -INFINITY
+            elif value >= beta:
+                beta = INFINITY
+            else:
+                break
+
+        if current_move != NO_MOVE:
+            best_move = current_move
+            score = value
+            completed = depth
+            if info:
+                print(uci_info(depth, int(search_stats[SELDEPTH]), int(search_stats[NODES]),
+                               time.perf_counter() - t0, score, extract_pv(board, depth)), flush=True)
+            iteration_time = time.perf_counter() - iteration_start
+            if not next_iteration_fits(time.perf_counter() - t0, iteration_time, previous_time, soft_limit):
+                break
+            previous_time = iteration_time
+        depth += 1
+
+    debug_info["nodes"] = int(search_stats[NODES])
+    debug_info["depth"] = completed
+    debug_info["time"] = time.perf_counter() - t0
+    if debug:
+        log_info(f"Final stats: {debug_info}")
+    if best_move != NO_MOVE:
+        return decode_move(best_move)
+    return random.choice(list(board.legal_moves()))
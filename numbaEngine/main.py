@@ -1,27 +1,102 @@
 import sys
+import time
 import argparse
+
+# Before the Numba modules are imported, so the startup report includes them
+STARTED = time.perf_counter()
+
 import chess
-from movegeneration import next_move
+import movegeneration
+from movegeneration import clear_transposition_table, clear_move_ordering, debug_info
+import jitsearch
 
 parser = argparse.ArgumentParser()
 
+# Positions searched by the bench command, each the end of a game from one of
+# the Openings/ books
+BENCH_FENS = [
+    "r2qkb1r/1p1n1ppp/p2pbn2/4p3/4P3/1NN1BP2/PPP3PP/R2QKB1R w KQkq - 0 1",
+    "r2qkbnr/pp1n1ppp/2p1p3/3pPb2/3P4/2P2N2/PP2BPPP/RNBQK2R b KQkq - 0 1",
+    "r1bq1rk1/ppp2ppp/2np1n2/2b1p3/2B1P3/2PP1N2/PP3PPP/RNBQ1RK1 w - - 0 1",
+    "r1bq1rk1/pppp1ppp/2n2n2/4p3/1bP5/2N2NP1/PP1PPPBP/R1BQK2R w KQ - 0 1",
+    "r1bk1b1r/ppp2ppp/2p5/4Pn2/8/5N2/PPP2PPP/RNB2RK1 w - - 0 1",
+    "r1bqkb1r/pppn1ppp/8/3pN3/3Pn3/3B4/PPP2PPP/RNBQK2R w KQkq - 0 1",
+    "r1bqkb1r/1p1n1pp1/p2p1n1p/4p3/2B1P3/2NQBN2/PPP2PPP/R3K2R b KQkq - 0 1",
+    "rnbq1rk1/ppp1bppp/4pn2/3p4/2PP1B2/2N1P3/PP3PPP/R2QKBNR w KQ - 0 1",
+    "rnbqk2r/ppp2pp1/5n1p/3p2B1/1b1P4/2N2N2/PP2PPPP/R2QKB1R w KQkq - 0 1",
+    "rnb1k1nr/pp2ppb1/3p2pp/q1pP4/2P4B/2N5/PP2PPPP/R2QKBNR w KQkq - 0 1",
+]
+BENCH_DEPTH = 4
+
+# Clock handling for go wtime/btime/winc/binc/movestogo: without movestogo
+# the remaining time is shared out as if this many moves were left
+MOVES_TO_GO = 30
+# Seconds kept back on every move for the GUI and for starting and stopping the search
+MOVE_OVERHEAD = 0.05
+# The hard limit is at most this many soft limits and this share of the clock
+HARD_LIMIT_FACTOR = 3
+HARD_LIMIT_SHARE = 0.5
+# Time any search gets, so that there is always a move to play
+MIN_SEARCH_TIME = 0.01
+
 
 def get_time_limit(args):
     return max([1, int(args.time)])
 
 
+def parse_go(tokens) -> dict:
+    """The clock arguments of a go command by name, times in seconds."""
+    go = {}
+    for name, value in zip(tokens[1:], tokens[2:]):
+        if name in ("wtime", "btime", "winc", "binc", "movetime"):
+            go[name] = int(value) / 1000
+        elif name == "movestogo":
+            go[name] = int(value)
+    return go
+
+
+def time_budget(go: dict, turn: int, fallback: float):
+    """
+    Soft and hard time limits in seconds for the side to move. The soft
+    limit is this move's share of the remaining time plus most of the
+    increment, and no new iteration starts after it; the hard limit, where
+    a running iteration is abandoned, allows a few soft limits but never
+    more than half the clock. movetime is used as it is, and without clock
+    fields both limits are the fallback --time.
+    """
+    if "movetime" in go:
+        limit = max(go["movetime"] - MOVE_OVERHEAD, MIN_SEARCH_TIME)
+        return limit, limit
+    remaining = go.get("wtime" if turn > 0 else "btime")
+    if remaining is None:
+        return fallback, fallback
+    increment = go.get("winc" if turn > 0 else "binc", 0)
+    available = max(remaining - MOVE_OVERHEAD, 0)
+    soft = available / max(go.get("movestogo", MOVES_TO_GO), 1) + 0.75 * increment
+    hard = max(min(HARD_LIMIT_FACTOR * soft, HARD_LIMIT_SHARE * available), MIN_SEARCH_TIME)
+    return min(soft, hard), hard
+
+
 def get_name(args) -> str:
     return args.name
 
 
+def get_search(args):
+    return jitsearch if args.search == "jit" else movegeneration
+
+
 class uci:
     def __init__(self):
         parser.add_argument("--name", default="default", help="provide a name (default: default)")
         parser.add_argument("--time", default=1., help="provide an integer (default: 3s)")
+        parser.add_argument("--search", default="python", choices=["python", "jit"],
+                            help="python: search over Board, jit: fully jitted search (default: python)")
 
         self.board = chess.Board()
         self.time_limit = get_time_limit(parser.parse_args())
         self.name = get_name(parser.parse_args())
+        self.search = get_search(parser.parse_args())
+        self.warmed_up = False
         self.check_counts = {"white": 0, "black": 0}  # Track checks for 3check and 5check
         self.variant = "chess"  # default variant
 
@@ -46,12 +121,15 @@ class uci:
             return
 
         if msg == "isready":
+            self.warm_up()
             print("readyok")
             return
 
         if msg == "ucinewgame":
             self.board.reset()
             self.check_counts = {"white": 0, "black": 0}  # Reset check counts
+            clear_transposition_table()
+            clear_move_ordering()
             return
 
         if msg.startswith("position"):
@@ -76,8 +154,10 @@ class uci:
                 self.board.push_uci(move)
 
         if msg[0:2] == "go":
+            soft_limit, time_limit = time_budget(parse_go(tokens), self.board.turn, self.time_limit)
+            self.warm_up()
             old_board = self.board._board.copy()
-            _move = next_move(self.board, self.time_limit, self.name)
+            _move = self.search.next_move(self.board, time_limit, self.name, info=True, soft_limit=soft_limit)
             self.board._board = old_board
             if not self.board._is_move_legal(_move, self.board.turn):
                 print(f"bestmove 0000")
@@ -85,6 +165,11 @@ class uci:
                 print(f"bestmove {_move}")
             return
 
+        if tokens and tokens[0] == "bench":
+            self.warm_up()
+            self.bench(int(tokens[1]) if len(tokens) > 1 else BENCH_DEPTH)
+            return
+
         if msg.startswith("setoption"):
             # Handle UCI_Variant option for 3check and 5check
             if "UCI_Variant" in msg:
@@ -99,6 +184,41 @@ class uci:
                     print("info string Standard chess variant selected")
             return
 
+    def bench(self, depth: int):
+        """
+        Search every BENCH_FENS position to a fixed depth, starting from empty
+        tables each time, and print the total nodes, time and nodes per
+        second. The node total changes only when the search does.
+        """
+        board = chess.Board()
+        nodes = 0
+        elapsed = 0.0
+        for fen in BENCH_FENS:
+            board.set_fen(fen)
+            clear_transposition_table()
+            clear_move_ordering()
+            self.search.next_move(board, float("inf"), self.name, debug=False, max_depth=depth)
+            nodes += debug_info["nodes"]
+            elapsed += debug_info["time"]
+        clear_transposition_table()
+        clear_move_ordering()
+        print(f"Total time (ms) : {elapsed * 1000:.0f}")
+        print(f"Nodes searched  : {nodes}")
+        print(f"Nodes/second    : {nodes / elapsed:.0f}")
+
+    def warm_up(self):
+        """
+        Compile the jitted search before the first move, or load it from the
+        cache, and report the time since startup and the time it took.
+        """
+        if self.warmed_up:
+            return
+        start = time.perf_counter()
+        self.search.warm_up()
+        self.warmed_up = True
+        now = time.perf_counter()
+        print(f"info string startup {now - STARTED:.2f}s, jit warm-up {now - start:.2f}s")
+
 
 if __name__ == "__main__":
     uci()
\ No newline at end of file
@@ -1,41 +1,300 @@
-from typing import Dict, List, Any, Optional
+from typing import Dict, List, Any, Optional, Tuple
 import chess
 import time
-from evaluate import evaluate_board, move_value, check_end_game
+import numpy as np
+from numba import njit
+from evaluate import evaluate_board, move_value_numba, check_end_game, mvv_lva_numba, PIECE_VALUE
 import random
 
 debug_info: Dict[str, Any] = {"engine": "numba"}
+# Deepest ply the current iteration reached, quiescence included (UCI seldepth)
+seldepth = 0
 
 MATE_SCORE = 1000000000
 MATE_THRESHOLD = 999000000
 
+# Half width of the aspiration window around the previous iteration's score
+ASPIRATION_WINDOW = 50
+# Bounds on the effective branching factor used to predict the next
+# iteration's time: the ratio of two iteration times is noise while they
+# take microseconds
+MIN_BRANCHING_FACTOR = 2
+MAX_BRANCHING_FACTOR = 8
+# Slack for positional gains when pruning captures that cannot raise alpha
+DELTA_MARGIN = 200
+
+# Move ordering: captures and promotions, then killer moves, then quiet moves by history
+MAX_PLY = 64
+CAPTURE_BONUS = 1 << 30
+KILLER_BONUS = 1 << 29
+
+# Packed moves (see chess.generate_moves_numba) and their ordering scores for
+# every ply on the current search path, reused from node to node; quiescence
+# stands pat beyond MAX_SEARCH_PLY. The rows are taken once so that nodes do
+# not create array views either.
+MAX_SEARCH_PLY = 128
+move_stack = np.zeros((MAX_SEARCH_PLY, chess.MAX_MOVES), dtype=np.int64)
+score_stack = np.zeros((MAX_SEARCH_PLY, chess.MAX_MOVES), dtype=np.int64)
+move_buffers = list(move_stack)
+score_buffers = list(score_stack)
+
+# Transposition table: one int64 row per slot holding
+# (key, depth, flag, score, move, generation), indexed by the low key bits
+EXACT = 0
+LOWER_BOUND = 1
+UPPER_BOUND = 2
+TT_SIZE = 1 << 20
+TT_KEY, TT_DEPTH, TT_FLAG, TT_SCORE, TT_MOVE, TT_GENERATION = range(6)
+NO_MOVE = -1
+
+transposition_table = np.zeros((TT_SIZE, 6), dtype=np.int64)
+transposition_table[:, TT_DEPTH] = -1
+tt_generation = 0
+
+
+@njit(nogil=True, cache=True)
+def tt_probe(table, key):
+    entry = table[key & (table.shape[0] - 1)]
+    if entry[TT_DEPTH] >= 0 and entry[TT_KEY] == key:
+        return True, entry[TT_DEPTH], entry[TT_FLAG], entry[TT_SCORE], entry[TT_MOVE]
+    return False, 0, 0, 0, NO_MOVE
+
+
+@njit(nogil=True, cache=True)
+def tt_store(table, key, depth, flag, score, move, generation):
+    entry = table[key & (table.shape[0] - 1)]
+    # Keep a deeper entry of another position from the current search
+    if entry[TT_DEPTH] >= 0 and entry[TT_KEY] != key and \
+            entry[TT_GENERATION] == generation and entry[TT_DEPTH] > depth:
+        return
+    entry[TT_KEY] = key
+    entry[TT_DEPTH] = depth
+    entry[TT_FLAG] = flag
+    entry[TT_SCORE] = score
+    entry[TT_MOVE] = move
+    entry[TT_GENERATION] = generation
+
+
+# Principal variation of the last completed iteration: encoded move keyed by
+# the Zobrist key of the position it is played from
+principal_variation: Dict[int, int] = {}
+
+# Two encoded quiet moves per ply that caused a beta cutoff, most recent first
+killer_moves = np.full((MAX_PLY, 2), NO_MOVE, dtype=np.int64)
+# Butterfly history: cutoff credit of quiet moves by side to move, from and to square
+history_table = np.zeros((2, 64, 64), dtype=np.int64)
+
+
+@njit(nogil=True, cache=True)
+def record_cutoff(killers, history, ply, side, move, depth):
+    """Credit an encoded quiet move that caused a beta cutoff."""
+    ply = min(ply, killers.shape[0] - 1)
+    if killers[ply, 0] != move:
+        killers[ply, 1] = killers[ply, 0]
+        killers[ply, 0] = move
+    history[side, move & 63, (move >> 6) & 63] += depth * depth
+
+
+@njit(nogil=True, cache=True)
+def score_moves(board, moves, scores, count, tt_move, killer_1, killer_2, history, side, turn, endgame):
+    """
+    Ordering scores, higher first for the side to move: the principal
+    variation or transposition table move, captures and promotions by
+    heuristic value, the killer moves, then quiet moves by history.
+    """
+    for i in range(count):
+        move = moves[i]
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        promotion = move >> 12
+        score = turn * move_value_numba(board, from_square >> 3, from_square & 7, to_square >> 3, to_square & 7,
+                                        promotion, turn, endgame)
+        if move == tt_move:
+            score = CAPTURE_BONUS << 1
+        elif promotion or board[to_square >> 3, to_square & 7] * turn < 0:
+            score += CAPTURE_BONUS
+        elif move == killer_1:
+            score += KILLER_BONUS + 1
+        elif move == killer_2:
+            score += KILLER_BONUS
+        else:
+            score += history[side, from_square, to_square]
+        scores[i] = score
+
+
+@njit(nogil=True, cache=True)
+def score_captures(board, moves, scores, count, turn):
+    """Keep only the captures among the first count moves, scored by MVV-LVA, and return their number."""
+    captures = 0
+    for i in range(count):
+        move = moves[i]
+        from_square = move & 63
+        to_square = (move >> 6) & 63
+        if board[to_square >> 3, to_square & 7] * turn < 0:
+            moves[captures] = move
+            scores[captures] = mvv_lva_numba(board, from_square >> 3, from_square & 7, to_square >> 3, to_square & 7)
+            captures += 1
+    return captures
+
+
+@njit(nogil=True, cache=True)
+def pick_move(moves, scores, i, count):
+    """
+    Selection step: bring the best scored of moves[i:count] to i and return
+    it. The moves passed over shift up one place, so equal scores keep their
+    generation order.
+    """
+    best = i
+    for j in range(i + 1, count):
+        if scores[j] > scores[best]:
+            best = j
+    move = moves[best]
+    score = scores[best]
+    for j in range(best, i, -1):
+        moves[j] = moves[j - 1]
+        scores[j] = scores[j - 1]
+    moves[i] = move
+    scores[i] = score
+    return move
+
+
+def clear_move_ordering() -> None:
+    """Forget killer moves and history, e.g. for a new game."""
+    killer_moves[:] = NO_MOVE
+    history_table[:] = 0
+
+
+def age_move_ordering() -> None:
+    """
+    Between searches the killers no longer match their plies, and history
+    is halved so that the new position's cutoffs soon dominate.
+    """
+    killer_moves[:] = NO_MOVE
+    history_table[:] //= 2
+
+
+def clear_transposition_table() -> None:
+    global tt_generation
+    transposition_table[:] = 0
+    transposition_table[:, TT_DEPTH] = -1
+    tt_generation = 0
+
+
+# Position searched once at startup: it has captures, checks and promotions
+# close to the root, so the short warm-up search reaches every jitted helper
+WARM_UP_FEN = "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1"
+WARM_UP_DEPTH = 2
+
+
+def warm_up() -> None:
+    """
+    Compile the jitted helpers, or load them from the on-disk cache, with
+    short next_move searches and the legality test main.py puts its move
+    through, so that the first move's time goes to searching and nothing
+    on the way from go to bestmove compiles then. The warm-up position is
+    all captures near the root, so the start position is searched as well
+    for a quiet move's cutoff to reach record_cutoff. Leaves the
+    transposition table and move ordering empty.
+    """
+    for fen in (WARM_UP_FEN, None):
+        board = chess.Board()
+        if fen:
+            board.set_fen(fen)
+        move = next_move(board, float("inf"), "warm-up", debug=False, max_depth=WARM_UP_DEPTH)
+        board._is_move_legal(move, board.turn)
+    clear_transposition_table()
+    clear_move_ordering()
+
+
+def next_iteration_fits(elapsed: float, iteration_time: float, previous_time: float, soft_limit: float) -> bool:
+    """
+    Whether the next iteration is expected to finish before soft_limit. It
+    should take as long as the last one times the effective branching
+    factor, the ratio of the last two iteration times kept between
+    MIN_BRANCHING_FACTOR and MAX_BRANCHING_FACTOR.
+    """
+    if previous_time <= 0:
+        return elapsed < soft_limit
+    branching_factor = min(max(iteration_time / previous_time, MIN_BRANCHING_FACTOR), MAX_BRANCHING_FACTOR)
+    return elapsed + iteration_time * branching_factor < soft_limit
+
 
 def next_move(
         board: chess.Board,
         time_limit: float,
         name: str,
-        debug=True
+        debug=True,
+        max_depth: int = MAX_SEARCH_PLY,
+        info=False,
+        soft_limit: float = float("inf")
 ) -> chess.Move:
     """
-    Uses iterative deepening to search deeper until time runs out.
+    Uses iterative deepening to search deeper until max_depth has been
+    searched or the next iteration is not expected to finish within
+    soft_limit seconds; a running iteration is abandoned at time_limit,
+    so at the soft limit the search stops with time to spare. Prints a UCI
+    info line after every completed iteration when info is set.
+    Each iteration starts from the previous one's principal variation,
+    orders the root moves by the scores they got there and searches in an
+    aspiration window around the previous score, widening the failing
+    side to infinity and searching again when the score falls outside.
+    Killer moves and history carry over between iterations and are aged
+    once per call.
     """
     debug_info.clear()
     debug_info["nodes"] = 0
     debug_info["engine"] = name
+    global tt_generation
+    tt_generation += 1
+    principal_variation.clear()
+    age_move_ordering()
+    root_scores: Dict[int, float] = {}
     t0 = time.perf_counter()
     best_move = None
+    score = None
     depth = 1
+    previous_time = 0.0
+
+    global seldepth
+    soft_limit = min(soft_limit, time_limit)
+    while depth <= max_depth and time.perf_counter() - t0 < soft_limit:
+        if score is None or abs(score) >= MATE_THRESHOLD:
+            alpha, beta = -float("inf"), float("inf")
+        else:
+            alpha, beta = score - ASPIRATION_WINDOW, score + ASPIRATION_WINDOW
+        seldepth = 0
+        iteration_start = time.perf_counter()
+
+        while True:
+            current_move, value = negamax_root(
+                depth,
+                board,
+                alpha,
+                beta,
+                t0,
+                time_limit,
+                root_scores
+            )
+            if time.perf_counter() - t0 >= time_limit:
+                break
+            if value <= alpha:
+                alpha = -float("inf")
+            elif value >= beta:
+                beta = float("inf")
+            else:
+                break
 
-    while time.perf_counter() - t0 < time_limit:
-        current_move = minimax_root(
-            depth,
-            board,
-            t0,
-            time_limit
-        )
         if current_move is not None:
             best_move = current_move
-            # Log progress for each completed depth
+            score = value
+            pv = extract_pv(board, depth)
+            update_principal_variation(board, pv)
+            if info:
+                print(uci_info(depth, seldepth, debug_info["nodes"], time.perf_counter() - t0, score, pv), flush=True)
+            iteration_time = time.perf_counter() - iteration_start
+            if not next_iteration_fits(time.perf_counter() - t0, iteration_time, previous_time, soft_limit):
+                break
+            previous_time = iteration_time
         depth += 1
 
     debug_info["time"] = time.perf_counter() - t0
@@ -44,104 +303,260 @@ def next_move(
     return best_move if best_move else random.choice(list(board.legal_moves()))
 
 
-def minimax_root(
+def uci_info(depth: int, sel_depth: int, nodes: int, elapsed: float, score: float, pv: List[chess.Move]) -> str:
+    """
+    UCI info line for a completed iteration. Mate scores do not carry the
+    distance to mate, so it is counted in moves along the principal variation.
+    """
+    if score >= MATE_THRESHOLD:
+        score_text = f"mate {(len(pv) + 1) // 2}"
+    elif score <= -MATE_THRESHOLD:
+        score_text = f"mate {-(len(pv) // 2)}"
+    else:
+        score_text = f"cp {int(score)}"
+    return (f"info depth {depth} seldepth {max(sel_depth, depth)} nodes {nodes} "
+            f"nps {int(nodes / max(elapsed, 1e-6))} time {int(elapsed * 1000)} "
+            f"score {score_text} pv {' '.join(str(move) for move in pv)}")
+
+
+def negamax_root(
         max_depth: int,
         board: chess.Board,
+        alpha: float,
+        beta: float,
         start_time: float,
         time_limit: float,
-) -> Optional[chess.Move]:
+        root_scores: Optional[Dict[int, float]] = None
+) -> Tuple[Optional[chess.Move], float]:
     """
-    Iterative deepening root with node counting.
+    Principal variation search at the root within (alpha, beta). Returns
+    the best move and its score from the side to move's point of view.
+    root_scores maps each encoded root move to its score from the previous
+    iteration; moves are tried best score first and the dict is refilled
+    with the scores of this iteration.
     """
-    best_value = -float("inf") if board.turn == chess.WHITE else float("inf")
+    alpha_orig = alpha
+    best_value = -float("inf")
     best_move = None
-    moves = order_moves(board)
+    key = board.zobrist_hash()
+    count = order_moves(board, move_buffers[0], score_buffers[0],
+                        principal_variation.get(key, tt_probe(transposition_table, key)[4]))
+    moves = [chess.decode_move(pick_move(move_buffers[0], score_buffers[0], i, count)) for i in range(count)]
+    if root_scores:
+        # Stable sort: moves without a previous score keep their heuristic order at the end
+        moves.sort(key=lambda m: -root_scores.get(chess.encode_move(m), -float("inf")))
+    if root_scores is None:
+        root_scores = {}
 
     for move in moves:
         if time.perf_counter() - start_time >= time_limit:
-            return None
+            return None, best_value
 
         board.push(move)
-        value = minimax(
-            max_depth - 1,
-            board,
-            -float("inf"),
-            float("inf"),
-            board.turn == chess.WHITE,
-            start_time,
-            time_limit
-        )
+        if best_move is None:
+            value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
+        else:
+            value = -negamax(max_depth - 1, board, -alpha - 1, -alpha, 1, start_time, time_limit)
+            if alpha < value < beta:
+                value = -negamax(max_depth - 1, board, -beta, -alpha, 1, start_time, time_limit)
         board.pop()
+        root_scores[chess.encode_move(move)] = value
 
-        if (board.turn == chess.WHITE and value > best_value) or \
-                (board.turn == chess.BLACK and value < best_value):
+        if value > best_value:
             best_value = value
             best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            break
 
-    return best_move
+    if best_move is not None and time.perf_counter() - start_time < time_limit:
+        tt_store(transposition_table, key, max_depth, bound_flag(best_value, alpha_orig, beta),
+                 best_value, chess.encode_move(best_move), tt_generation)
+    return best_move, best_value
 
 
-def order_moves(board: chess.Board) -> List[chess.Move]:
-    """Generate legal moves sorted by heuristic value."""
-    endgame = check_end_game(board._board)
-    is_white = board.turn == chess.WHITE
+def extract_pv(board: chess.Board, max_length: int) -> List[chess.Move]:
+    """
+    Follow the transposition table moves from the current position to
+    recover the principal variation of the last search.
+    """
+    pv = []
+    seen = set()
+    while len(pv) < max_length:
+        key = board.zobrist_hash()
+        found, _, _, _, tt_move = tt_probe(transposition_table, key)
+        if not found or tt_move == NO_MOVE or key in seen:
+            break
+        if tt_move not in move_buffers[0][:board.generate_moves(move_buffers[0])]:
+            break
+        move = chess.decode_move(tt_move)
+        seen.add(key)
+        board.push(move)
+        pv.append(move)
+    for _ in pv:
+        board.pop()
+    return pv
 
-    moves = []
-    for move in board.legal_moves():
-        score = move_value(board._board, move, endgame)
-        moves.append((score, move))
 
-    return [m for _, m in sorted(moves, key=lambda x: x[0], reverse=is_white)]
+def update_principal_variation(board: chess.Board, pv: List[chess.Move]) -> None:
+    """Remember the moves of pv by the key of the position they are played from."""
+    principal_variation.clear()
+    for move in pv:
+        principal_variation[board.zobrist_hash()] = chess.encode_move(move)
+        board.push(move)
+    for _ in pv:
+        board.pop()
+
+
+def order_moves(board: chess.Board, moves: np.ndarray, scores: np.ndarray, tt_move: int = NO_MOVE,
+                ply: Optional[int] = None) -> int:
+    """
+    Generate the packed legal moves into moves with their ordering scores
+    (see score_moves) in scores, the killer moves being those of ply, and
+    return their number.
+    """
+    count = board.generate_moves(moves)
+    killers = killer_moves[min(ply, MAX_PLY - 1)] if ply is not None else (NO_MOVE, NO_MOVE)
+    score_moves(board._board, moves, scores, count, tt_move, killers[0], killers[1], history_table,
+                0 if board.turn == chess.WHITE else 1, board.turn, check_end_game(board))
+    return count
 
 
-def minimax(
+def negamax(
         depth: int,
         board: chess.Board,
         alpha: float,
         beta: float,
-        is_maximizing: bool,
+        ply: int,
         start_time: float,
         time_limit: float,
 ) -> float:
     """
-    Updated minimax with proper node counting.
+    Principal variation search scored from the side to move's point of
+    view: the first move gets the full window, the rest a null window that
+    is widened again only when a move lands inside (alpha, beta). Results
+    go to the transposition table, which cuts the search short when an
+    entry is deep enough and otherwise supplies the move to try first.
+    A node without legal moves is checkmate or stalemate. Quiet moves that
+    cause a beta cutoff become killers for this ply and earn history
+    credit.
     """
     debug_info["nodes"] += 1  # Increment node count here
 
     if time.perf_counter() - start_time >= time_limit:
         return 0
 
-    if board.is_checkmate():
-        return -MATE_SCORE if is_maximizing else MATE_SCORE
-    elif board.is_game_over():
+    if board.can_claim_draw():
         return 0
 
-    if depth == 0:
-        return evaluate_board(board._board)
-
-    moves = order_moves(board)
-    if is_maximizing:
-        max_eval = -float("inf")
-        for move in moves:
-            board.push(move)
-            eval = minimax(depth - 1, board, alpha, beta, False, start_time, time_limit)
-            board.pop()
-            max_eval = max(max_eval, eval)
-            alpha = max(alpha, eval)
-            if beta <= alpha:
-                break
-        return max_eval
-    else:
-        min_eval = float("inf")
-        for move in moves:
-            board.push(move)
-            eval = minimax(depth - 1, board, alpha, beta, True, start_time, time_limit)
-            board.pop()
-            min_eval = min(min_eval, eval)
-            beta = min(beta, eval)
-            if beta <= alpha:
-                break
-        return min_eval
+    if depth == 0 or ply >= MAX_SEARCH_PLY:
+        return quiescence(board, alpha, beta, ply, start_time, time_limit)
+
+    key = board.zobrist_hash()
+    found, tt_depth, tt_flag, tt_score, tt_move = tt_probe(transposition_table, key)
+    tt_move = principal_variation.get(key, tt_move)
+    if found and tt_depth >= depth:
+        if tt_flag == EXACT:
+            return tt_score
+        if tt_flag == LOWER_BOUND:
+            alpha = max(alpha, tt_score)
+        else:
+            beta = min(beta, tt_score)
+        if alpha >= beta:
+            return tt_score
+    alpha_orig, beta_orig = alpha, beta
+
+    moves, scores = move_buffers[ply], score_buffers[ply]
+    count = order_moves(board, moves, scores, tt_move, ply)
+    if count == 0:
+        king = board._king_squares[board.turn]
+        return -MATE_SCORE if board.is_square_attacked(king, -board.turn) else 0
+    best_move = NO_MOVE
+    best_value = -float("inf")
+    for i in range(count):
+        move = pick_move(moves, scores, i, count)
+        if i == 0:
+            best_move = move
+        board.push_move(move)
+        if i == 0:
+            value = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit)
+        else:
+            value = -negamax(depth - 1, board, -alpha - 1, -alpha, ply + 1, start_time, time_limit)
+            if alpha < value < beta:
+                value = -negamax(depth - 1, board, -beta, -alpha, ply + 1, start_time, time_limit)
+        board.pop_move()
+        if value > best_value:
+            best_value = value
+            best_move = move
+        alpha = max(alpha, value)
+        if alpha >= beta:
+            to_square = (move >> 6) & 63
+            if not move >> 12 and board._board[to_square >> 3, to_square & 7] * board.turn >= 0:
+                record_cutoff(killer_moves, history_table, ply, 0 if board.turn == chess.WHITE else 1, move, depth)
+            break
+
+    # Scores of an interrupted search are not trustworthy, keep them out of the table
+    if time.perf_counter() - start_time < time_limit:
+        tt_store(transposition_table, key, depth, bound_flag(best_value, alpha_orig, beta_orig),
+                 best_value, best_move, tt_generation)
+    return best_value
+
+
+def quiescence(
+        board: chess.Board,
+        alpha: float,
+        beta: float,
+        ply: int,
+        start_time: float,
+        time_limit: float
+) -> float:
+    """
+    Capture-only search at the horizon with stand-pat on the static
+    evaluation. Captures are tried in MVV-LVA order and skipped (delta
+    pruning) when even winning the victim cannot lift the score to alpha.
+    """
+    global seldepth
+    debug_info["nodes"] += 1
+    if ply > seldepth:
+        seldepth = ply
+
+    if time.perf_counter() - start_time >= time_limit:
+        return 0
+
+    stand_pat = board.turn * evaluate_board(board)
+    if stand_pat >= beta or ply >= MAX_SEARCH_PLY:
+        return stand_pat
+    alpha = max(alpha, stand_pat)
+
+    moves, scores = move_buffers[ply], score_buffers[ply]
+    count = order_captures(board, moves, scores)
+    for i in range(count):
+        move = pick_move(moves, scores, i, count)
+        to_square = (move >> 6) & 63
+        victim = board._board[to_square >> 3, to_square & 7]
+        if stand_pat + PIECE_VALUE[abs(victim)] + DELTA_MARGIN <= alpha:
+            continue
+        board.push_move(move)
+        value = -quiescence(board, -beta, -alpha, ply + 1, start_time, time_limit)
+        board.pop_move()
+        if value >= beta:
+            return value
+        alpha = max(alpha, value)
+    return alpha
+
+
+def order_captures(board: chess.Board, moves: np.ndarray, scores: np.ndarray) -> int:
+    """Generate the packed legal captures into moves with MVV-LVA scores and return their number."""
+    return score_captures(board._board, moves, scores, board.generate_moves(moves), board.turn)
+
+
+def bound_flag(value: float, alpha: float, beta: float) -> int:
+    """Transposition table flag for a score searched in the window (alpha, beta)."""
+    if value <= alpha:
+        return UPPER_BOUND
+    if value >= beta:
+        return LOWER_BOUND
+    return EXACT
 
 
 def log_info(message: str) -> None:
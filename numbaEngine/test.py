@@ -0,0 +1,73 @@
+import unittest
+import chess
+import jitsearch
+import movegeneration
+
+
+class TestSearch(unittest.TestCase):
+    # (fen, depth, mating moves)
+    MATES = [
+        ("6k1/5ppp/8/8/8/8/8/R5K1 w - - 0 1", 2, {"a1a8"}),
+        ("r5k1/8/8/8/8/8/5PPP/6K1 b - - 0 1", 2, {"a8a1"}),
+        ("r1bqkbnr/pppp1ppp/2n5/4p3/2B1P3/5Q2/PPPP1PPP/RNB1K1NR w KQkq - 0 1", 2, {"f3f7"}),
+        ("7k/8/6K1/8/8/8/8/R7 w - - 0 1", 4, {"a1a8"}),
+        ("k7/8/2K5/8/8/8/8/7R w - - 0 1", 4, {"c6b6", "c6c7"}),
+    ]
+
+    def setUp(self):
+        movegeneration.clear_transposition_table()
+        movegeneration.clear_move_ordering()
+
+    def test_mate_found(self):
+        """Test that both searches play a mate within their horizon and score it as one."""
+        for search in (movegeneration, jitsearch):
+            for fen, depth, mates in self.MATES:
+                with self.subTest(search=search.__name__, fen=fen):
+                    self.setUp()
+                    board = chess.Board()
+                    board.set_fen(fen)
+                    move = search.next_move(board, float("inf"), "test", debug=False, max_depth=depth)
+                    found, _, _, score, _ = movegeneration.tt_probe(movegeneration.transposition_table,
+                                                                    board.zobrist_hash())
+                    self.assertIn(str(move), mates)
+                    self.assertTrue(found)
+                    self.assertGreaterEqual(score, movegeneration.MATE_THRESHOLD)
+
+    def test_age_move_ordering(self):
+        """Test that aging halves history and forgets the killers."""
+        movegeneration.history_table[0, 52, 36] = 9
+        movegeneration.history_table[1, 12, 28] = 4
+        movegeneration.killer_moves[3] = 52 | 36 << 6
+        movegeneration.age_move_ordering()
+        self.assertEqual(movegeneration.history_table[0, 52, 36], 4)
+        self.assertEqual(movegeneration.history_table[1, 12, 28], 2)
+        self.assertEqual(movegeneration.history_table.sum(), 6)
+        self.assertTrue((movegeneration.killer_moves == movegeneration.NO_MOVE).all())
+
+
+class TestJitPosition(unittest.TestCase):
+    def test_key_follows_board(self):
+        """Test that make_move keeps the jitted key equal to Board.zobrist_hash through king and rook moves."""
+        board = chess.Board()
+        board.set_fen("r3k2r/pppq1ppp/2n2n2/3pp3/3PP3/2N2N2/PPPQ1PPP/R3K2R w KQkq - 0 1")
+        for uci in ["e1f1", "a8b8", "h1g1", "e8e7", "a1b1", "h8d8"]:
+            move = next(chess.encode_move(m) for m in board.legal_moves() if str(m) == uci)
+            pos = jitsearch.load_position(board)
+            key = pos[jitsearch.KEY]
+            undo = jitsearch.undo_buffer[0]
+            jitsearch.make_move(pos, move, undo)
+            board.push_uci(uci)
+            self.assertEqual(pos[jitsearch.KEY], board.zobrist_hash())
+            jitsearch.unmake_move(pos, move, undo)
+            self.assertEqual(pos[jitsearch.KEY], key)
+
+        # Castling is played through Board.push, which moves the rook as well
+        board.set_fen("r3k2r/8/8/8/8/8/8/R3K2R w KQkq - 0 1")
+        for uci in ["e1g1", "e8c8"]:
+            board.push_uci(uci)
+            self.assertEqual(jitsearch.load_position(board)[jitsearch.KEY], board.zobrist_hash())
+            self.assertEqual(board.zobrist_hash(), board._compute_hash())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,126 @@
+"""
+Move generation throughput of every engine backend, apart from the search.
+
+Runs Board.perft over a standard set of positions in each backend and
+reports the leaf counts, wall time and leaves per second. The backends
+share module names (chess, movegeneration, ...), so each one runs in its
+own interpreter started from its directory.
+
+None of the move generators produces castling or en passant moves, so the
+counts differ from the published perft results of most of these positions;
+they are checked against each other instead and any disagreement is
+reported.
+
+    python perft.py                      # every backend, depth 3
+    python perft.py --depth 4 --backends cpp cython
+    python perft.py --fen "<fen>" --divide --backends default cpp
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+
+REPO = os.path.dirname(os.path.abspath(__file__))
+
+# name: (directory, module, Board class)
+BACKENDS = {
+    "default": ("default", "chess", "Board"),
+    "bitboard": ("default", "chess", "BitboardBoard"),
+    "numba": ("numbaEngine", "chess", "Board"),
+    "cython": ("miniCython", "chess", "Board"),
+    "cpp": ("Cpp_cython", "chess_engine", "Board"),
+}
+
+POSITIONS = {
+    "start": "rnbqkbnr/pppppppp/8/8/8/8/PPPPPPPP/RNBQKBNR w KQkq - 0 1",
+    "kiwipete": "r3k2r/p1ppqpb1/bn2pnp1/3PN3/1p2P3/2N2Q1p/PPPBBPPP/R3K2R w KQkq - 0 1",
+    "endgame": "8/2p5/3p4/KP5r/1R3p1k/8/4P1P1/8 w - - 0 1",
+    "promotions": "r3k2r/Pppp1ppp/1b3nbN/nP6/BBP1P3/q4N2/Pp1P2PP/R2Q1RK1 w kq - 0 1",
+    "middlegame": "rnbq1k1r/pp1Pbppp/2p5/8/2B5/8/PPP1NnPP/RNBQK2R w KQ - 1 8",
+    "symmetric": "r4rk1/1pp1qppp/p1np1n2/2b1p1B1/2B1P1b1/P1NP1N2/1PP1QPPP/R4RK1 w - - 0 10",
+}
+
+
+def run_backend(name: str, positions: dict, depth: int, divide: bool) -> list:
+    """Run perft in this interpreter with the modules of the given backend."""
+    directory, module, board_class = BACKENDS[name]
+    os.chdir(os.path.join(REPO, directory))
+    sys.path.insert(0, os.getcwd())
+    Board = getattr(__import__(module), board_class)
+
+    # Compile or warm up whatever the backend builds lazily outside the timing
+    Board().perft(2)
+
+    results = []
+    for position, fen in positions.items():
+        board = Board()
+        board.set_fen(fen)
+        start = time.perf_counter()
+        leaves = board.perft(depth)
+        elapsed = time.perf_counter() - start
+        result = {"position": position, "leaves": leaves, "time": elapsed}
+        if divide:
+            result["divide"] = board.perft_divide(depth)
+        results.append(result)
+    return results
+
+
+def spawn_backend(name: str, args) -> list:
+    """Run one backend in a child interpreter and collect its results, None when it cannot load."""
+    command = [sys.executable, os.path.abspath(__file__), "--worker", name, "--depth", str(args.depth)]
+    if args.fen:
+        command += ["--fen", args.fen]
+    if args.divide:
+        command.append("--divide")
+    process = subprocess.run(command, capture_output=True, text=True)
+    if process.returncode != 0:
+        error = process.stderr.strip().splitlines()
+        print(f"{name}: unavailable ({error[-1] if error else 'exit code ' + str(process.returncode)})")
+        return None
+    return json.loads(process.stdout)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Perft move generation benchmark")
+    parser.add_argument("--depth", type=int, default=3)
+    parser.add_argument("--backends", nargs="+", choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument("--fen", help="run this position instead of the standard set")
+    parser.add_argument("--divide", action="store_true", help="also print the leaves below each root move")
+    parser.add_argument("--worker", choices=list(BACKENDS), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    positions = {"fen": args.fen} if args.fen else POSITIONS
+
+    if args.worker:
+        json.dump(run_backend(args.worker, positions, args.depth, args.divide), sys.stdout)
+        return
+
+    print(f"{'backend':<10}{'position':<12}{'depth':>6}{'leaves':>12}{'time (s)':>11}{'leaves/s':>13}")
+    counts = {}
+    for name in args.backends:
+        results = spawn_backend(name, args)
+        if results is None:
+            continue
+        total_leaves = sum(result["leaves"] for result in results)
+        total_time = sum(result["time"] for result in results)
+        for result in results:
+            counts.setdefault(result["position"], {})[name] = result
+            print(f"{name:<10}{result['position']:<12}{args.depth:>6}{result['leaves']:>12}"
+                  f"{result['time']:>11.3f}{result['leaves'] / max(result['time'], 1e-9):>13,.0f}")
+        print(f"{name:<10}{'total':<12}{args.depth:>6}{total_leaves:>12}"
+              f"{total_time:>11.3f}{total_leaves / max(total_time, 1e-9):>13,.0f}")
+
+    for position, by_backend in counts.items():
+        if len({result["leaves"] for result in by_backend.values()}) > 1:
+            print(f"Mismatch in {position}: " +
+                  ", ".join(f"{name} {result['leaves']}" for name, result in by_backend.items()))
+        if args.divide:
+            print(f"Divide of {position}:\n  {'':<6}" + "".join(f"{name:>10}" for name in by_backend))
+            for move in sorted(set().union(*(result["divide"] for result in by_backend.values()))):
+                row = [result["divide"].get(move, "-") for result in by_backend.values()]
+                print(f"  {move:<6}" + "".join(f"{count:>10}" for count in row))
+
+
+if __name__ == "__main__":
+    main()
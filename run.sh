@@ -31,8 +31,11 @@ engines=(
   "Nuitka|$HOME/repos/ChessOptimizationPython/nuitka/main.bin|--name=nuitka"
   "Pypy|$HOME/repos/pypy3.11-v7.3.19-linux64/bin/pypy|$HOME/repos/ChessOptimizationPython/default/main.py|--name=pypy"
   "Numba|$HOME/.pyenv/versions/3.10.4/bin/python|$HOME/repos/ChessOptimizationPython/numbaEngine/main.py|--name=numba"
+  "NumbaJit|$HOME/.pyenv/versions/3.10.4/bin/python|$HOME/repos/ChessOptimizationPython/numbaEngine/main.py|--name=numbajit|--search=jit"
   "Cpp|$HOME/.pyenv/versions/3.10.4/bin/python|$HOME/repos/ChessOptimizationPython/Cpp_cython/main.py|--name=cpp"
   "Cython|$HOME/.pyenv/versions/3.10.4/bin/python|$HOME/repos/ChessOptimizationPython/miniCython/main.py|--name=cython"
+  "BatchLeaves|$HOME/.pyenv/versions/3.10.4/bin/python|$HOME/repos/ChessOptimizationPython/default/main.py|--name=batchleaves|option.BatchLeaves=true"
+  "Threads4|$HOME/.pyenv/versions/3.10.4/bin/python|$HOME/repos/ChessOptimizationPython/default/main.py|--name=threads4|--threads=4"
 )
 
 # Function to build engine arguments
@@ -41,10 +44,19 @@ build_engine_args() {
   IFS='|' read -ra parts <<< "$spec"
   local name="${parts[0]}"
   local py_exec="${parts[1]}"
-  local script_args=("${parts[@]:2}")
+  local script_args=()
+  local uci_options=()
+  # Entries of the form option.Name=value are UCI options, the rest script arguments
+  for part in "${parts[@]:2}"; do
+    if [[ $part == option.* ]]; then
+      uci_options+=("$part")
+    else
+      script_args+=("$part")
+    fi
+  done
 
   echo -engine "name=$name" proto=uci "cmd=$py_exec" \
-    $(printf "arg=%s " "${script_args[@]}")
+    $(printf "arg=%s " "${script_args[@]}") "${uci_options[@]}"
 }
 
 # Generate all unique match combinations